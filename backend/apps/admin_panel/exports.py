@@ -0,0 +1,245 @@
+"""Streaming CSV/NDJSON exports of attempts, answers and users.
+
+Rows are read through server-side cursors (.iterator) and written out in
+chunks, optionally gzipped on the fly, so memory use does not depend on the
+size of the export.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from apps.attempts.models import Attempt, AttemptAnswer
+from apps.attempts.packing import unpack_answers
+
+User = get_user_model()
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+ATTEMPT_FIELDS = [
+    'id', 'user_id', 'ticket_id', 'mode', 'status', 'total_questions', 'correct_answers',
+    'score_percentage', 'is_passed', 'started_at', 'completed_at', 'duration_seconds',
+]
+ANSWER_FIELDS = [
+    'attempt_id', 'attempt__user_id', 'attempt__ticket_id', 'attempt__mode', 'question_id',
+    'selected_option_id', 'is_correct', 'time_spent_seconds', 'answered_at',
+]
+USER_FIELDS = [
+    'id', 'telegram_id', 'telegram_username', 'telegram_first_name', 'telegram_last_name',
+    'language', 'is_active', 'is_verified', 'created_at', 'last_activity',
+    'statistics__total_attempts', 'statistics__average_score', 'statistics__completed_tickets_count',
+]
+
+
+class ExportError(ValueError):
+    """Raised for invalid export parameters."""
+
+
+def _columns(fields):
+    """Column names without lookups: attempt__user_id -> user_id."""
+    return [field.split('__')[-1] if field.startswith('attempt__') else field.replace('__', '_') for field in fields]
+
+
+def _aware(day, end=False):
+    moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    return timezone.make_aware(moment)
+
+
+def parse_filters(params):
+    """Parse date_from/date_to (YYYY-MM-DD, inclusive), month (YYYY-MM), ticket and mode."""
+    filters = {}
+    if params.get('month'):
+        try:
+            first_day = datetime.strptime(params['month'], '%Y-%m').date()
+        except ValueError:
+            raise ExportError('month must be YYYY-MM')
+        next_month = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        filters['since'] = _aware(first_day)
+        filters['until'] = _aware(next_month)
+    
+    for name, end in (('date_from', False), ('date_to', True)):
+        if params.get(name):
+            day = parse_date(params[name])
+            if day is None:
+                raise ExportError(f'{name} must be YYYY-MM-DD')
+            filters['until' if end else 'since'] = _aware(day, end=end)
+    
+    if params.get('ticket'):
+        try:
+            filters['ticket_id'] = int(params['ticket'])
+        except ValueError:
+            raise ExportError('ticket must be a ticket id')
+    
+    if params.get('mode'):
+        modes = dict(Attempt.MODE_CHOICES)
+        if params['mode'] not in modes:
+            raise ExportError(f"mode must be one of: {', '.join(modes)}")
+        filters['mode'] = params['mode']
+    return filters
+
+
+def _pinned(queryset):
+    """Choose the database now: rows are read after the view returned and request routing was reset."""
+    return queryset.using(queryset.db)
+
+
+def attempt_rows(queryset, filters):
+    queryset = Attempt.objects.all() if queryset is None else queryset
+    if 'since' in filters:
+        queryset = queryset.filter(started_at__gte=filters['since'])
+    if 'until' in filters:
+        queryset = queryset.filter(started_at__lt=filters['until'])
+    if 'ticket_id' in filters:
+        queryset = queryset.filter(ticket_id=filters['ticket_id'])
+    if 'mode' in filters:
+        queryset = queryset.filter(mode=filters['mode'])
+    return _pinned(queryset).order_by('id').values_list(*ATTEMPT_FIELDS).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def answer_rows(queryset, filters):
+    """Answer rows; a full export also decodes packed attempts, whose rows may be pruned."""
+    if queryset is None:
+        answers = AttemptAnswer.objects.filter(attempt__packed_answers__isnull=True)
+        attempts = Attempt.objects.filter(packed_answers__isnull=False)
+    else:
+        answers = queryset
+        attempts = Attempt.objects.none()
+    
+    if 'since' in filters:
+        answers = answers.filter(answered_at__gte=filters['since'])
+        attempts = attempts.filter(completed_at__gte=filters['since'])
+    if 'until' in filters:
+        answers = answers.filter(answered_at__lt=filters['until'])
+        attempts = attempts.filter(started_at__lt=filters['until'])
+    if 'ticket_id' in filters:
+        answers = answers.filter(attempt__ticket_id=filters['ticket_id'])
+        attempts = attempts.filter(ticket_id=filters['ticket_id'])
+    if 'mode' in filters:
+        answers = answers.filter(attempt__mode=filters['mode'])
+        attempts = attempts.filter(mode=filters['mode'])
+    
+    answers = _pinned(answers).order_by('attempt_id', 'answered_at').values_list(*ANSWER_FIELDS)
+    attempts = _pinned(attempts).order_by('id').values_list(
+        'id', 'user_id', 'ticket_id', 'mode', 'started_at', 'packed_answers'
+    )
+    return _answer_rows(answers, attempts, filters)
+
+
+def _answer_rows(answers, attempts, filters):
+    yield from answers.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    
+    packed = attempts.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    for attempt_id, user_id, ticket_id, mode, started_at, data in packed:
+        for answer in unpack_answers(data, started_at):
+            if filters.get('since') and answer.answered_at < filters['since']:
+                continue
+            if filters.get('until') and answer.answered_at >= filters['until']:
+                continue
+            yield (
+                attempt_id, user_id, ticket_id, mode, answer.question_id, answer.selected_option_id,
+                answer.is_correct, answer.time_spent_seconds, answer.answered_at,
+            )
+
+
+def user_rows(queryset, filters):
+    queryset = User.objects.all() if queryset is None else queryset
+    if 'since' in filters:
+        queryset = queryset.filter(created_at__gte=filters['since'])
+    if 'until' in filters:
+        queryset = queryset.filter(created_at__lt=filters['until'])
+    return _pinned(queryset).order_by('id').values_list(*USER_FIELDS).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+DATASETS = {
+    'attempts': (ATTEMPT_FIELDS, attempt_rows),
+    'answers': (ANSWER_FIELDS, answer_rows),
+    'users': (USER_FIELDS, user_rows),
+}
+
+
+class _Echo:
+    """File-like object for csv.writer that returns the written line."""
+    
+    def write(self, value):
+        return value
+
+
+def _encode(columns, rows, export_format):
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _chunks(lines, compress):
+    """Join lines into chunks of about EXPORT_BUFFER_SIZE bytes, gzipping them if asked."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= settings.EXPORT_BUFFER_SIZE:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def stream_export(dataset, params, queryset=None):
+    """Build streaming response for a dataset (all rows or the given queryset).
+
+    Raises ExportError for bad parameters.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset: {dataset}")
+    # 'format' is taken by DRF's format suffix override
+    export_format = params.get('output', 'csv')
+    if export_format not in FORMATS:
+        raise ExportError(f"output must be one of: {', '.join(FORMATS)}")
+    compress = params.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filters = parse_filters(params)
+    
+    fields, rows = DATASETS[dataset]
+    lines = _encode(_columns(fields), rows(queryset, filters), export_format)
+    
+    filename = f"{dataset}-{timezone.localtime():%Y%m%d-%H%M%S}.{export_format}"
+    if compress:
+        filename += '.gz'
+    response = StreamingHttpResponse(
+        _chunks(lines, compress),
+        content_type='application/gzip' if compress else f'{FORMATS[export_format]}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_action(dataset, export_format='csv', compress=False):
+    """Admin action streaming the selected objects."""
+    def action(modeladmin, request, queryset):
+        params = {'output': export_format, 'gzip': '1' if compress else ''}
+        return stream_export(dataset, params, queryset=queryset)
+    
+    action.__name__ = f'export_{export_format}{"_gz" if compress else ""}'
+    action.short_description = f"Export selected as {export_format.upper()}{' (gzip)' if compress else ''}"
+    return action
@@ -0,0 +1,111 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: boots the WSGI app like a worker and serves two requests
+CHILD_SCRIPT = r'''
+import io, json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+setup_done = time.perf_counter()
+from config.wsgi import application
+app_loaded = time.perf_counter()
+
+def request(path, host):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host,
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    result = {}
+    def start_response(status, headers, exc_info=None):
+        result['status'] = status
+    started = time.perf_counter()
+    b''.join(application(environ, start_response))
+    return time.perf_counter() - started, result.get('status')
+
+first, status = request(sys.argv[1], sys.argv[2])
+second, _ = request(sys.argv[1], sys.argv[2])
+print('BENCHMARK ' + json.dumps({
+    'setup': setup_done - started,
+    'app_load': app_loaded - setup_done,
+    'first_request': first,
+    'second_request': second,
+    'status': status,
+}))
+'''
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+class Command(BaseCommand):
+    """Measure worker boot: import time by package and time to first request."""
+    
+    help = 'Benchmark startup in default and preloaded (production) boot modes'
+    # Checks would import the whole project before measuring
+    requires_system_checks = []
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Fresh processes per mode')
+        parser.add_argument('--path', default='/api/tickets/', help='Path of the first request')
+        parser.add_argument('--top', type=int, default=15, help='Packages to show in import breakdown')
+        parser.add_argument('--mode', choices=['default', 'preload', 'both'], default='both')
+    
+    def handle(self, *args, **options):
+        modes = ['default', 'preload'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            runs = [self._run(mode, options['path']) for _ in range(options['runs'])]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{mode} boot (median of {len(runs)} runs)"))
+            for name in ('process', 'setup', 'app_load', 'first_request', 'second_request'):
+                value = statistics.median(run[name] for run in runs)
+                self.stdout.write(f"  {name:<16}{value * 1000:9.1f} ms")
+            self.stdout.write(f"  first response: {runs[0]['status']}")
+            self.stdout.write(f"  import time by package (self, ms):")
+            imports = runs[0]['imports']
+            for package, micros in sorted(imports.items(), key=lambda item: -item[1])[:options['top']]:
+                self.stdout.write(f"    {package:<24}{micros / 1000:9.1f}")
+    
+    def _run(self, mode, path):
+        env = dict(os.environ)
+        env.pop('DJANGO_PRELOAD_MASTER', None)
+        if mode == 'preload':
+            env['DJANGO_PRELOAD_MASTER'] = '1'
+        
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, path, _host()],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        elapsed = time.perf_counter() - started
+        
+        result = None
+        for line in process.stdout.splitlines():
+            if line.startswith('BENCHMARK '):
+                result = json.loads(line[len('BENCHMARK '):])
+        if result is None:
+            raise RuntimeError(f"Benchmark process failed:\n{process.stderr[-2000:]}")
+        
+        # "import time: self [us] | cumulative | imported package"
+        imports = defaultdict(int)
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_time, _, name = line[len('import time:'):].split('|')
+            imports[name.strip().split('.')[0]] += int(self_time)
+        
+        # Whole process including interpreter start, to compare with worker spawn time
+        result['process'] = elapsed
+        result['imports'] = imports
+        return result
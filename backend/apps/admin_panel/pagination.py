@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Partitioned tables keep their rows (and statistics) in the partitions
+ESTIMATE_SQL = """
+    SELECT COALESCE(SUM(c.reltuples) FILTER (WHERE c.reltuples > 0), 0)
+    FROM pg_class c
+    WHERE c.oid = %s::regclass
+       OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+"""
+
+
+class EstimatedCountPaginator(Paginator):
+    """Use planner statistics instead of COUNT(*) for unfiltered changelists of huge tables."""
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            table = queryset.model._meta.db_table
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(ESTIMATE_SQL, [table, table])
+                estimate = int(cursor.fetchone()[0])
+            if estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
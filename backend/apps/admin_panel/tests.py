@@ -0,0 +1,344 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.attempts.models import Attempt, AttemptAnswer, UserStatistics
+from apps.tickets.models import Ticket, Question, AnswerOption, UserTicketProgress
+from apps.users.search import MAX_BIGINT, search_users
+from .exports import ANSWER_FIELDS, ATTEMPT_FIELDS, _columns
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AdminQueryCountTests(TestCase):
+    """Admin pages of large tables run a bounded number of queries."""
+    
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', password='admin', telegram_id=1)
+        self.client.force_login(admin)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        for order in range(1, 6):
+            question = Question.objects.create(ticket=self.ticket, text=f'Вопрос {order}', order=order)
+            for option_order in range(1, 4):
+                AnswerOption.objects.create(
+                    question=question, text=f'Ответ {option_order}', order=option_order,
+                    is_correct=option_order == 1
+                )
+        self.users_count = 0
+    
+    def create_users(self, count, answers=3):
+        """Create users with a completed attempt, its answers, statistics and ticket progress."""
+        questions = list(self.ticket.questions.prefetch_related('options').order_by('order'))
+        for _ in range(count):
+            self.users_count += 1
+            user = User.objects.create(username=f'user{self.users_count}', telegram_id=1000 + self.users_count)
+            attempt = Attempt.objects.create(
+                user=user, ticket=self.ticket, mode='testing', status='completed',
+                total_questions=answers, correct_answers=answers
+            )
+            for question in questions[:answers]:
+                AttemptAnswer.objects.create(
+                    attempt=attempt, question=question,
+                    selected_option=question.options.all()[0], is_correct=True
+                )
+            UserStatistics.objects.create(user=user, total_attempts=1)
+            UserTicketProgress.objects.create(user=user, ticket=self.ticket, attempts_count=1)
+    
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+    
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.get(url)
+        return len(context)
+    
+    def assertChangelistQueries(self, model, expected):
+        """Changelist runs the same queries for 2 and 12 rows."""
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+        self.create_users(2)
+        with self.assertNumQueries(expected):
+            self.get(url)
+        self.create_users(10)
+        with self.assertNumQueries(expected):
+            self.get(url)
+    
+    def assertChangeQueries(self, obj, expected):
+        url = reverse(f'admin:{obj._meta.app_label}_{obj._meta.model_name}_change', args=[obj.pk])
+        # Same count whether or not another test already cached the content type
+        ContentType.objects.clear_cache()
+        with self.assertNumQueries(expected):
+            self.get(url)
+    
+    def test_attempt_changelist(self):
+        self.assertChangelistQueries(Attempt, 5)
+    
+    def test_attempt_change(self):
+        self.create_users(1, answers=1)
+        self.create_users(1, answers=5)
+        short, long = Attempt.objects.order_by('id')
+        # Answers inline must not query per row
+        self.assertChangeQueries(short, 11)
+        self.assertChangeQueries(long, 11)
+    
+    def test_attempt_answer_changelist(self):
+        self.assertChangelistQueries(AttemptAnswer, 5)
+    
+    def test_attempt_answer_change(self):
+        self.create_users(12)
+        self.assertChangeQueries(AttemptAnswer.objects.first(), 19)
+    
+    def test_user_ticket_progress_changelist(self):
+        self.assertChangelistQueries(UserTicketProgress, 5)
+    
+    def test_user_ticket_progress_change(self):
+        self.create_users(12)
+        self.assertChangeQueries(UserTicketProgress.objects.first(), 10)
+    
+    def test_user_statistics_changelist(self):
+        self.assertChangelistQueries(UserStatistics, 5)
+    
+    def test_user_statistics_change(self):
+        self.create_users(12)
+        self.assertChangeQueries(UserStatistics.objects.first(), 7)
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    API_THROTTLE_ENABLED=False,
+)
+class ExportTests(TestCase):
+    """Exports stream filtered rows, including answers of packed attempts."""
+    
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', telegram_id=1, is_admin=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        
+        self.first_ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.second_ticket = Ticket.objects.create(number='2', title='Билет 2', status='published')
+        self.questions = []
+        for order in range(1, 3):
+            question = Question.objects.create(ticket=self.first_ticket, text=f'Вопрос {order}', order=order)
+            AnswerOption.objects.create(question=question, text='Ответ', order=1, is_correct=True)
+            self.questions.append(question)
+        
+        user = User.objects.create(username='student', telegram_id=2)
+        self.january = self.create_attempt(user, self.first_ticket, 'testing', [local(2024, 1, 10, 12, 0, 30)])
+        self.february = self.create_attempt(user, self.second_ticket, 'learning', [local(2024, 2, 5, 9, 0, 30)])
+        # Answered across the month boundary, answer rows are pruned after packing
+        self.packed = self.create_attempt(
+            user, self.first_ticket, 'testing', [local(2024, 1, 31, 23, 55), local(2024, 2, 1, 0, 5)], packed=True
+        )
+        self.december = self.create_attempt(user, self.first_ticket, 'testing', [local(2023, 12, 20, 10, 0, 30)], packed=True)
+    
+    def create_attempt(self, user, ticket, mode, answered_at, packed=False):
+        started_at = answered_at[0].replace(second=0) - timedelta(minutes=1)
+        attempt = Attempt.objects.create(
+            user=user, ticket=ticket, mode=mode, status='completed',
+            total_questions=len(answered_at), correct_answers=len(answered_at)
+        )
+        Attempt.objects.filter(pk=attempt.pk).update(
+            started_at=started_at, completed_at=answered_at[-1] + timedelta(minutes=1)
+        )
+        for question, moment in zip(self.questions, answered_at):
+            answer = AttemptAnswer.objects.create(
+                attempt=attempt, question=question, selected_option=question.options.get(), is_correct=True
+            )
+            AttemptAnswer.objects.filter(pk=answer.pk).update(answered_at=moment)
+        attempt.refresh_from_db()
+        if packed:
+            attempt.pack_answers(prune=True)
+        return attempt
+    
+    def export(self, dataset, **params):
+        response = self.client.get(f'/api/admin/exports/{dataset}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+    
+    def csv_rows(self, dataset, **params):
+        _, content = self.export(dataset, output='csv', **params)
+        header, *rows = csv.reader(io.StringIO(content.decode()))
+        return header, rows
+    
+    def attempt_ids(self, **params):
+        _, rows = self.csv_rows('attempts', **params)
+        return {int(row[0]) for row in rows}
+    
+    def answer_times(self, **params):
+        _, content = self.export('answers', output='ndjson', **params)
+        return sorted(
+            (row['attempt_id'], datetime.fromisoformat(row['answered_at']))
+            for row in map(json.loads, content.decode().splitlines())
+        )
+    
+    def test_csv(self):
+        response, _ = self.export('attempts')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="attempts-\d{8}-\d{6}\.csv"')
+        
+        header, rows = self.csv_rows('attempts')
+        self.assertEqual(header, ATTEMPT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows], sorted(
+            attempt.id for attempt in (self.january, self.february, self.packed, self.december)
+        ))
+    
+    def test_ndjson_includes_packed_answers(self):
+        response, content = self.export('answers', output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(list(rows[0]), _columns(ANSWER_FIELDS))
+        self.assertEqual(len(rows), 5)
+        
+        packed = [row for row in rows if row['attempt_id'] == self.packed.id]
+        self.assertEqual([row['question_id'] for row in packed], [question.id for question in self.questions])
+        self.assertEqual({row['user_id'] for row in rows}, {self.packed.user_id})
+        self.assertTrue(all(row['is_correct'] for row in rows))
+    
+    @override_settings(EXPORT_BUFFER_SIZE=64)
+    def test_gzip(self):
+        _, plain = self.export('answers', output='ndjson')
+        response = self.client.get('/api/admin/exports/answers/', {'output': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), plain)
+    
+    def test_attempt_filters(self):
+        cases = [
+            ({'month': '2024-01'}, {self.january.id, self.packed.id}),
+            ({'month': '2024-02'}, {self.february.id}),
+            ({'date_from': '2024-01-31', 'date_to': '2024-02-05'}, {self.february.id, self.packed.id}),
+            ({'date_to': '2024-01-09'}, {self.december.id}),
+            ({'ticket': self.second_ticket.id}, {self.february.id}),
+            ({'mode': 'learning'}, {self.february.id}),
+            ({'month': '2024-01', 'ticket': self.first_ticket.id, 'mode': 'testing'}, {self.january.id, self.packed.id}),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.attempt_ids(**params), expected)
+    
+    def test_packed_answers_are_filtered_by_answer_time(self):
+        january = self.answer_times(month='2024-01')
+        self.assertEqual([attempt_id for attempt_id, _ in january], sorted([self.january.id, self.packed.id]))
+        self.assertIn((self.packed.id, local(2024, 1, 31, 23, 55)), january)
+        
+        february = self.answer_times(month='2024-02')
+        self.assertEqual([attempt_id for attempt_id, _ in february], sorted([self.february.id, self.packed.id]))
+        self.assertIn((self.packed.id, local(2024, 2, 1, 0, 5)), february)
+        
+        # Completed before the range starts
+        self.assertEqual(len(self.answer_times(date_from='2024-01-01')), 4)
+        self.assertEqual(self.answer_times(date_to='2023-12-31'), [(self.december.id, local(2023, 12, 20, 10, 0, 30))])
+        self.assertEqual(self.answer_times(ticket=self.second_ticket.id, mode='learning'), [
+            (self.february.id, local(2024, 2, 5, 9, 0, 30)),
+        ])
+    
+    def test_invalid_parameters(self):
+        for dataset, params in (
+            ('attempts', {'month': '2024-13'}),
+            ('attempts', {'date_from': '01.02.2024'}),
+            ('attempts', {'ticket': 'first'}),
+            ('answers', {'mode': 'race'}),
+            ('answers', {'output': 'xml'}),
+            ('tickets', {}),
+        ):
+            with self.subTest(dataset=dataset, params=params):
+                response = self.client.get(f'/api/admin/exports/{dataset}/', params)
+                self.assertEqual(response.status_code, 400)
+    
+    def test_admin_only(self):
+        self.client.force_authenticate(User.objects.get(username='student'))
+        self.assertEqual(self.client.get('/api/admin/exports/attempts/').status_code, 403)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    API_THROTTLE_ENABLED=False,
+    USER_SEARCH_MAX_RESULTS=5,
+)
+class UserSearchTests(TestCase):
+    """Users are found by '@username', Telegram or internal id and name fragments."""
+    
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', telegram_id=1, is_admin=True, is_staff=True, is_superuser=True)
+        self.ivan = self.create_user(100, 'Ivan_Petrov', 'Иван', 'Петров')
+        self.petrovsky = self.create_user(101, 'petrovsky', 'Пётр', 'Петровский')
+        self.anna = self.create_user(102, '', 'Анна', 'Иванова')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def create_user(self, telegram_id, username, first_name, last_name):
+        return User.objects.create(
+            username=f'tg_{telegram_id}', telegram_id=telegram_id, telegram_username=username,
+            telegram_first_name=first_name, telegram_last_name=last_name
+        )
+    
+    def found(self, term, limit=None):
+        return [user.id for user in search_users(term, limit)]
+    
+    def test_username_matches_exactly(self):
+        self.assertEqual(self.found('@ivan_petrov'), [self.ivan.id])
+        self.assertEqual(self.found(' @IVAN_PETROV '), [self.ivan.id])
+        self.assertEqual(self.found('@ivan'), [])
+        self.assertEqual(self.found('@'), [])
+    
+    def test_number_matches_telegram_or_internal_id(self):
+        self.assertEqual(self.found('101'), [self.petrovsky.id])
+        self.assertEqual(self.found(str(self.anna.id)), [self.anna.id])
+        self.assertEqual(self.found(str(MAX_BIGINT + 1)), [])
+    
+    def test_fragments_match_every_word(self):
+        self.assertEqual(self.found('петров'), [self.ivan.id, self.petrovsky.id])
+        self.assertEqual(self.found('иван петр'), [self.ivan.id])
+        self.assertEqual(self.found('ИВАНОВА'), [self.anna.id])
+        # Words shorter than a trigram are ignored, a term of only such words finds nothing
+        self.assertEqual(self.found('ан ив'), [])
+        self.assertEqual(self.found('петровск ив'), [self.petrovsky.id])
+        # Best trigram match first
+        self.assertEqual(self.found('petrovsky'), [self.petrovsky.id])
+        self.assertEqual(self.found('Петров', limit=1), [self.ivan.id])
+    
+    def test_endpoint_is_admin_only(self):
+        url = '/api/admin/users/search/'
+        response = self.client.get(url, {'q': '@ivan_petrov'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': self.ivan.id, 'telegram_id': 100, 'username': 'Ivan_Petrov', 'name': self.ivan.display_name},
+        ])
+        self.assertEqual(self.client.get(url, {'q': 'ив'}).data['results'], [])
+        self.assertEqual(self.client.get(url, {'q': 'петров', 'limit': 'many'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {'q': 'петров', 'limit': 1}).data['results']), 1)
+        
+        self.client.force_authenticate(self.anna)
+        self.assertEqual(self.client.get(url, {'q': '@ivan_petrov'}).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(url, {'q': '@ivan_petrov'}).status_code, (401, 403))
+    
+    def test_admin_changelist_search(self):
+        self.client.logout()
+        self.admin.set_password('admin')
+        self.admin.save()
+        self.assertTrue(self.client.login(telegram_id=1, password='admin'))
+        response = self.client.get(reverse('admin:users_user_changelist'), {'q': 'петров'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(user.id for user in response.context['cl'].result_list), [self.ivan.id, self.petrovsky.id]
+        )
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import admin_dashboard
+from .views import admin_dashboard, cache_metrics, export_data, user_autocomplete
 
 urlpatterns = [
     path('dashboard/', admin_dashboard, name='admin-dashboard'),
+    path('cache/', cache_metrics, name='admin-cache-metrics'),
+    path('exports/<str:dataset>/', export_data, name='admin-export'),
+    path('users/search/', user_autocomplete, name='admin-user-search'),
 ]
 
@@ -1,8 +1,14 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from apps.users.authentication import TelegramAuthentication
+from apps.tickets.cache import get_metrics
+from apps.users.search import search_users
+from .exports import stream_export, ExportError
+from config.throttling import ExpensiveThrottle
 
 User = get_user_model()
 
@@ -24,3 +30,56 @@ def admin_dashboard(request):
     
     return Response(stats)
 
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cache_metrics(request):
+    """Content cache hit/miss metrics per tier (of the worker serving the request)."""
+    if not request.user.is_admin:
+        return Response({'error': 'Access denied'}, status=403)
+    
+    return Response(get_metrics())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ExpensiveThrottle])
+def export_data(request, dataset):
+    """Stream attempts, answers or users as CSV or NDJSON, optionally gzipped."""
+    if not request.user.is_admin:
+        return Response({'error': 'Access denied'}, status=403)
+    
+    try:
+        return stream_export(dataset, request.query_params)
+    except ExportError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_autocomplete(request):
+    """Find users by '@username', Telegram/internal id or name fragments."""
+    if not request.user.is_admin:
+        return Response({'error': 'Access denied'}, status=403)
+    
+    try:
+        limit = int(request.query_params.get('limit', settings.USER_SEARCH_MAX_RESULTS))
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.USER_SEARCH_MAX_RESULTS))
+    
+    users = search_users(request.query_params.get('q', ''), limit).only(
+        'id', 'telegram_id', 'telegram_username', 'telegram_first_name', 'telegram_last_name', 'username'
+    )
+    return Response({
+        'results': [
+            {
+                'id': user.id,
+                'telegram_id': user.telegram_id,
+                'username': user.telegram_username,
+                'name': user.display_name,
+            }
+            for user in users
+        ]
+    })
@@ -1,14 +1,25 @@
 from django.contrib import admin
-from .models import Attempt, AttemptAnswer, UserStatistics
+from apps.admin_panel.exports import export_action
+from apps.admin_panel.pagination import EstimatedCountPaginator
+from .models import Attempt, AttemptAnswer, UserStatistics, UserReadiness
 
 
 class AttemptAnswerInline(admin.TabularInline):
-    """Inline admin for attempt answers."""
+    """Inline admin for attempt answers (read-only: no select of every question and option)."""
     model = AttemptAnswer
     extra = 0
     fields = ['question', 'selected_option', 'is_correct', 'time_spent_seconds', 'answered_at']
-    readonly_fields = ['answered_at']
+    readonly_fields = fields
     ordering = ['answered_at']
+    
+    def get_queryset(self, request):
+        """Load labels of questions and options (and of the row itself) with the answers."""
+        return super().get_queryset(request).select_related(
+            'attempt__user', 'attempt__ticket', 'question__ticket', 'selected_option__question__ticket'
+        )
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Attempt)
@@ -20,8 +31,12 @@ class AttemptAdmin(admin.ModelAdmin):
         'is_passed', 'started_at', 'completed_at', 'duration_seconds'
     ]
     list_filter = ['mode', 'status', 'is_passed', 'started_at', 'completed_at']
-    search_fields = ['user__display_name', 'ticket__number', 'ticket__title']
+    search_fields = ['=user__telegram_id', '=ticket__number']
     ordering = ['-started_at']
+    list_select_related = ['user', 'ticket']
+    autocomplete_fields = ['user', 'ticket']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Attempt Info', {
@@ -39,6 +54,8 @@ class AttemptAdmin(admin.ModelAdmin):
     readonly_fields = ['started_at', 'completed_at', 'duration_seconds']
     
     inlines = [AttemptAnswerInline]
+    
+    actions = [export_action('attempts'), export_action('attempts', compress=True)]
 
 
 @admin.register(AttemptAnswer)
@@ -50,8 +67,14 @@ class AttemptAnswerAdmin(admin.ModelAdmin):
         'time_spent_seconds', 'answered_at'
     ]
     list_filter = ['is_correct', 'answered_at']
-    search_fields = ['attempt__user__display_name', 'question__text']
+    search_fields = ['=attempt__id', '=attempt__user__telegram_id', '=question__id']
     ordering = ['-answered_at']
+    list_select_related = [
+        'attempt__user', 'attempt__ticket', 'question__ticket', 'selected_option__question__ticket'
+    ]
+    raw_id_fields = ['attempt', 'question', 'selected_option']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Answer', {
@@ -63,6 +86,8 @@ class AttemptAnswerAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['answered_at']
+    
+    actions = [export_action('answers'), export_action('answers', compress=True)]
 
 
 @admin.register(UserStatistics)
@@ -74,8 +99,12 @@ class UserStatisticsAdmin(admin.ModelAdmin):
         'average_score', 'completed_tickets_count', 'last_attempt_at'
     ]
     list_filter = ['last_attempt_at']
-    search_fields = ['user__display_name']
+    search_fields = ['=user__telegram_id']
     ordering = ['-last_attempt_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Overall Statistics', {
@@ -92,5 +121,22 @@ class UserStatisticsAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = '__all__'
+    readonly_fields = [
+        'user', 'total_attempts', 'total_questions_answered', 'total_correct_answers',
+        'average_score', 'completed_tickets_count', 'total_time_spent_seconds',
+        'average_time_per_question', 'last_attempt_at'
+    ]
 
+
+@admin.register(UserReadiness)
+class UserReadinessAdmin(admin.ModelAdmin):
+    """Admin configuration for UserReadiness model."""
+    
+    list_display = ['user', 'pass_probability', 'accuracy', 'answers_count', 'coverage', 'computed_at']
+    search_fields = ['=user__telegram_id']
+    ordering = ['-pass_probability']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    readonly_fields = ['pass_probability', 'accuracy', 'category_accuracy', 'answers_count', 'coverage', 'computed_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,50 @@
+import functools
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+RESPONSE_KEY = 'idempotency:{user_id}:{path}:{key}'
+LOCK_KEY = 'idempotency:lock:{user_id}:{path}:{key}'
+
+
+def idempotent(view):
+    """Replay cached response for repeated requests with the same Idempotency-Key.
+
+    Requests without the header are processed as usual. A retry that arrives
+    while the first request is still running gets 409 instead of doing the
+    work twice. Server errors are not cached so the client can retry them.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        
+        params = {'user_id': request.user.pk, 'path': request.path, 'key': key[:100]}
+        response_key = RESPONSE_KEY.format(**params)
+        cached = cache.get(response_key)
+        if cached is not None:
+            return Response(cached['data'], status=cached['status'], headers={'Idempotent-Replayed': 'true'})
+        
+        lock_key = LOCK_KEY.format(**params)
+        if not cache.add(lock_key, 1, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return Response(
+                {'error': 'Request with this Idempotency-Key is still in progress'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(
+                    response_key,
+                    {'data': response.data, 'status': response.status_code},
+                    settings.IDEMPOTENCY_KEY_TTL
+                )
+            return response
+        finally:
+            cache.delete(lock_key)
+    
+    return wrapper
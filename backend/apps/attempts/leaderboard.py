@@ -0,0 +1,224 @@
+import bisect
+import logging
+import threading
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BOARD = 'leaderboard:global'
+WEEKLY_BOARD = 'leaderboard:weekly:{week}'
+TICKET_BOARD = 'leaderboard:ticket:{ticket_id}'
+
+WEEKLY_BOARD_TTL = 14 * 24 * 3600
+
+# Boards are rebuilt under this prefix and then replace the live ones
+REBUILD_PREFIX = 'leaderboard-rebuild:'
+REBUILD_TTL = 3600
+
+
+class RedisLeaderboardBackend:
+    """Leaderboards on Redis sorted sets."""
+    
+    def __init__(self, url=None):
+        import redis
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+    
+    def add(self, board, member, score, mode='set', ttl=None):
+        """Update member score: set, keep max/min or increment."""
+        pipe = self.client.pipeline(transaction=False)
+        if mode == 'incr':
+            pipe.zincrby(board, score, member)
+        else:
+            pipe.zadd(board, {member: score}, gt=mode == 'max', lt=mode == 'min')
+        if ttl:
+            pipe.expire(board, ttl)
+        pipe.execute()
+    
+    def add_many(self, board, scores, ttl=None):
+        """Set scores of many members at once."""
+        if not scores:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(board, scores)
+        if ttl:
+            pipe.expire(board, ttl)
+        pipe.execute()
+    
+    def top(self, board, count, reverse=True):
+        """Get top members as (member, score) pairs."""
+        if reverse:
+            items = self.client.zrevrange(board, 0, count - 1, withscores=True)
+        else:
+            items = self.client.zrange(board, 0, count - 1, withscores=True)
+        return [(member.decode(), score) for member, score in items]
+    
+    def rank(self, board, member, reverse=True):
+        """Get 1-based (rank, score) of member or None."""
+        pipe = self.client.pipeline(transaction=False)
+        if reverse:
+            pipe.zrevrank(board, member)
+        else:
+            pipe.zrank(board, member)
+        pipe.zscore(board, member)
+        rank, score = pipe.execute()
+        if rank is None:
+            return None
+        return rank + 1, score
+    
+    def board_names(self, pattern):
+        """Names of boards matching key pattern."""
+        return [key.decode() for key in self.client.scan_iter(match=pattern, count=1000)]
+    
+    def delete(self, *boards):
+        if boards:
+            self.client.delete(*boards)
+    
+    def delete_pattern(self, pattern):
+        """Delete boards matching key pattern."""
+        self.delete(*self.board_names(pattern))
+    
+    def replace(self, board, source, ttl=None):
+        """Atomically replace board with source board, which is removed; missing source clears board."""
+        if not self.client.exists(source):
+            self.client.delete(board)
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rename(source, board)
+        # RENAME keeps the TTL of the source
+        if ttl:
+            pipe.expire(board, ttl)
+        else:
+            pipe.persist(board)
+        pipe.execute()
+
+
+class InMemoryLeaderboardBackend:
+    """In-process stand-in for tests and development without Redis."""
+    
+    def __init__(self, url=None):
+        self.boards = {}
+        self.lock = threading.Lock()
+    
+    def _board(self, board):
+        # Each board keeps member -> score and a sorted list of (score, member)
+        return self.boards.setdefault(board, ({}, []))
+    
+    def _set(self, board, member, score):
+        scores, ordered = self._board(board)
+        if member in scores:
+            ordered.pop(bisect.bisect_left(ordered, (scores[member], member)))
+        scores[member] = score
+        bisect.insort(ordered, (score, member))
+    
+    def add(self, board, member, score, mode='set', ttl=None):
+        member = str(member)
+        with self.lock:
+            current = self._board(board)[0].get(member)
+            if mode == 'incr':
+                score = (current or 0) + score
+            elif current is not None and mode == 'max' and score <= current:
+                return
+            elif current is not None and mode == 'min' and score >= current:
+                return
+            self._set(board, member, float(score))
+    
+    def add_many(self, board, scores, ttl=None):
+        with self.lock:
+            for member, score in scores.items():
+                self._set(board, str(member), float(score))
+    
+    def top(self, board, count, reverse=True):
+        with self.lock:
+            ordered = self._board(board)[1]
+            items = ordered[::-1][:count] if reverse else ordered[:count]
+            return [(member, score) for score, member in items]
+    
+    def rank(self, board, member, reverse=True):
+        member = str(member)
+        with self.lock:
+            scores, ordered = self._board(board)
+            if member not in scores:
+                return None
+            index = bisect.bisect_left(ordered, (scores[member], member))
+            rank = len(ordered) - index if reverse else index + 1
+            return rank, scores[member]
+    
+    def board_names(self, pattern):
+        prefix = pattern.rstrip('*')
+        with self.lock:
+            return [board for board in self.boards if board.startswith(prefix)]
+    
+    def delete(self, *boards):
+        with self.lock:
+            for board in boards:
+                self.boards.pop(board, None)
+    
+    def delete_pattern(self, pattern):
+        self.delete(*self.board_names(pattern))
+    
+    def replace(self, board, source, ttl=None):
+        with self.lock:
+            if source in self.boards:
+                self.boards[board] = self.boards.pop(source)
+            else:
+                self.boards.pop(board, None)
+
+
+_backend = None
+
+
+def get_backend():
+    """Get configured leaderboard backend."""
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LEADERBOARD_BACKEND)()
+    return _backend
+
+
+def weekly_board(moment=None):
+    """Weekly board key for ISO week of moment."""
+    year, week, _ = timezone.localtime(moment or timezone.now()).isocalendar()
+    return WEEKLY_BOARD.format(week=f"{year}-W{week:02d}")
+
+
+def global_score(statistics):
+    """Completed tickets first, average score as tie-breaker."""
+    return statistics.completed_tickets_count * 1000 + round(statistics.average_score, 2)
+
+
+def is_perfect_run(attempt):
+    return (
+        attempt.ticket_id is not None
+        and attempt.mode == 'testing'
+        and attempt.total_questions > 0
+        and attempt.correct_answers == attempt.total_questions
+        and attempt.duration_seconds is not None
+    )
+
+
+def record_attempt(attempt, statistics):
+    """Update leaderboards incrementally after attempt completion."""
+    member = str(attempt.user_id)
+    try:
+        backend = get_backend()
+        backend.add(GLOBAL_BOARD, member, global_score(statistics))
+        if attempt.correct_answers:
+            backend.add(
+                weekly_board(attempt.completed_at),
+                member,
+                attempt.correct_answers,
+                mode='incr',
+                ttl=WEEKLY_BOARD_TTL
+            )
+        if is_perfect_run(attempt):
+            backend.add(
+                TICKET_BOARD.format(ticket_id=attempt.ticket_id),
+                member,
+                attempt.duration_seconds,
+                mode='min'
+            )
+    except Exception:
+        # Leaderboards can be rebuilt, completion must not fail because of them
+        logger.exception("Failed to update leaderboards for attempt %s", attempt.pk)
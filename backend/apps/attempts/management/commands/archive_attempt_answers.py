@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.attempts.partitioning import archive_old_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    """Archive old attempt_answers partitions to compressed files."""
+    
+    help = 'Dump attempt_answers partitions older than retention window to .csv.gz and detach them'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.ATTEMPT_ANSWERS_RETENTION_MONTHS
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=str(settings.ATTEMPT_ANSWERS_ARCHIVE_DIR)
+        )
+        parser.add_argument(
+            '--keep-detached',
+            action='store_true',
+            help='Detach partitions without dropping them'
+        )
+    
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            if not is_partitioned(cursor):
+                raise CommandError('attempt_answers is not partitioned, run partition_attempt_answers first')
+        
+        # The bot completes attempts without packing them, their answers are packed before the rows go
+        if settings.ATTEMPT_PACK_ANSWERS:
+            call_command('pack_attempt_answers', prune=settings.ATTEMPT_PRUNE_PACKED_ANSWERS, stdout=self.stdout)
+        
+        archived = archive_old_partitions(
+            retention_months=options['retention_months'],
+            output_dir=options['output_dir'],
+            drop=not options['keep_detached']
+        )
+        for path in archived:
+            self.stdout.write(f"Archived to {path}")
+        self.stdout.write(self.style.SUCCESS(f"Archived {len(archived)} partitions"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from apps.attempts.readiness import compute_readiness
+
+
+class Command(BaseCommand):
+    """Recompute exam readiness of all users (run nightly)."""
+    
+    help = 'Compute recency-weighted accuracy per category and exam pass probability of every user'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: READINESS_WORKERS or CPU count)')
+        parser.add_argument('--shard-size', type=int, default=None, help='Users per shard (default: READINESS_SHARD_SIZE)')
+    
+    def handle(self, *args, **options):
+        def progress(users, answers):
+            self.stdout.write(f"Scored {users} users ({answers} answers)")
+        
+        result = compute_readiness(
+            workers=options['workers'],
+            shard_size=options['shard_size'],
+            progress=progress if options['verbosity'] > 1 else None
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {result['users']} users from {result['answers']} answers in {result['shards']} shards "
+            f"with {result['workers']} workers: {result['seconds']} s, {result['users_per_second']} users/sec"
+        ))
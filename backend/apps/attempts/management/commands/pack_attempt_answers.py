@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from apps.attempts.models import Attempt
+
+
+class Command(BaseCommand):
+    """Pack answers of completed attempts into Attempt.packed_answers."""
+    
+    help = 'Pack answers of completed attempts (optionally deleting answer rows)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Delete answer rows after packing'
+        )
+    
+    def handle(self, *args, **options):
+        attempts = Attempt.objects.filter(
+            status='completed',
+            packed_answers__isnull=True
+        ).order_by('id')
+        
+        last_id = 0
+        packed = 0
+        while True:
+            batch = list(
+                attempts.filter(id__gt=last_id).prefetch_related('answers')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            for attempt in batch:
+                attempt.pack_answers(prune=options['prune'])
+            packed += len(batch)
+            self.stdout.write(f"Packed attempts up to id {last_id}")
+        
+        self.stdout.write(self.style.SUCCESS(f"Packed {packed} attempts"))
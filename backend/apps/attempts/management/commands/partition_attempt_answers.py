@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from apps.attempts.partitioning import (
+    convert_to_partitioned, ensure_partitions, install_unique_answer_check, is_partitioned
+)
+
+
+class Command(BaseCommand):
+    """Convert attempt_answers to monthly partitions and create upcoming partitions."""
+    
+    help = 'Partition attempt_answers by answered_at month (run monthly to create new partitions)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument(
+            '--keep-legacy',
+            action='store_true',
+            help='Keep original table as attempt_answers_legacy after conversion'
+        )
+    
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            partitioned = is_partitioned(cursor)
+        
+        if not partitioned:
+            self.stdout.write('Converting attempt_answers to partitioned table...')
+            convert_to_partitioned(
+                months_ahead=options['months_ahead'],
+                keep_legacy=options['keep_legacy']
+            )
+        else:
+            # Tables converted before the trigger existed get it too
+            install_unique_answer_check()
+        
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(f"Partitions up to {created[-1]} are in place"))
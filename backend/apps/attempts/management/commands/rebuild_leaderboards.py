@@ -0,0 +1,98 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, Min, F
+from django.utils import timezone
+from apps.attempts import leaderboard
+from apps.attempts.models import Attempt, UserStatistics
+
+
+class Command(BaseCommand):
+    """Repopulate leaderboards from the database.
+
+    Each board is built under a temporary key and then renamed over the live
+    one, so readers never see an empty or half-filled board.
+    """
+    
+    help = 'Rebuild global, weekly and per-ticket leaderboards from the database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        backend = leaderboard.get_backend()
+        batch_size = options['batch_size']
+        # Leftovers of an interrupted rebuild
+        backend.delete_pattern(f'{leaderboard.REBUILD_PREFIX}*')
+        
+        # Global board
+        statistics = UserStatistics.objects.order_by('id').only(
+            'id', 'user_id', 'completed_tickets_count', 'average_score'
+        )
+        last_id = 0
+        total = 0
+        temporary = leaderboard.REBUILD_PREFIX + leaderboard.GLOBAL_BOARD
+        while True:
+            batch = list(statistics.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            backend.add_many(temporary, {
+                str(item.user_id): leaderboard.global_score(item) for item in batch
+            }, ttl=leaderboard.REBUILD_TTL)
+            total += len(batch)
+        backend.replace(leaderboard.GLOBAL_BOARD, temporary)
+        self.stdout.write(f"Global: {total} users")
+        
+        # Weekly board (current ISO week)
+        now = timezone.localtime()
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        weekly = Attempt.objects.filter(
+            status='completed',
+            completed_at__gte=week_start
+        ).values('user_id').annotate(score=Sum('correct_answers')).order_by()
+        self._fill(backend, leaderboard.weekly_board(now), weekly, batch_size, ttl=leaderboard.WEEKLY_BOARD_TTL)
+        
+        # Per-ticket fastest perfect runs
+        perfect = Attempt.objects.filter(
+            status='completed',
+            mode='testing',
+            ticket__isnull=False,
+            total_questions__gt=0,
+            correct_answers=F('total_questions'),
+            duration_seconds__isnull=False
+        ).values('ticket_id', 'user_id').annotate(score=Min('duration_seconds')).order_by('ticket_id')
+        
+        current_ticket = None
+        rows = []
+        ticket_boards = set()
+        for row in perfect.iterator(chunk_size=batch_size):
+            if row['ticket_id'] != current_ticket and rows:
+                ticket_boards.add(self._fill_ticket(backend, current_ticket, rows, batch_size))
+                rows = []
+            current_ticket = row['ticket_id']
+            rows.append(row)
+        if rows:
+            ticket_boards.add(self._fill_ticket(backend, current_ticket, rows, batch_size))
+        
+        # Tickets without perfect runs any more
+        stale = set(backend.board_names(leaderboard.TICKET_BOARD.format(ticket_id='*'))) - ticket_boards
+        backend.delete(*stale)
+        self.stdout.write(f"Tickets: {len(ticket_boards)} boards, {len(stale)} stale removed")
+        
+        self.stdout.write(self.style.SUCCESS('Leaderboards rebuilt'))
+    
+    def _fill(self, backend, board, rows, batch_size, ttl=None):
+        """Build board from rows with user_id and score, then swap it in; returns board."""
+        temporary = leaderboard.REBUILD_PREFIX + board
+        scores = {}
+        for row in rows:
+            scores[str(row['user_id'])] = row['score']
+            if len(scores) >= batch_size:
+                backend.add_many(temporary, scores, ttl=leaderboard.REBUILD_TTL)
+                scores = {}
+        backend.add_many(temporary, scores, ttl=leaderboard.REBUILD_TTL)
+        backend.replace(board, temporary, ttl=ttl)
+        return board
+    
+    def _fill_ticket(self, backend, ticket_id, rows, batch_size):
+        return self._fill(backend, leaderboard.TICKET_BOARD.format(ticket_id=ticket_id), rows, batch_size)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.attempts.sweeper import sweep_abandoned_attempts
+
+
+class Command(BaseCommand):
+    """Mark stale in-progress attempts as abandoned."""
+    
+    help = 'Mark in-progress attempts without recent activity as abandoned'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=settings.ATTEMPT_ABANDON_AFTER_SECONDS,
+            help='Seconds without activity after which attempt is abandoned'
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.ATTEMPT_SWEEP_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument(
+            '--fold-progress',
+            action='store_true',
+            default=settings.ATTEMPT_SWEEP_FOLD_PROGRESS,
+            help='Add answers of abandoned attempts to ticket progress'
+        )
+    
+    def handle(self, *args, **options):
+        swept = sweep_abandoned_attempts(
+            stale_after=options['stale_after'],
+            batch_size=options['batch_size'],
+            fold_progress=options['fold_progress'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Marked {swept} attempts as abandoned"))
@@ -1,9 +1,31 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from .packing import PackedAnswer, pack_answers, unpack_answers
 
 User = get_user_model()
 
+# Counters are read inside the UPDATE, so answers saved concurrently are not lost
+COMPLETE_ATTEMPT_SQL = """
+    UPDATE attempts SET
+        status = 'completed',
+        completed_at = %(now)s,
+        duration_seconds = GREATEST(0, FLOOR(EXTRACT(EPOCH FROM %(now)s - started_at)))::int,
+        score_percentage = CASE
+            WHEN total_questions > 0 THEN correct_answers * 100 / total_questions ELSE 0
+        END,
+        is_passed = CASE
+            WHEN total_questions = 0 THEN false
+            WHEN mode = 'exam' THEN total_questions - correct_answers <= %(max_mistakes)s
+            ELSE correct_answers = total_questions
+        END,
+        updated_at = %(now)s
+    WHERE id = %(id)s AND status = 'in_progress'
+    RETURNING duration_seconds, correct_answers, score_percentage, is_passed
+"""
+
 
 class Attempt(models.Model):
     """Попытка прохождения тестирования."""
@@ -11,6 +33,7 @@ class Attempt(models.Model):
     MODE_CHOICES = [
         ('learning', 'Обучение'),
         ('testing', 'Тестирование'),
+        ('exam', 'Экзамен'),
     ]
     
     STATUS_CHOICES = [
@@ -20,7 +43,15 @@ class Attempt(models.Model):
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempts', verbose_name="Пользователь")
-    ticket = models.ForeignKey('tickets.Ticket', on_delete=models.CASCADE, related_name='attempts', verbose_name="Билет")
+    ticket = models.ForeignKey(
+        'tickets.Ticket',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='attempts',
+        verbose_name="Билет"
+    )
+    question_ids = models.JSONField(default=list, blank=True, verbose_name="Вопросы экзамена")
     
     # Attempt details
     mode = models.CharField(max_length=20, choices=MODE_CHOICES, verbose_name="Режим")
@@ -37,6 +68,9 @@ class Attempt(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершено")
     duration_seconds = models.PositiveIntegerField(null=True, blank=True, verbose_name="Длительность (секунды)")
     
+    # Compact copy of answers for completed attempts (see packing.py)
+    packed_answers = models.BinaryField(null=True, blank=True, editable=False, verbose_name="Упакованные ответы")
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,38 +80,98 @@ class Attempt(models.Model):
         verbose_name = 'Попытка тестирования'
         verbose_name_plural = 'Попытки тестирования'
         ordering = ['-started_at']
+        indexes = [
+            # Partial indexes stay small: only in-progress attempts are hot
+            models.Index(
+                fields=['user', 'id'],
+                condition=Q(status='in_progress'),
+                name='attempts_in_progress_idx'
+            ),
+            models.Index(
+                fields=['updated_at'],
+                condition=Q(status='in_progress'),
+                name='attempts_stale_idx'
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.user.display_name} - {self.ticket.number} ({self.mode})"
+        ticket_number = self.ticket.number if self.ticket_id else 'экзамен'
+        return f"{self.user.display_name} - {ticket_number} ({self.mode})"
     
     def complete(self):
-        """Mark attempt as completed and calculate results."""
-        self.status = 'completed'
-        self.completed_at = timezone.now()
+        """Mark attempt as completed and calculate results.
         
-        if self.started_at:
-            duration = self.completed_at - self.started_at
-            self.duration_seconds = int(duration.total_seconds())
+        Completion is a conditional UPDATE, so of concurrent calls only one
+        succeeds and runs the side effects. Returns False if the attempt was
+        not in progress any more.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(COMPLETE_ATTEMPT_SQL, {
+                    'id': self.pk,
+                    'now': now,
+                    'max_mistakes': settings.EXAM_MAX_MISTAKES,
+                })
+                row = cursor.fetchone()
+            if row is None:
+                return False
+            
+            self.status = 'completed'
+            self.completed_at = self.updated_at = now
+            (
+                self.duration_seconds, self.correct_answers,
+                self.score_percentage, self.is_passed
+            ) = row
+            
+            if settings.ATTEMPT_PACK_ANSWERS:
+                self.pack_answers(prune=settings.ATTEMPT_PRUNE_PACKED_ANSWERS)
+            
+            # Update user progress
+            self.update_user_progress()
         
-        # Calculate score
-        if self.total_questions > 0:
-            self.score_percentage = int((self.correct_answers / self.total_questions) * 100)
-            self.is_passed = self.score_percentage == 100
+        return True
+    
+    def get_answers(self):
+        """Get answers as PackedAnswer tuples, decoding packed answers if present."""
+        if self.packed_answers is not None:
+            return unpack_answers(self.packed_answers, self.started_at)
         
-        self.save()
+        return [
+            PackedAnswer(
+                question_id=answer.question_id,
+                selected_option_id=answer.selected_option_id,
+                is_correct=answer.is_correct,
+                time_spent_seconds=answer.time_spent_seconds,
+                answered_at=answer.answered_at,
+            )
+            for answer in sorted(self.answers.all(), key=lambda answer: answer.answered_at)
+        ]
+    
+    def pack_answers(self, prune=False):
+        """Store answers in packed_answers, optionally deleting answer rows."""
+        answers = self.get_answers()
+        self.packed_answers = pack_answers(answers, self.started_at)
+        Attempt.objects.filter(pk=self.pk).update(packed_answers=self.packed_answers)
         
-        # Update user progress
-        self.update_user_progress()
+        if prune:
+            self.answers.all().delete()
     
     def update_user_progress(self):
         """Update user's progress for this ticket."""
         from apps.tickets.models import UserTicketProgress
         
-        progress, created = UserTicketProgress.objects.get_or_create(
-            user=self.user,
-            ticket=self.ticket
+        # Exam attempts are not bound to a ticket
+        if not self.ticket_id:
+            return
+        
+        UserTicketProgress.add_results(
+            self.user_id,
+            self.ticket_id,
+            self.total_questions,
+            self.correct_answers,
+            score=self.score_percentage
         )
-        progress.update_progress(self.correct_answers, self.total_questions)
 
 
 class AttemptAnswer(models.Model):
@@ -100,6 +194,7 @@ class AttemptAnswer(models.Model):
         db_table = 'attempt_answers'
         verbose_name = 'Ответ в попытке'
         verbose_name_plural = 'Ответы в попытках'
+        # Enforced by a trigger once the table is partitioned (see partitioning.py)
         unique_together = ['attempt', 'question']
         ordering = ['answered_at']
     
@@ -179,3 +274,23 @@ class UserStatistics(models.Model):
         minutes = (self.total_time_spent_seconds % 3600) // 60
         return f"{hours}ч {minutes}м"
 
+
+class UserReadiness(models.Model):
+    """Готовность пользователя к экзамену (пересчитывается командой compute_readiness)."""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='readiness', verbose_name="Пользователь")
+    pass_probability = models.FloatField(default=0.0, verbose_name="Вероятность сдачи экзамена")
+    accuracy = models.FloatField(default=0.0, verbose_name="Точность с учётом давности")
+    # {category id or 'none': {'accuracy': ..., 'answers': ...}}
+    category_accuracy = models.JSONField(default=dict, blank=True, verbose_name="Точность по категориям")
+    answers_count = models.PositiveIntegerField(default=0, verbose_name="Учтено ответов")
+    coverage = models.FloatField(default=0.0, verbose_name="Доля пройденных билетов")
+    computed_at = models.DateTimeField(verbose_name="Рассчитано")
+    
+    class Meta:
+        db_table = 'user_readiness'
+        verbose_name = 'Готовность к экзамену'
+        verbose_name_plural = 'Готовность к экзамену'
+    
+    def __str__(self):
+        return f"Готовность {self.user_id}: {self.pass_probability:.0%}"
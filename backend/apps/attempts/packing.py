@@ -0,0 +1,90 @@
+import struct
+from collections import namedtuple
+from datetime import timedelta
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<BI')
+# Little-endian struct codes of the columns that follow the header, in order;
+# the correctness bitmap comes last. '<' + code is also a valid NumPy dtype.
+COLUMNS = {
+    'question_ids': 'q',
+    'option_ids': 'q',
+    'seconds': 'I',
+    'answered_offsets': 'I',
+}
+
+PackedAnswer = namedtuple(
+    'PackedAnswer',
+    ['question_id', 'selected_option_id', 'is_correct', 'time_spent_seconds', 'answered_at']
+)
+
+
+def pack_answers(answers, started_at):
+    """Pack answers into bytes.
+
+    Layout (little-endian): version, count, question ids (int64),
+    selected option ids (int64), seconds spent (uint32), seconds from
+    attempt start to answer (uint32) and correctness bitmap.
+    """
+    answers = list(answers)
+    count = len(answers)
+    
+    correct_bits = bytearray((count + 7) // 8)
+    for index, answer in enumerate(answers):
+        if answer.is_correct:
+            correct_bits[index // 8] |= 1 << (index % 8)
+    
+    offsets = [
+        max(0, int((answer.answered_at - started_at).total_seconds()))
+        for answer in answers
+    ]
+    
+    columns = {
+        'question_ids': [answer.question_id for answer in answers],
+        'option_ids': [answer.selected_option_id for answer in answers],
+        'seconds': [answer.time_spent_seconds for answer in answers],
+        'answered_offsets': offsets,
+    }
+    return b''.join([
+        HEADER.pack(FORMAT_VERSION, count),
+        *(struct.pack(f'<{count}{code}', *columns[name]) for name, code in COLUMNS.items()),
+        bytes(correct_bits),
+    ])
+
+
+def packed_layout(data):
+    """Answer count, byte offsets of the columns and of the correctness bitmap.
+
+    Raises ValueError for unsupported format versions.
+    """
+    version, count = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed answers version: {version}")
+    
+    offsets = {}
+    offset = HEADER.size
+    for name, code in COLUMNS.items():
+        offsets[name] = offset
+        offset += struct.calcsize(code) * count
+    return count, offsets, offset
+
+
+def unpack_answers(data, started_at):
+    """Unpack answers packed by pack_answers."""
+    data = bytes(data)
+    count, offsets, bitmap_offset = packed_layout(data)
+    question_ids, option_ids, seconds, answered_offsets = (
+        struct.unpack_from(f'<{count}{code}', data, offsets[name]) for name, code in COLUMNS.items()
+    )
+    correct_bits = data[bitmap_offset:bitmap_offset + (count + 7) // 8]
+    
+    return [
+        PackedAnswer(
+            question_id=question_ids[index],
+            selected_option_id=option_ids[index],
+            is_correct=bool(correct_bits[index // 8] & (1 << (index % 8))),
+            time_spent_seconds=seconds[index],
+            answered_at=started_at + timedelta(seconds=answered_offsets[index]),
+        )
+        for index in range(count)
+    ]
@@ -0,0 +1,282 @@
+import gzip
+import os
+import re
+from datetime import date
+from django.db import connection, transaction
+from django.utils import timezone
+
+TABLE = 'attempt_answers'
+LEGACY_TABLE = 'attempt_answers_legacy'
+DEFAULT_PARTITION = 'attempt_answers_default'
+SEQUENCE = 'attempt_answers_part_id_seq'
+PARTITION_RE = re.compile(r'^attempt_answers_(\d{4})_(\d{2})$')
+UNIQUE_ANSWER_TRIGGER = 'attempt_answers_one_per_question'
+# Set for the transaction while rows that are unique already are moved between partitions
+SKIP_UNIQUE_SETTING = 'attempt_answers.skip_unique_check'
+
+# A unique constraint of a partitioned table must contain the partition key, and
+# UNIQUE (attempt_id, question_id, answered_at) allows a second answer with another
+# answered_at. This trigger enforces one answer per question instead. It locks the
+# attempt row first, so concurrent inserts for one attempt are checked one at a time;
+# the writers (submit_answer and the bot) take that lock already and answer with a
+# friendly error before the trigger would raise unique_violation.
+UNIQUE_ANSWER_SQL = f"""
+    CREATE OR REPLACE FUNCTION {UNIQUE_ANSWER_TRIGGER}() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('{SKIP_UNIQUE_SETTING}', true) = 'on' THEN
+            RETURN NEW;
+        END IF;
+        PERFORM 1 FROM attempts WHERE id = NEW.attempt_id FOR UPDATE;
+        -- A row moved to another partition is seen under its own id
+        IF EXISTS (
+            SELECT 1 FROM {TABLE}
+            WHERE attempt_id = NEW.attempt_id AND question_id = NEW.question_id AND id <> NEW.id
+        ) THEN
+            RAISE unique_violation USING
+                MESSAGE = format('Question %s is already answered in attempt %s', NEW.question_id, NEW.attempt_id),
+                TABLE = '{TABLE}';
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    
+    CREATE OR REPLACE TRIGGER {UNIQUE_ANSWER_TRIGGER}
+    BEFORE INSERT OR UPDATE OF attempt_id, question_id ON {TABLE}
+    FOR EACH ROW EXECUTE FUNCTION {UNIQUE_ANSWER_TRIGGER}();
+"""
+
+
+def month_start(value):
+    """First day of month for date/datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    """Shift first-of-month date by number of months."""
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_{month:%Y_%m}"
+
+
+def is_partitioned(cursor):
+    """Check whether attempt_answers is already a partitioned table."""
+    cursor.execute(
+        """
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        """,
+        [TABLE]
+    )
+    return cursor.fetchone() is not None
+
+
+def list_partitions(cursor):
+    """Get monthly partitions as (month, name) sorted by month."""
+    cursor.execute(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s AND pg_table_is_visible(p.oid)
+        """,
+        [TABLE]
+    )
+    partitions = []
+    for (name,) in cursor.fetchall():
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def table_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+    return cursor.fetchone()[0]
+
+
+def default_partition_months(cursor):
+    """Months of rows that landed in the default partition."""
+    if not table_exists(cursor, DEFAULT_PARTITION):
+        return []
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', answered_at AT TIME ZONE 'UTC')::date FROM {DEFAULT_PARTITION}"
+    )
+    return sorted(month for (month,) in cursor.fetchall())
+
+
+@transaction.atomic
+def create_partition(cursor, month):
+    """Create monthly partition [month, next month) if missing.
+
+    PostgreSQL refuses to create a partition while the default partition has
+    rows of its range, so the default partition is detached, its rows of the
+    month are moved into the new partition and it is attached back.
+    """
+    name = partition_name(month)
+    bounds = [f"{month:%Y-%m-%d} 00:00:00+00", f"{add_months(month, 1):%Y-%m-%d} 00:00:00+00"]
+    if table_exists(cursor, name):
+        return
+    
+    # Keeps rows from landing in the default partition between the check and the creation
+    cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+    move_rows = False
+    if table_exists(cursor, DEFAULT_PARTITION):
+        cursor.execute(
+            f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE answered_at >= %s AND answered_at < %s LIMIT 1",
+            bounds
+        )
+        move_rows = cursor.fetchone() is not None
+    
+    if move_rows:
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {DEFAULT_PARTITION}")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)", bounds)
+    if move_rows:
+        cursor.execute("SELECT set_config(%s, 'on', true)", [SKIP_UNIQUE_SETTING])
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE answered_at >= %s AND answered_at < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """,
+            bounds
+        )
+        cursor.execute("SELECT set_config(%s, 'off', true)", [SKIP_UNIQUE_SETTING])
+        cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+
+
+def ensure_partitions(months_ahead=3, start=None):
+    """Create partitions from start month (default: current) up to months ahead.
+
+    Months that have rows in the default partition get their partitions too.
+    """
+    current = month_start(timezone.now())
+    month = start or current
+    months = []
+    while month <= add_months(current, months_ahead):
+        months.append(month)
+        month = add_months(month, 1)
+    
+    with connection.cursor() as cursor:
+        months = sorted(set(months) | set(default_partition_months(cursor)))
+        for month in months:
+            create_partition(cursor, month)
+    return [partition_name(month) for month in months]
+
+
+@transaction.atomic
+def convert_to_partitioned(months_ahead=3, keep_legacy=False):
+    """Replace plain attempt_answers table with table partitioned by answered_at month.
+
+    Runs in one transaction and holds an exclusive lock on attempt_answers
+    while rows are copied, so it should be run in a maintenance window.
+    """
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return False
+        
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT min(answered_at), COALESCE(max(id), 0) FROM {TABLE}")
+        first_answered_at, max_id = cursor.fetchone()
+        
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE}")
+        cursor.execute("SELECT setval(%s, %s, false)", [SEQUENCE, max_id + 1])
+        
+        # Primary and unique keys must include the partition key
+        cursor.execute(
+            f"""
+            CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (answered_at)
+            """
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, answered_at)")
+        # UNIQUE (attempt_id, question_id) becomes (attempt_id, question_id, answered_at),
+        # one answer per question is enforced by the UNIQUE_ANSWER_SQL trigger
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ADD UNIQUE (attempt_id, question_id, answered_at)"
+        )
+        for column, target in (
+            ('attempt_id', 'attempts'),
+            ('question_id', 'questions'),
+            ('selected_option_id', 'answer_options'),
+        ):
+            cursor.execute(
+                f"""
+                ALTER TABLE {TABLE} ADD FOREIGN KEY ({column})
+                REFERENCES {target} (id) DEFERRABLE INITIALLY DEFERRED
+                """
+            )
+            cursor.execute(f"CREATE INDEX ON {TABLE} ({column})")
+        
+        # Catch-all for rows outside of created months, emptied by ensure_partitions
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+    
+    start = month_start(first_answered_at) if first_answered_at else None
+    ensure_partitions(months_ahead=months_ahead, start=start)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {LEGACY_TABLE}")
+        if not keep_legacy:
+            cursor.execute(f"DROP TABLE {LEGACY_TABLE}")
+    # Rows of the legacy table were unique, the trigger checks new rows only
+    install_unique_answer_check()
+    
+    return True
+
+
+def install_unique_answer_check():
+    """Create or replace the one-answer-per-question trigger of partitioned attempt_answers."""
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return False
+        cursor.execute(UNIQUE_ANSWER_SQL)
+    return True
+
+
+def archive_partition(name, month, output_dir, drop=True):
+    """Dump partition into compressed CSV file, then detach (and drop) it."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{TABLE}_{month:%Y_%m}.csv.gz")
+    tmp_path = f"{path}.tmp"
+    
+    with connection.cursor() as cursor:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH CSV HEADER", archive)
+        with open(tmp_path, 'rb') as archive:
+            os.fsync(archive.fileno())
+        os.replace(tmp_path, path)
+        # The rename itself must be on disk before the partition is dropped
+        directory = os.open(output_dir, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        
+        with transaction.atomic():
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+    
+    return path
+
+
+def archive_old_partitions(retention_months, output_dir, drop=True):
+    """Archive partitions that end before retention window."""
+    cutoff = add_months(month_start(timezone.now()), -retention_months)
+    archived = []
+    with connection.cursor() as cursor:
+        partitions = list_partitions(cursor)
+    
+    for month, name in partitions:
+        if add_months(month, 1) <= cutoff:
+            archived.append(archive_partition(name, month, output_dir, drop=drop))
+    return archived
@@ -0,0 +1,247 @@
+"""Exam readiness: recency-weighted accuracy per category and pass probability.
+
+compute_readiness() splits users into id ranges scored by a pool of forked
+worker processes. A worker loads the answer history of its range (answer rows
+and packed attempts) into NumPy arrays, scores all its users at once and
+upserts their UserReadiness rows.
+"""
+import math
+import multiprocessing
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Count
+from django.utils import timezone
+from apps.tickets.models import Question, Ticket, UserTicketProgress
+from .models import Attempt, AttemptAnswer, UserReadiness
+from .packing import COLUMNS, packed_layout
+
+User = get_user_model()
+
+SECONDS_PER_DAY = 86400
+UPDATE_FIELDS = ['pass_probability', 'accuracy', 'category_accuracy', 'answers_count', 'coverage', 'computed_at']
+
+
+def load_context():
+    """Question -> category lookup arrays and category shares of the exam question pool."""
+    rows = Question.objects.values_list(
+        'id', 'ticket__category_id', 'is_active', 'ticket__status'
+    ).order_by('id')
+    rows = list(rows)
+    categories = sorted({category_id for _, category_id, _, _ in rows}, key=lambda item: (item is not None, item or 0))
+    category_index = {category_id: index for index, category_id in enumerate(categories)}
+    
+    shares = np.zeros(len(categories))
+    for _, category_id, is_active, ticket_status in rows:
+        if is_active and ticket_status == 'published':
+            shares[category_index[category_id]] += 1
+    if shares.sum():
+        shares /= shares.sum()
+    
+    return {
+        'question_ids': np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+        'question_categories': np.fromiter((category_index[row[1]] for row in rows), np.int32, len(rows)),
+        'categories': categories,
+        'shares': shares,
+        'published_tickets': Ticket.objects.filter(status='published').count(),
+    }
+
+
+def user_shards(shard_size):
+    """Yield (first id, last id) ranges of shard_size users."""
+    ids = User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=shard_size)
+    first_id = last_id = None
+    count = 0
+    for user_id in ids:
+        if first_id is None:
+            first_id = user_id
+        last_id = user_id
+        count += 1
+        if count == shard_size:
+            yield first_id, last_id
+            first_id, count = None, 0
+    if first_id is not None:
+        yield first_id, last_id
+
+
+def _decode_packed(data, started_at):
+    """Question ids, correctness and answer timestamps of a packed attempt (see packing.py)."""
+    data = bytes(data)
+    count, offsets, bitmap_offset = packed_layout(data)
+    
+    def column(name):
+        return np.frombuffer(data, '<' + COLUMNS[name], count, offsets[name])
+    
+    question_ids = column('question_ids')
+    answered_offsets = column('answered_offsets')
+    correct_bits = np.frombuffer(data, np.uint8, (count + 7) // 8, bitmap_offset)
+    correct = np.unpackbits(correct_bits, bitorder='little')[:count]
+    return question_ids, correct, started_at.timestamp() + answered_offsets
+
+
+def load_shard_answers(first_id, last_id):
+    """Answers of completed attempts of users in the id range as (user ids, question ids, correct, timestamps)."""
+    user_ids, question_ids, correct, answered_at = array('q'), array('q'), array('b'), array('d')
+    rows = AttemptAnswer.objects.filter(
+        attempt__user_id__range=(first_id, last_id),
+        attempt__status='completed',
+        attempt__packed_answers__isnull=True
+    ).values_list('attempt__user_id', 'question_id', 'is_correct', 'answered_at')
+    for user_id, question_id, is_correct, answered in rows.iterator(chunk_size=settings.READINESS_CHUNK_SIZE):
+        user_ids.append(user_id)
+        question_ids.append(question_id)
+        correct.append(is_correct)
+        answered_at.append(answered.timestamp())
+    
+    parts = [(
+        np.frombuffer(user_ids, np.int64), np.frombuffer(question_ids, np.int64),
+        np.frombuffer(correct, np.int8), np.frombuffer(answered_at, np.float64),
+    )]
+    packed = Attempt.objects.filter(
+        user_id__range=(first_id, last_id),
+        status='completed',
+        packed_answers__isnull=False
+    ).values_list('user_id', 'started_at', 'packed_answers')
+    for user_id, started_at, data in packed.iterator(chunk_size=settings.READINESS_CHUNK_SIZE):
+        attempt_questions, attempt_correct, attempt_answered = _decode_packed(data, started_at)
+        parts.append((
+            np.full(len(attempt_questions), user_id, np.int64), attempt_questions,
+            attempt_correct, attempt_answered,
+        ))
+    return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+
+def pass_probability(error_rate, questions_count, max_mistakes):
+    """Probability of at most max_mistakes errors in questions_count independent questions."""
+    mistakes = np.arange(min(max_mistakes, questions_count) + 1)
+    coefficients = np.array([math.comb(questions_count, k) for k in mistakes], np.float64)
+    error_rate = error_rate[:, None]
+    return (coefficients * error_rate ** mistakes * (1 - error_rate) ** (questions_count - mistakes)).sum(axis=1)
+
+
+def score_answers(user_ids, question_ids, correct, answered_at, context, now):
+    """Score users of the given answers.
+
+    Returns (user ids, accuracy, pass probability, per-category weighted
+    accuracy, per-category answer counts); category columns follow
+    context['categories'].
+    """
+    known_ids = context['question_ids']
+    position = np.minimum(np.searchsorted(known_ids, question_ids), max(len(known_ids) - 1, 0))
+    known = known_ids[position] == question_ids if len(known_ids) else np.zeros(len(question_ids), bool)
+    users, user_index = np.unique(user_ids[known], return_inverse=True)
+    category = context['question_categories'][position[known]]
+    
+    age_days = np.maximum(now - answered_at[known], 0) / SECONDS_PER_DAY
+    weight = np.exp2(-age_days / settings.READINESS_HALF_LIFE_DAYS)
+    
+    categories_count = len(context['categories'])
+    shape = (len(users), categories_count)
+    cell = user_index * categories_count + category
+    weight_sum = np.bincount(cell, weights=weight, minlength=shape[0] * shape[1]).reshape(shape)
+    correct_sum = np.bincount(cell, weights=weight * correct[known], minlength=shape[0] * shape[1]).reshape(shape)
+    counts = np.bincount(cell, minlength=shape[0] * shape[1]).reshape(shape)
+    
+    # Categories with few (or old) answers lean towards the prior accuracy
+    prior = settings.READINESS_PRIOR_STRENGTH
+    category_accuracy = (correct_sum + prior * settings.READINESS_PRIOR_ACCURACY) / (weight_sum + prior)
+    accuracy = correct_sum.sum(axis=1) / np.maximum(weight_sum.sum(axis=1), np.finfo(np.float64).tiny)
+    
+    # Exam questions are drawn from categories in proportion to the question pool
+    error_rate = np.clip((1 - category_accuracy) @ context['shares'], 0, 1)
+    probability = pass_probability(error_rate, settings.EXAM_QUESTIONS_COUNT, settings.EXAM_MAX_MISTAKES)
+    return users, accuracy, probability, category_accuracy, counts
+
+
+def score_shard(shard, context, computed_at):
+    """Score users of an id range and upsert their readiness; returns (users, answers)."""
+    first_id, last_id = shard
+    user_ids, question_ids, correct, answered_at = load_shard_answers(first_id, last_id)
+    if not len(user_ids):
+        return 0, 0
+    
+    users, accuracy, probability, category_accuracy, counts = score_answers(
+        user_ids, question_ids, correct, answered_at, context, computed_at.timestamp()
+    )
+    completed = dict(
+        UserTicketProgress.objects.filter(
+            user_id__range=(first_id, last_id), is_completed=True, ticket__status='published'
+        ).values_list('user_id').annotate(count=Count('id')).order_by()
+    )
+    
+    categories = context['categories']
+    readiness = []
+    for index, user_id in enumerate(users.tolist()):
+        answered = np.flatnonzero(counts[index])
+        readiness.append(UserReadiness(
+            user_id=user_id,
+            pass_probability=round(float(probability[index]), 4),
+            accuracy=round(float(accuracy[index]), 4),
+            category_accuracy={
+                str(categories[column] if categories[column] is not None else 'none'): {
+                    'accuracy': round(float(category_accuracy[index, column]), 4),
+                    'answers': int(counts[index, column]),
+                }
+                for column in answered
+            },
+            answers_count=int(counts[index].sum()),
+            coverage=round(completed.get(user_id, 0) / context['published_tickets'], 4) if context['published_tickets'] else 0.0,
+            computed_at=computed_at,
+        ))
+    UserReadiness.objects.bulk_create(
+        readiness,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=UPDATE_FIELDS
+    )
+    return len(readiness), len(user_ids)
+
+
+def compute_readiness(workers=None, shard_size=None, progress=None):
+    """Recompute readiness of all users in a process pool.
+
+    progress, if given, is called with (users, answers) after every shard.
+    """
+    workers = workers or settings.READINESS_WORKERS or multiprocessing.cpu_count()
+    shard_size = shard_size or settings.READINESS_SHARD_SIZE
+    computed_at = timezone.now()
+    started = time.monotonic()
+    
+    context = load_context()
+    shards = list(user_shards(shard_size))
+    users = answers = 0
+    
+    if workers == 1:
+        results = (score_shard(shard, context, computed_at) for shard in shards)
+        for shard_users, shard_answers in results:
+            users += shard_users
+            answers += shard_answers
+            if progress:
+                progress(users, answers)
+    else:
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        with pool:
+            futures = [pool.submit(score_shard, shard, context, computed_at) for shard in shards]
+            for future in as_completed(futures):
+                shard_users, shard_answers = future.result()
+                users += shard_users
+                answers += shard_answers
+                if progress:
+                    progress(users, answers)
+    
+    seconds = time.monotonic() - started
+    return {
+        'users': users,
+        'answers': answers,
+        'shards': len(shards),
+        'workers': workers,
+        'seconds': round(seconds, 2),
+        'users_per_second': round(users / seconds, 1) if seconds else None,
+    }
@@ -1,57 +1,80 @@
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
-from .models import Attempt, AttemptAnswer, UserStatistics
+from .models import Attempt, UserStatistics, UserReadiness
+from apps.tickets.models import AnswerOption
 from apps.tickets.serializers import TicketListSerializer
 
 
-class AttemptAnswerSerializer(serializers.ModelSerializer):
-    """Serializer for attempt answers."""
-    
-    question_id = serializers.IntegerField(source='question.id')
-    selected_option_id = serializers.IntegerField(source='selected_option.id')
-    selected_option_text = serializers.CharField(source='selected_option.text', read_only=True)
-    correct_option_id = serializers.SerializerMethodField()
-    correct_option_text = serializers.SerializerMethodField()
-    
-    class Meta:
-        model = AttemptAnswer
-        fields = [
-            'id', 'question_id', 'selected_option_id', 'selected_option_text',
-            'correct_option_id', 'correct_option_text', 'is_correct',
-            'time_spent_seconds', 'answered_at'
-        ]
-        read_only_fields = ['id', 'answered_at']
-    
-    def get_correct_option_id(self, obj):
-        """Get correct option ID."""
-        try:
-            correct_option = obj.question.options.filter(is_correct=True).first()
-            return correct_option.id if correct_option else None
-        except:
-            return None
+def load_answer_options(question_ids):
+    """Option texts by option id and (id, text) of the correct option by question id."""
+    option_texts = {}
+    correct_options = {}
+    options = AnswerOption.objects.filter(
+        question_id__in=question_ids
+    ).values_list('id', 'question_id', 'text', 'is_correct')
+    for option_id, question_id, text, is_correct in options:
+        option_texts[option_id] = text
+        if is_correct and question_id not in correct_options:
+            correct_options[question_id] = (option_id, text)
+    return option_texts, correct_options
+
+
+class AttemptListSerializer(serializers.ListSerializer):
+    """Serialize attempts with one answer rows query and one options query for all of them."""
     
-    def get_correct_option_text(self, obj):
-        """Get correct option text."""
-        try:
-            correct_option = obj.question.options.filter(is_correct=True).first()
-            return correct_option.text if correct_option else None
-        except:
-            return None
+    def to_representation(self, data):
+        attempts = list(data.all() if hasattr(data, 'all') else data)
+        # Packed attempts carry their answers, rows are loaded only for the others
+        prefetch_related_objects([attempt for attempt in attempts if attempt.packed_answers is None], 'answers')
+        answers = {attempt.pk: attempt.get_answers() for attempt in attempts}
+        self.context['attempt_answers'] = answers
+        self.context['answer_options'] = load_answer_options(
+            {answer.question_id for attempt_answers in answers.values() for answer in attempt_answers}
+        )
+        return super().to_representation(attempts)
 
 
 class AttemptSerializer(serializers.ModelSerializer):
     """Serializer for attempts."""
     
     ticket = TicketListSerializer(read_only=True)
-    answers = AttemptAnswerSerializer(many=True, read_only=True)
+    answers = serializers.SerializerMethodField()
     
     class Meta:
         model = Attempt
         fields = [
-            'id', 'ticket', 'mode', 'status', 'total_questions',
+            'id', 'ticket', 'question_ids', 'mode', 'status', 'total_questions',
             'correct_answers', 'score_percentage', 'is_passed',
             'started_at', 'completed_at', 'duration_seconds', 'answers'
         ]
         read_only_fields = ['id', 'started_at', 'completed_at', 'duration_seconds']
+        list_serializer_class = AttemptListSerializer
+    
+    def get_answers(self, obj):
+        """Get answers (from packed answers or answer rows) with correct options."""
+        # Loaded for the whole list by AttemptListSerializer
+        answers = self.context.get('attempt_answers', {}).get(obj.pk)
+        if answers is None:
+            answers = obj.get_answers()
+        if not answers:
+            return []
+        
+        option_texts, correct_options = self.context.get('answer_options') or load_answer_options(
+            [answer.question_id for answer in answers]
+        )
+        return [
+            {
+                'question_id': answer.question_id,
+                'selected_option_id': answer.selected_option_id,
+                'selected_option_text': option_texts.get(answer.selected_option_id),
+                'correct_option_id': correct_options.get(answer.question_id, (None, None))[0],
+                'correct_option_text': correct_options.get(answer.question_id, (None, None))[1],
+                'is_correct': answer.is_correct,
+                'time_spent_seconds': answer.time_spent_seconds,
+                'answered_at': answer.answered_at,
+            }
+            for answer in answers
+        ]
 
 
 class CreateAttemptSerializer(serializers.ModelSerializer):
@@ -60,6 +83,15 @@ class CreateAttemptSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attempt
         fields = ['ticket', 'mode']
+        extra_kwargs = {
+            'ticket': {'required': True, 'allow_null': False},
+        }
+    
+    def validate_mode(self, value):
+        """Exam attempts are created from the question pool, not from a ticket."""
+        if value == 'exam':
+            raise serializers.ValidationError("Use exam endpoint to create exam attempts")
+        return value
     
     def create(self, validated_data):
         """Create attempt with user from context."""
@@ -67,6 +99,22 @@ class CreateAttemptSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ExamQuotaSerializer(serializers.Serializer):
+    """Serializer for exam quota (how many questions to draw from a bucket)."""
+    
+    category = serializers.IntegerField(required=False)
+    tag = serializers.CharField(required=False)
+    difficulty = serializers.IntegerField(required=False, min_value=1, max_value=5)
+    count = serializers.IntegerField(min_value=1)
+
+
+class CreateExamSerializer(serializers.Serializer):
+    """Serializer for creating exam attempts."""
+    
+    questions_count = serializers.IntegerField(required=False, min_value=1, max_value=100)
+    quotas = ExamQuotaSerializer(many=True, required=False)
+
+
 class SubmitAnswerSerializer(serializers.Serializer):
     """Serializer for submitting answers."""
     
@@ -75,16 +123,28 @@ class SubmitAnswerSerializer(serializers.Serializer):
     time_spent_seconds = serializers.IntegerField(default=0)
 
 
+class UserReadinessSerializer(serializers.ModelSerializer):
+    """Serializer for exam readiness."""
+    
+    class Meta:
+        model = UserReadiness
+        fields = ['pass_probability', 'accuracy', 'category_accuracy', 'answers_count', 'coverage', 'computed_at']
+        read_only_fields = fields
+
+
 class UserStatisticsSerializer(serializers.ModelSerializer):
     """Serializer for user statistics."""
     
+    # None until the nightly compute_readiness run has seen the user's answers
+    readiness = UserReadinessSerializer(source='user.readiness', read_only=True, default=None)
+    
     class Meta:
         model = UserStatistics
         fields = [
             'total_attempts', 'total_questions_answered', 'total_correct_answers',
             'average_score', 'completed_tickets_count', 'total_time_spent_seconds',
             'average_time_per_question', 'last_attempt_at', 'accuracy_percentage',
-            'total_time_formatted'
+            'total_time_formatted', 'readiness'
         ]
-        read_only_fields = '__all__'
+        read_only_fields = fields
 
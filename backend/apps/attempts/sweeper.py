@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Attempt, AttemptAnswer
+
+logger = logging.getLogger(__name__)
+
+
+def fold_abandoned_progress(attempt_ids):
+    """Add answers of abandoned ticket attempts to user ticket progress."""
+    from apps.tickets.models import UserTicketProgress
+    
+    totals = AttemptAnswer.objects.filter(
+        attempt_id__in=attempt_ids,
+        attempt__ticket__isnull=False
+    ).values('attempt__user_id', 'attempt__ticket_id').annotate(
+        answered=Count('id'),
+        correct=Count('id', filter=Q(is_correct=True))
+    ).order_by()
+    
+    # Answers count towards progress, but an abandoned attempt is not an attempt
+    for row in totals:
+        UserTicketProgress.add_results(
+            row['attempt__user_id'],
+            row['attempt__ticket_id'],
+            row['answered'],
+            row['correct'],
+            attempts=0
+        )
+
+
+def sweep_abandoned_attempts(stale_after=None, batch_size=None, fold_progress=None, max_batches=None):
+    """Mark in-progress attempts without activity as abandoned, in bounded batches."""
+    if stale_after is None:
+        stale_after = settings.ATTEMPT_ABANDON_AFTER_SECONDS
+    if batch_size is None:
+        batch_size = settings.ATTEMPT_SWEEP_BATCH_SIZE
+    if fold_progress is None:
+        fold_progress = settings.ATTEMPT_SWEEP_FOLD_PROGRESS
+    
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    total = 0
+    batches = 0
+    
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            # Served by the partial index on in-progress attempts
+            attempt_ids = list(
+                Attempt.objects.select_for_update(skip_locked=True).filter(
+                    status='in_progress',
+                    updated_at__lt=cutoff
+                ).order_by('updated_at').values_list('id', flat=True)[:batch_size]
+            )
+            if not attempt_ids:
+                break
+            
+            total += Attempt.objects.filter(id__in=attempt_ids).update(
+                status='abandoned',
+                updated_at=timezone.now()
+            )
+            if fold_progress:
+                fold_abandoned_progress(attempt_ids)
+        
+        batches += 1
+    
+    return total
+
+
+def _sweeper_loop(interval):
+    while True:
+        time.sleep(interval)
+        close_old_connections()
+        try:
+            swept = sweep_abandoned_attempts()
+            if swept:
+                logger.info("Marked %s attempts as abandoned", swept)
+        except Exception:
+            logger.exception("Abandoned attempts sweep failed")
+        finally:
+            close_old_connections()
+
+
+_sweeper_thread = None
+
+
+def start_sweeper(interval=None):
+    """Start in-process sweeper thread (once per process)."""
+    global _sweeper_thread
+    if interval is None:
+        interval = settings.ATTEMPT_SWEEP_INTERVAL_SECONDS
+    if not interval or _sweeper_thread is not None:
+        return
+    
+    _sweeper_thread = threading.Thread(
+        target=_sweeper_loop,
+        args=(interval,),
+        name='attempt-sweeper',
+        daemon=True
+    )
+    _sweeper_thread.start()
@@ -0,0 +1,742 @@
+import os
+import stat
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from apps.tickets.models import Ticket, TicketCategory, Question, AnswerOption, UserTicketProgress
+from . import leaderboard, partitioning
+from .sweeper import fold_abandoned_progress, sweep_abandoned_attempts
+from .idempotency import LOCK_KEY, idempotent
+from .packing import PackedAnswer, pack_answers, packed_layout, unpack_answers
+from .readiness import _decode_packed
+from .models import Attempt, AttemptAnswer, UserStatistics
+from config import throttling
+from config.db_router import use_replica_db
+from config.test_runner import TEST_REPLICA_ALIAS
+
+User = get_user_model()
+
+
+@use_replica_db
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def published_tickets_count(request):
+    """Outside DB_REPLICA_PATH_PREFIXES, reads go to a replica only through the override."""
+    return Response({'count': Ticket.objects.filter(status='published').count()})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@idempotent
+def flaky_write(request):
+    """Answers with the next status of flaky_statuses."""
+    status_code = flaky_statuses.pop(0)
+    return Response({'status': status_code}, status=status_code)
+
+
+flaky_statuses = []
+
+urlpatterns = [
+    path('replica-only/', published_tickets_count),
+    path('flaky/', flaky_write),
+    path('', include('config.urls')),
+]
+
+
+@override_settings(
+    REPLICA_DATABASES=[TEST_REPLICA_ALIAS],
+    ROOT_URLCONF=__name__,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Requests read from the replica alias unless they must see the primary."""
+    
+    databases = {'default', TEST_REPLICA_ALIAS}
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader', telegram_id=2001)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        question = Question.objects.create(ticket=self.ticket, text='Вопрос', order=1)
+        AnswerOption.objects.create(question=question, text='Ответ', order=1, is_correct=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def request(self, method, url, **kwargs):
+        """Make a request; returns (response, primary queries, replica queries)."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections[TEST_REPLICA_ALIAS]) as replica:
+                response = getattr(self.client, method)(url, **kwargs)
+        return response, len(primary), len(replica)
+    
+    def test_safe_api_request_reads_from_replica(self):
+        response, primary, replica = self.request('get', '/api/tickets/progress/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+    
+    def test_unsafe_request_uses_primary(self):
+        response, primary, replica = self.request(
+            'post', '/api/attempts/create/', data={'ticket': self.ticket.id, 'mode': 'testing'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+    
+    def test_client_is_pinned_to_primary_after_write(self):
+        self.request('post', '/api/attempts/create/', data={'ticket': self.ticket.id, 'mode': 'testing'}, format='json')
+        
+        response, primary, replica = self.request('get', '/api/attempts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        
+        # Other clients keep reading from the replica
+        response, primary, replica = self.request('get', '/api/attempts/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+    
+    def test_failed_write_does_not_pin(self):
+        response, _, _ = self.request('post', '/api/attempts/create/', data={'mode': 'testing'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        
+        _, primary, replica = self.request('get', '/api/attempts/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+    
+    def test_use_primary_db_overrides_safe_request(self):
+        for url in ('/api/attempts/statistics/', '/api/tickets/stats/'):
+            with self.subTest(url=url):
+                response, primary, replica = self.request('get', url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(primary, 0)
+                self.assertEqual(replica, 0)
+    
+    def test_use_replica_db_overrides_path_prefixes(self):
+        response, primary, replica = self.request('get', '/replica-only/')
+        self.assertEqual(response.data, {'count': 1})
+        self.assertEqual(primary, 0)
+        self.assertEqual(replica, 1)
+
+
+@override_settings(ROOT_URLCONF=__name__, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class IdempotencyTests(TestCase):
+    """Retries with the same Idempotency-Key do the work once."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='retrier', telegram_id=2501)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.question = Question.objects.create(ticket=self.ticket, text='Вопрос', order=1)
+        self.option = AnswerOption.objects.create(question=self.question, text='Ответ', order=1, is_correct=True)
+        self.attempt = Attempt.objects.create(user=self.user, ticket=self.ticket, mode='testing', total_questions=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def submit(self, key):
+        return self.client.post(
+            f'/api/attempts/{self.attempt.id}/submit-answer/',
+            {'question_id': self.question.id, 'selected_option_id': self.option.id, 'time_spent_seconds': 5},
+            format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+    
+    def test_retry_replays_response(self):
+        first = self.submit('answer-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first)
+        
+        retry = self.submit('answer-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(AttemptAnswer.objects.filter(attempt=self.attempt).count(), 1)
+        
+        # A new key is a new request
+        again = self.submit('answer-2')
+        self.assertEqual(again.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', again)
+    
+    def test_retry_while_first_request_runs_conflicts(self):
+        params = {'user_id': self.user.pk, 'path': f'/api/attempts/{self.attempt.id}/submit-answer/', 'key': 'answer-1'}
+        cache.add(LOCK_KEY.format(**params), 1)
+        
+        response = self.submit('answer-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(AttemptAnswer.objects.filter(attempt=self.attempt).exists())
+        
+        cache.delete(LOCK_KEY.format(**params))
+        self.assertEqual(self.submit('answer-1').status_code, 200)
+    
+    def test_server_errors_are_not_cached(self):
+        flaky_statuses[:] = [503, 201, 500]
+        
+        response = self.client.post('/flaky/', HTTP_IDEMPOTENCY_KEY='write-1')
+        self.assertEqual(response.status_code, 503)
+        response = self.client.post('/flaky/', HTTP_IDEMPOTENCY_KEY='write-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        
+        response = self.client.post('/flaky/', HTTP_IDEMPOTENCY_KEY='write-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertEqual(flaky_statuses, [500])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CompleteAttemptConcurrencyTests(TransactionTestCase):
+    """Of concurrent completions of one attempt only one succeeds."""
+    
+    def setUp(self):
+        patcher = mock.patch.object(leaderboard, '_backend', leaderboard.InMemoryLeaderboardBackend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.user = User.objects.create(username='finisher', telegram_id=2601)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.attempt = Attempt.objects.create(
+            user=self.user, ticket=self.ticket, mode='testing', total_questions=2, correct_answers=2
+        )
+    
+    def test_concurrent_completions(self):
+        barrier = threading.Barrier(2)
+        complete = Attempt.complete
+        responses, errors = [], []
+        
+        def complete_after_barrier(attempt):
+            # Both requests have read the attempt as in progress
+            barrier.wait(timeout=10)
+            return complete(attempt)
+        
+        def request(key):
+            try:
+                client = APIClient()
+                client.force_authenticate(self.user)
+                responses.append(client.post(f'/api/attempts/{self.attempt.id}/complete/', HTTP_IDEMPOTENCY_KEY=key))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+        
+        with mock.patch.object(Attempt, 'complete', complete_after_barrier):
+            threads = [threading.Thread(target=request, args=(f'complete-{index}',)) for index in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(response.status_code for response in responses), [200, 404])
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, 'completed')
+        self.assertTrue(self.attempt.is_passed)
+        progress = UserTicketProgress.objects.get(user=self.user, ticket=self.ticket)
+        self.assertEqual(progress.attempts_count, 1)
+
+
+class SweeperTests(TransactionTestCase):
+    """Stale attempts are abandoned in batches by any number of sweepers."""
+    
+    def setUp(self):
+        self.user = User.objects.create(username='sleeper', telegram_id=2701)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.questions = [
+            Question.objects.create(ticket=self.ticket, text=f'Вопрос {order}', order=order) for order in (1, 2)
+        ]
+        self.options = [
+            AnswerOption.objects.create(question=question, text='Ответ', order=1, is_correct=True)
+            for question in self.questions
+        ]
+        self.stale = [self.create_attempt(minutes_ago=60 + index) for index in range(7)]
+        self.fresh = self.create_attempt(minutes_ago=1)
+    
+    def create_attempt(self, minutes_ago, ticket=True, answers=()):
+        attempt = Attempt.objects.create(
+            user=self.user, ticket=self.ticket if ticket else None, mode='testing' if ticket else 'exam'
+        )
+        for question, option, is_correct in answers:
+            AttemptAnswer.objects.create(attempt=attempt, question=question, selected_option=option, is_correct=is_correct)
+        Attempt.objects.filter(pk=attempt.pk).update(updated_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return attempt
+    
+    def abandoned(self):
+        return set(Attempt.objects.filter(status='abandoned').values_list('id', flat=True))
+    
+    def test_batches_oldest_first(self):
+        swept = sweep_abandoned_attempts(stale_after=30 * 60, batch_size=3, fold_progress=False, max_batches=2)
+        self.assertEqual(swept, 6)
+        # The newest stale attempt is left for the next run
+        self.assertEqual(self.abandoned(), {attempt.id for attempt in self.stale[1:]})
+        
+        self.assertEqual(sweep_abandoned_attempts(stale_after=30 * 60, batch_size=3, fold_progress=False), 1)
+        self.assertEqual(Attempt.objects.get(pk=self.fresh.pk).status, 'in_progress')
+    
+    def test_locked_attempts_are_skipped(self):
+        locked = {self.stale[0].id, self.stale[3].id}
+        is_locked, release = threading.Event(), threading.Event()
+        
+        def hold_locks():
+            try:
+                with transaction.atomic():
+                    list(Attempt.objects.select_for_update().filter(id__in=locked))
+                    is_locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+        
+        holder = threading.Thread(target=hold_locks)
+        holder.start()
+        try:
+            self.assertTrue(is_locked.wait(timeout=10))
+            swept = sweep_abandoned_attempts(stale_after=30 * 60, batch_size=2, fold_progress=False)
+        finally:
+            release.set()
+            holder.join()
+        
+        self.assertEqual(swept, 5)
+        self.assertEqual(self.abandoned(), {attempt.id for attempt in self.stale} - locked)
+        self.assertEqual(sweep_abandoned_attempts(stale_after=30 * 60, batch_size=2, fold_progress=False), 2)
+    
+    def test_concurrent_sweepers_fold_each_attempt_once(self):
+        # post_fork starts a sweeper in every worker
+        Attempt.objects.filter(pk__in=[attempt.pk for attempt in self.stale]).delete()
+        answers = [(self.questions[0], self.options[0], True), (self.questions[1], self.options[1], False)]
+        for index in range(6):
+            self.create_attempt(minutes_ago=60 + index, answers=answers)
+        
+        barrier = threading.Barrier(3)
+        swept, errors = [], []
+        
+        def sweep():
+            try:
+                barrier.wait(timeout=10)
+                swept.append(sweep_abandoned_attempts(stale_after=30 * 60, batch_size=1, fold_progress=True))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=sweep) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(swept), 6)
+        progress = UserTicketProgress.objects.get(user=self.user, ticket=self.ticket)
+        self.assertEqual((progress.total_questions_answered, progress.correct_answers_count), (12, 6))
+    
+    def test_fold_keeps_attempts_count(self):
+        UserTicketProgress.add_results(self.user.id, self.ticket.id, 2, 2, score=100)
+        ticket_attempt = self.create_attempt(60, answers=[(self.questions[0], self.options[0], True)])
+        exam_attempt = self.create_attempt(60, ticket=False, answers=[(self.questions[1], self.options[1], True)])
+        
+        fold_abandoned_progress([ticket_attempt.id, exam_attempt.id, self.stale[0].id])
+        progress = UserTicketProgress.objects.get(user=self.user, ticket=self.ticket)
+        self.assertEqual(progress.attempts_count, 1)
+        self.assertEqual(progress.total_questions_answered, 3)
+        self.assertEqual(progress.correct_answers_count, 3)
+        self.assertEqual(progress.best_score, 100)
+        self.assertEqual(UserTicketProgress.objects.count(), 1)
+
+
+class RebuildLeaderboardsTests(TestCase):
+    """rebuild_leaderboards swaps rebuilt boards in without emptying the live ones."""
+    
+    def setUp(self):
+        self.backend = leaderboard.InMemoryLeaderboardBackend()
+        patcher = mock.patch.object(leaderboard, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.users = [User.objects.create(username=f'user{index}', telegram_id=3000 + index) for index in range(3)]
+        for index, user in enumerate(self.users):
+            UserStatistics.objects.create(user=user, completed_tickets_count=index, average_score=50)
+        Attempt.objects.create(
+            user=self.users[0], ticket=self.ticket, mode='testing', status='completed',
+            total_questions=2, correct_answers=2, completed_at=timezone.now(), duration_seconds=40
+        )
+        
+        self.stale_board = leaderboard.TICKET_BOARD.format(ticket_id=self.ticket.id + 100)
+        self.backend.add_many(leaderboard.GLOBAL_BOARD, {'999': 1, str(self.users[2].pk): 5})
+        self.backend.add_many(self.stale_board, {'999': 10})
+        self.backend.add_many(leaderboard.REBUILD_PREFIX + leaderboard.GLOBAL_BOARD, {'998': 1})
+    
+    def rebuild(self):
+        call_command('rebuild_leaderboards', batch_size=2, stdout=StringIO())
+    
+    def test_boards_match_database(self):
+        self.rebuild()
+        
+        self.assertEqual(self.backend.top(leaderboard.GLOBAL_BOARD, 10), [
+            (str(self.users[2].pk), 2050.0), (str(self.users[1].pk), 1050.0), (str(self.users[0].pk), 50.0),
+        ])
+        self.assertEqual(
+            self.backend.top(leaderboard.weekly_board(), 10, reverse=False), [(str(self.users[0].pk), 2.0)]
+        )
+        ticket_board = leaderboard.TICKET_BOARD.format(ticket_id=self.ticket.id)
+        self.assertEqual(self.backend.top(ticket_board, 10), [(str(self.users[0].pk), 40.0)])
+        self.assertEqual(self.backend.board_names(self.stale_board), [])
+        self.assertEqual(self.backend.board_names(f'{leaderboard.REBUILD_PREFIX}*'), [])
+    
+    def test_live_boards_stay_filled_during_rebuild(self):
+        add_many = self.backend.add_many
+        seen = []
+        
+        def record_live_board(board, scores, ttl=None):
+            seen.append(len(self.backend.top(leaderboard.GLOBAL_BOARD, 10)))
+            add_many(board, scores, ttl=ttl)
+        
+        with mock.patch.object(self.backend, 'add_many', record_live_board):
+            self.rebuild()
+        self.assertEqual(seen[:2], [2, 2])
+        self.assertNotIn(0, seen)
+
+
+class RedisLeaderboardBackendTests(SimpleTestCase):
+    """Board replacement on Redis."""
+    
+    def setUp(self):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            self.backend = leaderboard.RedisLeaderboardBackend()
+        self.client = self.backend.client
+    
+    def test_replace_renames_source_over_board(self):
+        self.backend.add_many('board', {'1': 1, '2': 2})
+        self.backend.add_many('rebuilt', {'3': 3}, ttl=leaderboard.REBUILD_TTL)
+        
+        self.backend.replace('board', 'rebuilt')
+        self.assertEqual(self.backend.top('board', 10), [('3', 3.0)])
+        self.assertFalse(self.client.exists('rebuilt'))
+        self.assertEqual(self.client.ttl('board'), -1)
+        
+        self.backend.add_many('rebuilt', {'4': 4}, ttl=leaderboard.REBUILD_TTL)
+        self.backend.replace('board', 'rebuilt', ttl=60)
+        self.assertTrue(0 < self.client.ttl('board') <= 60)
+    
+    def test_replace_with_missing_source_clears_board(self):
+        self.backend.add_many('board', {'1': 1})
+        self.backend.replace('board', 'rebuilt')
+        self.assertFalse(self.client.exists('board'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class AttemptListQueryTests(TestCase):
+    """Attempt list runs the same queries for any number of attempts on the page."""
+    
+    def setUp(self):
+        self.user = User.objects.create(username='lister', telegram_id=4001)
+        category = TicketCategory.objects.create(name='Категория')
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published', category=category)
+        UserTicketProgress.objects.create(user=self.user, ticket=self.ticket, attempts_count=1)
+        self.questions = []
+        for order in range(1, 4):
+            question = Question.objects.create(ticket=self.ticket, text=f'Вопрос {order}', order=order)
+            for option_order in range(1, 3):
+                AnswerOption.objects.create(
+                    question=question, text=f'Ответ {order}.{option_order}', order=option_order,
+                    is_correct=option_order == 1
+                )
+            self.questions.append(question)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def create_attempts(self, count, packed=False):
+        for _ in range(count):
+            attempt = Attempt.objects.create(
+                user=self.user, ticket=self.ticket, mode='testing', status='completed',
+                total_questions=len(self.questions), correct_answers=1, completed_at=timezone.now()
+            )
+            for index, question in enumerate(self.questions):
+                AttemptAnswer.objects.create(
+                    attempt=attempt, question=question,
+                    selected_option=question.options.get(order=1 if index == 0 else 2), is_correct=index == 0
+                )
+            if packed:
+                attempt.pack_answers(prune=True)
+    
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/attempts/')
+        self.assertEqual(response.status_code, 200)
+        return len(context), response.data['results']
+    
+    def test_query_count_does_not_grow_with_attempts(self):
+        self.create_attempts(1)
+        self.create_attempts(1, packed=True)
+        few, _ = self.count_queries()
+        
+        self.create_attempts(4)
+        self.create_attempts(4, packed=True)
+        many, results = self.count_queries()
+        self.assertEqual(len(results), 10)
+        self.assertEqual(few, many)
+    
+    def test_packed_attempts_skip_answer_rows_query(self):
+        self.create_attempts(2)
+        unpacked, _ = self.count_queries()
+        Attempt.objects.all().delete()
+        
+        self.create_attempts(2, packed=True)
+        packed, _ = self.count_queries()
+        self.assertEqual(packed, unpacked - 1)
+    
+    def test_answers_of_packed_and_unpacked_attempts(self):
+        self.create_attempts(1)
+        self.create_attempts(1, packed=True)
+        _, results = self.count_queries()
+        
+        expected = [
+            (question.id, f'Ответ {index + 1}.{1 if index == 0 else 2}', f'Ответ {index + 1}.1', index == 0)
+            for index, question in enumerate(self.questions)
+        ]
+        for result in results:
+            self.assertEqual(result['ticket']['user_progress']['attempts_count'], 1)
+            self.assertEqual([
+                (answer['question_id'], answer['selected_option_text'], answer['correct_option_text'], answer['is_correct'])
+                for answer in result['answers']
+            ], expected)
+
+
+class PartitioningTests(TestCase):
+    """Rows that land in the default partition get a partition of their month.
+
+    The conversion runs inside the test transaction and is rolled back with it.
+    """
+    
+    def setUp(self):
+        user = User.objects.create(username='partitioned', telegram_id=5001)
+        ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.question = Question.objects.create(ticket=ticket, text='Вопрос', order=1)
+        self.option = AnswerOption.objects.create(question=self.question, text='Ответ', order=1, is_correct=True)
+        self.attempt = Attempt.objects.create(user=user, ticket=ticket, mode='testing')
+        AttemptAnswer.objects.create(
+            attempt=self.attempt, question=self.question, selected_option=self.option, is_correct=True
+        )
+        # Deferred FK checks of the rows above would block dropping the old table
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        partitioning.convert_to_partitioned(months_ahead=1)
+    
+    def count_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            return cursor.fetchone()[0]
+    
+    def test_rows_beyond_ensured_months_are_moved_out_of_default(self):
+        current = partitioning.month_start(timezone.now())
+        far_month = partitioning.add_months(current, 6)
+        AttemptAnswer.objects.update(answered_at=timezone.now() + timedelta(days=31 * 6))
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 1)
+        
+        created = partitioning.ensure_partitions(months_ahead=1)
+        self.assertEqual(created[-1], partitioning.partition_name(far_month))
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 0)
+        self.assertEqual(self.count_rows(partitioning.partition_name(far_month)), 1)
+        self.assertEqual(AttemptAnswer.objects.count(), 1)
+        
+        # The default partition is attached again and still catches unknown months
+        AttemptAnswer.objects.update(answered_at=timezone.now() + timedelta(days=31 * 9))
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 1)
+    
+    def test_create_partition_for_month_in_default(self):
+        month = partitioning.add_months(partitioning.month_start(timezone.now()), 4)
+        AttemptAnswer.objects.update(answered_at=timezone.now() + timedelta(days=31 * 4))
+        
+        with connection.cursor() as cursor:
+            partitioning.create_partition(cursor, month)
+            partitioning.create_partition(cursor, month)
+        self.assertEqual(self.count_rows(partitioning.partition_name(month)), 1)
+        self.assertEqual(self.count_rows(partitioning.DEFAULT_PARTITION), 0)
+    
+    def answer(self, question=None, answered_at=None):
+        """Insert an answer; answered_at can't be passed through the ORM (auto_now_add)."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {partitioning.TABLE} (
+                    attempt_id, question_id, selected_option_id, is_correct, time_spent_seconds, answered_at
+                )
+                VALUES (%s, %s, %s, true, 0, %s) RETURNING id
+                """,
+                [self.attempt.id, (question or self.question).id, self.option.id, answered_at or timezone.now()]
+            )
+            return cursor.fetchone()[0]
+    
+    def test_second_answer_to_question_is_rejected(self):
+        other_question = Question.objects.create(ticket=self.question.ticket, text='Вопрос 2', order=2)
+        next_month = timezone.now() + timedelta(days=31)
+        
+        for answered_at in (None, next_month):
+            with self.subTest(answered_at=answered_at):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    self.answer(answered_at=answered_at)
+        
+        answer_id = self.answer(other_question, answered_at=next_month)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            AttemptAnswer.objects.filter(pk=answer_id).update(question=self.question)
+        
+        # Moving an answer to another month is not a second answer
+        AttemptAnswer.objects.filter(question=self.question).update(answered_at=next_month)
+        self.assertEqual(AttemptAnswer.objects.count(), 2)
+    
+    def test_moved_rows_are_not_rechecked(self):
+        month = partitioning.add_months(partitioning.month_start(timezone.now()), 4)
+        AttemptAnswer.objects.update(answered_at=timezone.now() + timedelta(days=31 * 4))
+        
+        with connection.cursor() as cursor:
+            partitioning.create_partition(cursor, month)
+            cursor.execute("SELECT current_setting(%s, true)", [partitioning.SKIP_UNIQUE_SETTING])
+            self.assertEqual(cursor.fetchone()[0], 'off')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.answer()
+    
+    def test_archive_is_durable_before_drop(self):
+        events = []
+        fsync = os.fsync
+        
+        def record_fsync(fd):
+            events.append('fsync directory' if stat.S_ISDIR(os.fstat(fd).st_mode) else 'fsync file')
+            fsync(fd)
+        
+        def record_sql(execute, sql, params, many, context):
+            if sql.startswith(('ALTER', 'DROP')):
+                events.append(sql.split(' ')[0])
+            return execute(sql, params, many, context)
+        
+        month = partitioning.month_start(timezone.now())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output_dir = os.path.join(directory.name, 'archive')
+        with mock.patch('os.fsync', record_fsync), connection.execute_wrapper(record_sql):
+            path = partitioning.archive_partition(partitioning.partition_name(month), month, output_dir)
+        
+        self.assertEqual(events, ['fsync file', 'fsync directory', 'ALTER', 'DROP'])
+        self.assertEqual(os.listdir(output_dir), [os.path.basename(path)])
+        self.assertEqual(AttemptAnswer.objects.count(), 0)
+    
+    @override_settings(ATTEMPT_PACK_ANSWERS=True, ATTEMPT_PRUNE_PACKED_ANSWERS=False)
+    def test_archive_packs_attempts_completed_by_bot(self):
+        # The bot completes attempts without packing them
+        Attempt.objects.filter(pk=self.attempt.pk).update(status='completed', completed_at=timezone.now())
+        old_month = partitioning.add_months(partitioning.month_start(timezone.now()), -2)
+        AttemptAnswer.objects.update(answered_at=timezone.make_aware(datetime(old_month.year, old_month.month, 10)))
+        partitioning.ensure_partitions(months_ahead=0, start=old_month)
+        
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        call_command('archive_attempt_answers', retention_months=1, output_dir=directory.name, stdout=StringIO())
+        
+        self.assertEqual(os.listdir(directory.name), [f'{partitioning.partition_name(old_month)}.csv.gz'])
+        self.assertFalse(AttemptAnswer.objects.exists())
+        attempt = Attempt.objects.get(pk=self.attempt.pk)
+        self.assertIsNotNone(attempt.packed_answers)
+        self.assertEqual([answer.question_id for answer in attempt.get_answers()], [self.question.id])
+
+
+class PackedAnswersTests(SimpleTestCase):
+    """pack_answers output is read back the same by unpack_answers and the NumPy decoder."""
+    
+    def setUp(self):
+        self.started_at = datetime(2026, 9, 1, 12, 0, tzinfo=dt_timezone.utc)
+        self.answers = [
+            PackedAnswer(
+                question_id=2 ** 40 + index, selected_option_id=100 + index, is_correct=index % 3 == 0,
+                time_spent_seconds=index * 7, answered_at=self.started_at + timedelta(seconds=30 * index)
+            )
+            for index in range(11)
+        ]
+        self.data = pack_answers(self.answers, self.started_at)
+    
+    def test_unpack_answers(self):
+        self.assertEqual(unpack_answers(self.data, self.started_at), self.answers)
+        self.assertEqual(unpack_answers(pack_answers([], self.started_at), self.started_at), [])
+    
+    def test_numpy_decoder(self):
+        question_ids, correct, answered_at = _decode_packed(self.data, self.started_at)
+        self.assertEqual(question_ids.tolist(), [answer.question_id for answer in self.answers])
+        self.assertEqual(correct.tolist(), [int(answer.is_correct) for answer in self.answers])
+        self.assertEqual(answered_at.tolist(), [answer.answered_at.timestamp() for answer in self.answers])
+    
+    def test_layout(self):
+        count, offsets, bitmap_offset = packed_layout(self.data)
+        self.assertEqual(count, 11)
+        self.assertEqual(bitmap_offset + 2, len(self.data))
+        with self.assertRaises(ValueError):
+            packed_layout(b'\x02' + self.data[1:])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/0'}},
+    API_THROTTLE_ENABLED=True,
+    API_THROTTLE_RATES={'read': (0.01, 2), 'write': (0.01, 2), 'expensive': (0.01, 1)},
+)
+class TokenBucketThrottleTests(TestCase):
+    """Token buckets live in Redis and are shared by all workers."""
+    
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        patcher = mock.patch(
+            'django.core.cache.backends.redis.RedisCacheClient.get_client', return_value=self.redis
+        )
+        self.get_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(throttling, 'buckets', throttling.RedisBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='throttled', telegram_id=6001))
+    
+    def test_bucket_is_shared_between_workers(self):
+        first, second = throttling.RedisBuckets(), throttling.RedisBuckets()
+        self.assertEqual(first.consume('throttle:test', 0.01, 3), (True, 2.0))
+        self.assertTrue(second.consume('throttle:test', 0.01, 3)[0])
+        self.assertTrue(first.consume('throttle:test', 0.01, 3)[0])
+        self.assertFalse(second.consume('throttle:test', 0.01, 3)[0])
+        self.assertEqual(first.local._buckets, {})
+        self.assertEqual(len(self.redis.keys('*throttle:test')), 1)
+    
+    def test_rate_limit_headers_and_429(self):
+        for remaining in (1, 0):
+            response = self.client.get('/api/tickets/progress/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['RateLimit-Limit'], '2')
+            self.assertEqual(response['RateLimit-Remaining'], str(remaining))
+            self.assertEqual(response['RateLimit-Policy'], '2;w=200')
+        
+        response = self.client.get('/api/tickets/progress/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+        self.assertTrue(90 <= int(response['Retry-After']) <= 100)
+        
+        # Writes have their own bucket
+        response = self.client.post('/api/attempts/create/', data={'mode': 'testing'}, format='json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_falls_back_to_local_buckets_while_redis_is_down(self):
+        self.get_client.side_effect = ConnectionError('Redis is down')
+        buckets = throttling.RedisBuckets()
+        with self.assertLogs('config.throttling', 'WARNING'):
+            self.assertEqual(buckets.consume('throttle:test', 0.01, 1), (True, 0.0))
+        self.assertFalse(buckets.consume('throttle:test', 0.01, 1)[0])
+        # Redis is not retried on every request
+        self.assertEqual(self.get_client.call_count, 1)
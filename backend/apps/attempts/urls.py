@@ -1,16 +1,21 @@
 from django.urls import path
 from .views import (
-    AttemptListView, AttemptDetailView, create_attempt, submit_answer,
-    complete_attempt, get_user_statistics, get_attempt_review
+    AttemptListView, AttemptDetailView, create_attempt, create_exam_attempt,
+    submit_answer, complete_attempt, get_user_statistics, get_attempt_review,
+    get_global_leaderboard, get_weekly_leaderboard, get_ticket_leaderboard
 )
 
 urlpatterns = [
     path('', AttemptListView.as_view(), name='attempt-list'),
     path('<int:pk>/', AttemptDetailView.as_view(), name='attempt-detail'),
     path('create/', create_attempt, name='create-attempt'),
+    path('exam/', create_exam_attempt, name='create-exam-attempt'),
     path('<int:attempt_id>/submit-answer/', submit_answer, name='submit-answer'),
     path('<int:attempt_id>/complete/', complete_attempt, name='complete-attempt'),
     path('<int:attempt_id>/review/', get_attempt_review, name='attempt-review'),
     path('statistics/', get_user_statistics, name='user-statistics'),
+    path('leaderboard/', get_global_leaderboard, name='leaderboard-global'),
+    path('leaderboard/weekly/', get_weekly_leaderboard, name='leaderboard-weekly'),
+    path('leaderboard/tickets/<int:ticket_id>/', get_ticket_leaderboard, name='leaderboard-ticket'),
 ]
 
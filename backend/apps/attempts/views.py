@@ -1,16 +1,27 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from .models import Attempt, AttemptAnswer, UserStatistics
 from .serializers import (
-    AttemptSerializer, CreateAttemptSerializer, SubmitAnswerSerializer,
-    UserStatisticsSerializer
+    AttemptSerializer, CreateAttemptSerializer, CreateExamSerializer,
+    SubmitAnswerSerializer, UserStatisticsSerializer
 )
 from apps.users.authentication import TelegramAuthentication
-from apps.tickets.models import Ticket, Question, AnswerOption
+from apps.tickets.models import Ticket, Question, AnswerOption, UserTicketProgress
+from apps.tickets.serializers import QuestionWithAnswerSerializer
+from apps.tickets.exam import assemble_exam, ExamAssemblyError
+from apps.tickets.answer_keys import get_answer_keys
+from . import leaderboard
+from .idempotency import idempotent
+from config.db_router import use_primary_db
+from config.throttling import ExpensiveThrottle
 
 
 class AttemptListView(generics.ListAPIView):
@@ -23,9 +34,17 @@ class AttemptListView(generics.ListAPIView):
     
     def get_queryset(self):
         """Get user's attempts."""
+        # Answer rows are loaded by AttemptListSerializer, only for attempts that are not packed
         return Attempt.objects.filter(
             user=self.request.user
-        ).prefetch_related('ticket', 'answers').order_by('-started_at')
+        ).prefetch_related(
+            'ticket__category',
+            Prefetch(
+                'ticket__user_progress',
+                queryset=UserTicketProgress.objects.filter(user=self.request.user),
+                to_attr='current_user_progress'
+            )
+        ).order_by('-started_at')
 
 
 class AttemptDetailView(generics.RetrieveAPIView):
@@ -40,11 +59,12 @@ class AttemptDetailView(generics.RetrieveAPIView):
         """Get user's attempts."""
         return Attempt.objects.filter(
             user=self.request.user
-        ).prefetch_related('ticket', 'answers__question', 'answers__selected_option')
+        ).prefetch_related('ticket')
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_attempt(request):
     """Create new attempt."""
     serializer = CreateAttemptSerializer(
@@ -80,10 +100,51 @@ def create_attempt(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([ExpensiveThrottle])
+@idempotent
+def create_exam_attempt(request):
+    """Create exam attempt with questions drawn from the whole question bank."""
+    serializer = CreateExamSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        question_ids = assemble_exam(
+            questions_count=serializer.validated_data.get('questions_count'),
+            quotas=serializer.validated_data.get('quotas'),
+        )
+    except ExamAssemblyError as exc:
+        return Response(
+            {'error': str(exc)}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    attempt = Attempt.objects.create(
+        user=request.user,
+        mode='exam',
+        question_ids=question_ids,
+        total_questions=len(question_ids)
+    )
+    
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related('options')
+    questions_by_id = {question.id: question for question in questions}
+    ordered_questions = [questions_by_id[question_id] for question_id in question_ids]
+    
+    return Response({
+        'attempt': AttemptSerializer(attempt).data,
+        'questions': QuestionWithAnswerSerializer(ordered_questions, many=True).data,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+@transaction.atomic
 def submit_answer(request, attempt_id):
     """Submit answer for question in attempt."""
     try:
-        attempt = Attempt.objects.get(
+        # Row lock serializes answers and completion of the same attempt
+        attempt = Attempt.objects.select_for_update().get(
             id=attempt_id,
             user=request.user,
             status='in_progress'
@@ -102,48 +163,87 @@ def submit_answer(request, attempt_id):
     selected_option_id = serializer.validated_data['selected_option_id']
     time_spent = serializer.validated_data['time_spent_seconds']
     
-    try:
-        question = Question.objects.get(id=question_id, ticket=attempt.ticket)
-        selected_option = AnswerOption.objects.get(id=selected_option_id, question=question)
-    except (Question.DoesNotExist, AnswerOption.DoesNotExist):
-        return Response(
-            {'error': 'Question or option not found'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
+    # Grade from the mapped answer keys, falling back to the database for questions not in them
+    answer_keys = get_answer_keys()
+    question_key = answer_keys.get(question_id) if answer_keys is not None else None
+    question = None
     
-    # Check if answer already exists
-    if AttemptAnswer.objects.filter(attempt=attempt, question=question).exists():
+    if question_key is not None:
+        # Exam attempts are graded against their own set of questions
+        if attempt.ticket_id:
+            in_attempt = question_key.ticket_id == attempt.ticket_id
+        else:
+            in_attempt = question_id in attempt.question_ids
+        if not in_attempt or selected_option_id not in question_key.option_ids:
+            return Response(
+                {'error': 'Question or option not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        is_correct = selected_option_id in question_key.correct_option_ids
+        correct_option_id = question_key.correct_option_ids[0] if question_key.correct_option_ids else None
+    else:
+        questions = Question.objects.all()
+        if attempt.ticket_id:
+            questions = questions.filter(ticket_id=attempt.ticket_id)
+        else:
+            questions = questions.filter(id__in=attempt.question_ids)
+        
+        try:
+            question = questions.get(id=question_id)
+            selected_option = AnswerOption.objects.get(id=selected_option_id, question=question)
+        except (Question.DoesNotExist, AnswerOption.DoesNotExist):
+            return Response(
+                {'error': 'Question or option not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        is_correct = selected_option.is_correct
+        correct_option_id = question.options.filter(is_correct=True).values_list('id', flat=True).first()
+    
+    # One answer per question. The attempt row lock taken above keeps concurrent submits
+    # from both passing this check; the unique constraint (a trigger once attempt_answers
+    # is partitioned) only backs it up.
+    if AttemptAnswer.objects.filter(attempt=attempt, question_id=question_id).exists():
         return Response(
             {'error': 'Answer already submitted for this question'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if answer is correct
-    is_correct = selected_option.is_correct
-    
     # Create answer
     answer = AttemptAnswer.objects.create(
         attempt=attempt,
-        question=question,
-        selected_option=selected_option,
+        question_id=question_id,
+        selected_option_id=selected_option_id,
         is_correct=is_correct,
         time_spent_seconds=time_spent
     )
     
     # Update attempt counters
-    attempt.correct_answers += 1 if is_correct else 0
-    attempt.save()
+    Attempt.objects.filter(pk=attempt.pk).update(
+        correct_answers=F('correct_answers') + (1 if is_correct else 0),
+        updated_at=timezone.now()
+    )
+    
+    if attempt.mode != 'learning':
+        return Response({
+            'is_correct': is_correct,
+            'correct_option_id': correct_option_id,
+            'explanation': None,
+            'explanation_image': None,
+        })
     
+    if question is None:
+        question = Question.objects.only('explanation', 'explanation_image').get(id=question_id)
     return Response({
         'is_correct': is_correct,
-        'correct_option_id': question.options.filter(is_correct=True).first().id,
-        'explanation': question.explanation if attempt.mode == 'learning' else None,
-        'explanation_image': question.explanation_image.url if question.explanation_image and attempt.mode == 'learning' else None,
+        'correct_option_id': correct_option_id,
+        'explanation': question.explanation,
+        'explanation_image': question.explanation_image.url if question.explanation_image else None,
     })
 
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def complete_attempt(request, attempt_id):
     """Complete attempt and calculate final results."""
     try:
@@ -158,8 +258,12 @@ def complete_attempt(request, attempt_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Complete attempt
-    attempt.complete()
+    # Complete attempt; a concurrent request may have completed it first
+    if not attempt.complete():
+        return Response(
+            {'error': 'Attempt not found or not in progress'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
     
     # Update user statistics
     user = request.user
@@ -169,9 +273,12 @@ def complete_attempt(request, attempt_id):
         UserStatistics.objects.create(user=user)
         user.statistics.update_statistics()
     
+    leaderboard.record_attempt(attempt, user.statistics)
+    
     return Response(AttemptSerializer(attempt).data)
 
 
+@use_primary_db
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_statistics(request):
@@ -205,25 +312,32 @@ def get_attempt_review(request, attempt_id):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get all answers with explanations
-    answers = AttemptAnswer.objects.filter(attempt=attempt).select_related(
-        'question', 'selected_option'
-    ).prefetch_related('question__options')
+    # Answers are decoded from packed answers when answer rows were pruned
+    answers = attempt.get_answers()
+    questions = Question.objects.filter(
+        id__in=[answer.question_id for answer in answers]
+    ).prefetch_related('options')
+    questions_by_id = {question.id: question for question in questions}
     
     review_data = []
     for answer in answers:
-        correct_option = answer.question.options.filter(is_correct=True).first()
+        question = questions_by_id.get(answer.question_id)
+        if question is None:
+            continue
+        options = question.options.all()
+        correct_option = next((option for option in options if option.is_correct), None)
+        selected_option = next((option for option in options if option.id == answer.selected_option_id), None)
         review_data.append({
-            'question_id': answer.question.id,
-            'question_text': answer.question.text,
-            'question_image': answer.question.image.url if answer.question.image else None,
-            'selected_option_id': answer.selected_option.id,
-            'selected_option_text': answer.selected_option.text,
+            'question_id': question.id,
+            'question_text': question.text,
+            'question_image': question.image.url if question.image else None,
+            'selected_option_id': answer.selected_option_id,
+            'selected_option_text': selected_option.text if selected_option else None,
             'correct_option_id': correct_option.id if correct_option else None,
             'correct_option_text': correct_option.text if correct_option else None,
             'is_correct': answer.is_correct,
-            'explanation': answer.question.explanation,
-            'explanation_image': answer.question.explanation_image.url if answer.question.explanation_image else None,
+            'explanation': question.explanation,
+            'explanation_image': question.explanation_image.url if question.explanation_image else None,
             'time_spent_seconds': answer.time_spent_seconds,
         })
     
@@ -232,3 +346,48 @@ def get_attempt_review(request, attempt_id):
         'review': review_data,
     })
 
+
+
+def leaderboard_response(request, board, reverse=True):
+    """Top of leaderboard with display names and current user's rank."""
+    backend = leaderboard.get_backend()
+    top = backend.top(board, settings.LEADERBOARD_SIZE, reverse=reverse)
+    
+    users = get_user_model().objects.in_bulk([int(member) for member, _ in top])
+    entries = []
+    for position, (member, score) in enumerate(top, start=1):
+        user = users.get(int(member))
+        entries.append({
+            'rank': position,
+            'user_id': int(member),
+            'display_name': user.display_name if user else None,
+            'score': score,
+        })
+    
+    me = backend.rank(board, str(request.user.id), reverse=reverse)
+    return Response({
+        'entries': entries,
+        'me': {'rank': me[0], 'score': me[1]} if me else None,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_global_leaderboard(request):
+    """Global leaderboard (completed tickets, then average score)."""
+    return leaderboard_response(request, leaderboard.GLOBAL_BOARD)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_weekly_leaderboard(request):
+    """Weekly leaderboard by correct answers."""
+    return leaderboard_response(request, leaderboard.weekly_board())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ticket_leaderboard(request, ticket_id):
+    """Fastest perfect testing runs of ticket."""
+    board = leaderboard.TICKET_BOARD.format(ticket_id=ticket_id)
+    return leaderboard_response(request, board, reverse=False)
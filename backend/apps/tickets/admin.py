@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import TicketCategory, Ticket, Question, AnswerOption, UserTicketProgress
+from apps.admin_panel.pagination import EstimatedCountPaginator
+from .models import (
+    TicketCategory, Ticket, Question, AnswerOption, UserTicketProgress, Tag, QuestionTag, TelegramMedia
+)
 
 
 class AnswerOptionInline(admin.TabularInline):
@@ -14,10 +17,26 @@ class QuestionInline(admin.TabularInline):
     """Inline admin for questions."""
     model = Question
     extra = 0
-    fields = ['text', 'image', 'order', 'difficulty_level', 'tags', 'is_active']
+    fields = ['text', 'image', 'order', 'difficulty_level', 'is_active']
     ordering = ['order']
 
 
+class QuestionTagInline(admin.TabularInline):
+    """Inline admin for question tags."""
+    model = QuestionTag
+    extra = 0
+    autocomplete_fields = ['tag']
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    """Admin configuration for Tag model."""
+    
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    ordering = ['name']
+
+
 @admin.register(TicketCategory)
 class TicketCategoryAdmin(admin.ModelAdmin):
     """Admin configuration for TicketCategory model."""
@@ -70,15 +89,15 @@ class QuestionAdmin(admin.ModelAdmin):
     
     list_display = [
         'ticket', 'order', 'text_short', 'difficulty_level', 
-        'tags', 'is_active', 'created_by', 'created_at'
+        'tags_list', 'is_active', 'created_by', 'created_at'
     ]
-    list_filter = ['ticket', 'difficulty_level', 'is_active', 'created_at']
-    search_fields = ['text', 'explanation', 'tags']
+    list_filter = ['ticket', 'difficulty_level', 'tags', 'is_active', 'created_at']
+    search_fields = ['text', 'explanation', '=tags__name']
     ordering = ['ticket', 'order']
     
     fieldsets = (
         ('Question', {
-            'fields': ('ticket', 'text', 'image', 'order', 'difficulty_level', 'tags')
+            'fields': ('ticket', 'text', 'image', 'order', 'difficulty_level')
         }),
         ('Explanation', {
             'fields': ('explanation', 'explanation_image')
@@ -94,13 +113,22 @@ class QuestionAdmin(admin.ModelAdmin):
     
     readonly_fields = ['created_at', 'updated_at']
     
-    inlines = [AnswerOptionInline]
+    inlines = [AnswerOptionInline, QuestionTagInline]
+    
+    def get_queryset(self, request):
+        """Prefetch tags for list display."""
+        return super().get_queryset(request).prefetch_related('tags')
     
     def text_short(self, obj):
         """Short version of question text."""
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     text_short.short_description = 'Question Text'
     
+    def tags_list(self, obj):
+        """Comma-separated tag names."""
+        return ', '.join(tag.name for tag in obj.tags.all())
+    tags_list.short_description = 'Tags'
+    
     def save_model(self, request, obj, form, change):
         """Set created_by when creating new question."""
         if not change:
@@ -146,9 +174,13 @@ class UserTicketProgressAdmin(admin.ModelAdmin):
         'user', 'ticket', 'is_completed', 'attempts_count', 
         'best_score', 'correct_answers_count', 'updated_at'
     ]
-    list_filter = ['is_completed', 'ticket', 'updated_at']
-    search_fields = ['user__display_name', 'ticket__number', 'ticket__title']
+    list_filter = ['is_completed', 'updated_at']
+    search_fields = ['=user__telegram_id', '=ticket__number']
     ordering = ['-updated_at']
+    list_select_related = ['user', 'ticket']
+    autocomplete_fields = ['user', 'ticket']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Progress', {
@@ -165,3 +197,12 @@ class UserTicketProgressAdmin(admin.ModelAdmin):
     
     readonly_fields = ['created_at', 'updated_at']
 
+
+@admin.register(TelegramMedia)
+class TelegramMediaAdmin(admin.ModelAdmin):
+    """Admin configuration for TelegramMedia model."""
+    
+    list_display = ['path', 'sha256', 'file_id', 'updated_at']
+    search_fields = ['=sha256', 'path']
+    ordering = ['-updated_at']
+    readonly_fields = ['sha256', 'file_id', 'file_unique_id', 'path', 'created_at', 'updated_at']
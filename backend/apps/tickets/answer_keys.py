@@ -0,0 +1,181 @@
+"""Answer keys in a memory-mapped file shared by all worker processes of a host.
+
+File layout (native byte order, sections aligned to 8 bytes):
+    header     magic, format, content version, questions count, options count
+    questions  int64[n]       sorted question ids
+    tickets    int64[n]       ticket id of each question
+    offsets    uint32[n + 1]  options of question i are options[offsets[i]:offsets[i + 1]]
+    options    int64[m]       option ids in display order
+    correct    bit per option
+
+The file is replaced atomically; workers notice the new inode and remap it.
+Keys built for an older content version are not used, so grading falls back
+to the database until one process of the host has rebuilt the file.
+"""
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from collections import namedtuple
+from django.conf import settings
+from django.db import connections
+from .content import get_content_version, get_local_content_version
+from .models import AnswerOption
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('=4sIQII')
+MAGIC = b'GDAK'
+FORMAT_VERSION = 1
+
+QuestionKey = namedtuple('QuestionKey', ['ticket_id', 'option_ids', 'correct_option_ids'])
+
+
+def _padding(size):
+    return b'\0' * (-size % 8)
+
+
+def build_answer_keys(path=None):
+    """Write answer keys of published tickets to path, replacing the file atomically."""
+    path = path or settings.ANSWER_KEYS_PATH
+    version = get_content_version()
+    rows = AnswerOption.objects.filter(
+        question__ticket__status='published'
+    ).values_list('question_id', 'question__ticket_id', 'id', 'is_correct').order_by('question_id', 'order', 'id')
+    
+    question_ids, ticket_ids, offsets, option_ids = array('q'), array('q'), array('I'), array('q')
+    correct = []
+    for question_id, ticket_id, option_id, is_correct in rows.iterator():
+        if not question_ids or question_ids[-1] != question_id:
+            question_ids.append(question_id)
+            ticket_ids.append(ticket_id)
+            offsets.append(len(option_ids))
+        option_ids.append(option_id)
+        correct.append(is_correct)
+    offsets.append(len(option_ids))
+    
+    bits = bytearray((len(correct) + 7) // 8)
+    for index, is_correct in enumerate(correct):
+        if is_correct:
+            bits[index >> 3] |= 1 << (index & 7)
+    
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.answer_keys-', delete=False) as output:
+        output.write(HEADER.pack(MAGIC, FORMAT_VERSION, version, len(question_ids), len(option_ids)))
+        for section in (question_ids, ticket_ids, offsets, option_ids):
+            data = section.tobytes()
+            output.write(data + _padding(len(data)))
+        output.write(bytes(bits))
+        output.flush()
+        os.fsync(output.fileno())
+    os.chmod(output.name, 0o644)
+    os.replace(output.name, path)
+    return {'version': version, 'questions': len(question_ids), 'options': len(option_ids)}
+
+
+class AnswerKeys:
+    """Read-only view of an answer keys file."""
+    
+    def __init__(self, path):
+        with open(path, 'rb') as keys_file:
+            stat = os.fstat(keys_file.fileno())
+            self.inode = (stat.st_dev, stat.st_ino)
+            self._mmap = mmap.mmap(keys_file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, file_format, self.version, questions, options = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or file_format != FORMAT_VERSION:
+            raise ValueError(f"Not an answer keys file: {path}")
+        
+        view = memoryview(self._mmap)
+        position = HEADER.size
+        sections = []
+        for typecode, count in (('q', questions), ('q', questions), ('I', questions + 1), ('q', options)):
+            size = count * struct.calcsize(typecode)
+            sections.append(view[position:position + size].cast(typecode))
+            position += size + len(_padding(size))
+        self.question_ids, self.ticket_ids, self.offsets, self.option_ids = sections
+        self.correct = view[position:position + (options + 7) // 8]
+    
+    def __len__(self):
+        return len(self.question_ids)
+    
+    def get(self, question_id):
+        """Get QuestionKey by question id, None if the question is not in the file."""
+        index = bisect.bisect_left(self.question_ids, question_id)
+        if index == len(self.question_ids) or self.question_ids[index] != question_id:
+            return None
+        
+        start, end = self.offsets[index], self.offsets[index + 1]
+        correct_option_ids = tuple(
+            self.option_ids[position] for position in range(start, end)
+            if self.correct[position >> 3] >> (position & 7) & 1
+        )
+        return QuestionKey(self.ticket_ids[index], tuple(self.option_ids[start:end]), correct_option_ids)
+
+
+_current = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _rebuild_in_background(path):
+    """Rebuild the file in one process of the host; the others keep falling back."""
+    lock_file = open(f'{path}.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return
+    
+    def rebuild():
+        try:
+            logger.info("Answer keys rebuilt: %s", build_answer_keys(path))
+        except Exception:
+            logger.exception("Answer keys rebuild failed")
+        finally:
+            connections.close_all()
+            lock_file.close()
+    
+    threading.Thread(target=rebuild, name='answer-keys-rebuild', daemon=True).start()
+
+
+def get_answer_keys():
+    """Get mapped answer keys for current content version, None if they are not available.
+
+    The file is checked at most every ANSWER_KEYS_CHECK_SECONDS, so grading
+    itself does no database or cache I/O.
+    """
+    global _current, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < settings.ANSWER_KEYS_CHECK_SECONDS:
+        return _current
+    
+    with _lock:
+        if now - _checked_at < settings.ANSWER_KEYS_CHECK_SECONDS:
+            return _current
+        _checked_at = now
+        path = settings.ANSWER_KEYS_PATH
+        
+        try:
+            stat = os.stat(path)
+            if _current is None or _current.inode != (stat.st_dev, stat.st_ino):
+                # Replaced mapping is released once no request uses it
+                _current = AnswerKeys(path)
+        except FileNotFoundError:
+            _current = None
+        except (OSError, ValueError):
+            logger.exception("Cannot map answer keys %s", path)
+            _current = None
+        
+        if _current is None or _current.version < get_local_content_version():
+            _current = None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _rebuild_in_background(path)
+        return _current
@@ -5,4 +5,6 @@ class TicketsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tickets'
     verbose_name = 'Билеты и вопросы'
-
+    
+    def ready(self):
+        from . import signals  # noqa: F401
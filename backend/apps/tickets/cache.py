@@ -0,0 +1,248 @@
+"""Hot content caches: published ticket list, ticket payloads and explanations.
+
+Two tiers: a per-process LRU (L1) in front of Redis (L2). Entries remember
+the content version they were built for and a soft expiry. The version is
+re-read from Redis at most every CONTENT_VERSION_CHECK_SECONDS, so admin
+edits reach every worker's L1 within that time.
+
+When an entry is stale only one worker (the one holding the lock) rebuilds it,
+the others keep serving the stale value meanwhile. On a cold key the others
+wait for that rebuild instead of all hitting the database at once.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from .content import get_content_version, get_local_content_version
+from .local_cache import LocalCache
+from .answer_keys import build_answer_keys
+from .models import Ticket, Question
+from .serializers import TicketSerializer, TicketForTestingSerializer, QuestionSerializer
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_TICKETS_KEY = 'tickets:published'
+TICKET_PAYLOAD_KEY = 'tickets:payload:{kind}:{number}'
+TICKET_EXPLANATIONS_KEY = 'tickets:explanations:{ticket_id}'
+LOCK_KEY = '{key}:lock'
+
+local_cache = LocalCache(settings.CONTENT_L1_MAX_ENTRIES, settings.CONTENT_L1_MAX_BYTES)
+metrics = Counter()
+
+PAYLOAD_SERIALIZERS = {
+    'detail': (TicketSerializer, ('category', 'questions__options', 'questions__tags')),
+    'testing': (TicketForTestingSerializer, ('questions__options',)),
+}
+
+
+def _entry(value, version):
+    return {
+        'value': value,
+        'version': version,
+        'fresh_until': time.time() + settings.CONTENT_CACHE_FRESH_SECONDS,
+    }
+
+
+def _is_fresh(entry, version):
+    return entry['version'] == version and entry['fresh_until'] > time.time()
+
+
+def get_or_build(key, builder, version=None):
+    """Get cached value, rebuilding it in a single worker when missing or stale."""
+    if version is None:
+        version = get_local_content_version()
+    entry = local_cache.get(key)
+    if entry is not None and _is_fresh(entry, version):
+        metrics['l1_hits'] += 1
+        return entry['value']
+    metrics['l1_misses'] += 1
+    
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, version):
+        metrics['l2_hits'] += 1
+        local_cache.set(key, entry)
+        return entry['value']
+    metrics['l2_misses'] += 1
+    
+    lock_key = LOCK_KEY.format(key=key)
+    if cache.add(lock_key, 1, settings.CONTENT_CACHE_LOCK_TIMEOUT):
+        try:
+            metrics['builds'] += 1
+            value = builder()
+            entry = _entry(value, version)
+            cache.set(key, entry, settings.CONTENT_CACHE_TIMEOUT)
+            local_cache.set(key, entry)
+            return value
+        finally:
+            cache.delete(lock_key)
+    
+    # Another worker is rebuilding: serve stale value while it does
+    if entry is not None:
+        metrics['stale_served'] += 1
+        return entry['value']
+    
+    metrics['waits'] += 1
+    
+    deadline = time.monotonic() + settings.CONTENT_CACHE_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['value']
+    
+    logger.warning("Timed out waiting for cache rebuild of %s", key)
+    metrics['builds'] += 1
+    return builder()
+
+
+def get_many_or_build(keys, builder, version=None):
+    """Batch get_or_build: builder(keys) returns values of all missing keys at once.
+
+    Keys missing from the result of builder are cached as None.
+    """
+    if version is None:
+        version = get_local_content_version()
+    values = {}
+    for key in keys:
+        entry = local_cache.get(key)
+        if entry is not None and _is_fresh(entry, version):
+            metrics['l1_hits'] += 1
+            values[key] = entry['value']
+        else:
+            metrics['l1_misses'] += 1
+    
+    missing = [key for key in keys if key not in values]
+    stale = {}
+    if missing:
+        for key, entry in cache.get_many(missing).items():
+            if _is_fresh(entry, version):
+                local_cache.set(key, entry)
+                values[key] = entry['value']
+                metrics['l2_hits'] += 1
+            else:
+                stale[key] = entry
+        metrics['l2_misses'] += sum(key not in values for key in missing)
+    
+    missing = [key for key in keys if key not in values]
+    if not missing:
+        return values
+    
+    locked = [key for key in missing if cache.add(LOCK_KEY.format(key=key), 1, settings.CONTENT_CACHE_LOCK_TIMEOUT)]
+    # Stale keys locked by another worker are served stale; cold ones are built here too
+    for key in missing:
+        if key not in locked and key in stale:
+            metrics['stale_served'] += 1
+            values[key] = stale[key]['value']
+    to_build = [key for key in missing if key not in values]
+    try:
+        if not to_build:
+            return values
+        metrics['builds'] += 1
+        built = builder(to_build)
+        entries = {key: _entry(built.get(key), version) for key in to_build}
+        cache.set_many(entries, settings.CONTENT_CACHE_TIMEOUT)
+        for key, entry in entries.items():
+            local_cache.set(key, entry)
+            values[key] = entry['value']
+    finally:
+        cache.delete_many([LOCK_KEY.format(key=key) for key in locked])
+    return values
+
+
+def get_metrics():
+    """Hit/miss counters of both tiers in this process."""
+    def tier(name):
+        hits, misses = metrics[f'{name}_hits'], metrics[f'{name}_misses']
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    
+    return {
+        'pid': os.getpid(),
+        'content_version': get_local_content_version(),
+        'l1': {**tier('l1'), 'entries': len(local_cache), 'bytes': local_cache.bytes},
+        'l2': tier('l2'),
+        'builds': metrics['builds'],
+        'stale_served': metrics['stale_served'],
+        'waits': metrics['waits'],
+    }
+
+
+def build_published_tickets():
+    """Build (id, number) pairs of published tickets in display order."""
+    return list(
+        Ticket.objects.filter(status='published').order_by('order', 'number').values_list('id', 'number')
+    )
+
+
+def build_ticket_payloads(kind, numbers=None):
+    """Build serialized payloads of published tickets by number."""
+    serializer_class, prefetch = PAYLOAD_SERIALIZERS[kind]
+    tickets = Ticket.objects.filter(status='published').prefetch_related(*prefetch)
+    if numbers is not None:
+        tickets = tickets.filter(number__in=numbers)
+    return {ticket.number: serializer_class(ticket).data for ticket in tickets}
+
+
+def get_published_tickets():
+    """Get (id, number) pairs of published tickets."""
+    return get_or_build(PUBLISHED_TICKETS_KEY, build_published_tickets)
+
+
+def get_ticket_payload(kind, number):
+    """Get serialized published ticket ('detail' or 'testing'), None if there is no such ticket."""
+    # Only published numbers get cache keys, unknown numbers are answered from the list
+    if number not in {ticket_number for _, ticket_number in get_published_tickets()}:
+        return None
+    key = TICKET_PAYLOAD_KEY.format(kind=kind, number=number)
+    return get_or_build(key, lambda: build_ticket_payloads(kind, [number]).get(number))
+
+
+def build_ticket_explanations(ticket_ids):
+    """Build serialized questions with explanations of published tickets, by ticket id."""
+    questions = Question.objects.filter(
+        ticket_id__in=ticket_ids,
+        ticket__status='published'
+    ).prefetch_related('options', 'tags').order_by('ticket_id', 'order')
+    explanations = {}
+    for question in questions:
+        explanations.setdefault(question.ticket_id, []).append(QuestionSerializer(question).data)
+    return explanations
+
+
+def get_ticket_explanations(ticket_ids):
+    """Get serialized questions with explanations by ticket id; cold tickets are built in one batch."""
+    keys = {TICKET_EXPLANATIONS_KEY.format(ticket_id=ticket_id): ticket_id for ticket_id in set(ticket_ids)}
+    
+    def builder(missing_keys):
+        built = build_ticket_explanations([keys[key] for key in missing_keys])
+        return {key: built.get(keys[key], []) for key in missing_keys}
+    
+    values = get_many_or_build(list(keys), builder)
+    return {ticket_id: values[key] for key, ticket_id in keys.items()}
+
+
+def warm_content_cache():
+    """Precompute all hot content keys and the answer keys file for current content version."""
+    version = get_content_version()
+    published = build_published_tickets()
+    entries = {
+        PUBLISHED_TICKETS_KEY: _entry(published, version),
+    }
+    for kind in PAYLOAD_SERIALIZERS:
+        for number, payload in build_ticket_payloads(kind).items():
+            entries[TICKET_PAYLOAD_KEY.format(kind=kind, number=number)] = _entry(payload, version)
+    explanations = build_ticket_explanations([ticket_id for ticket_id, _ in published])
+    for ticket_id, _ in published:
+        entries[TICKET_EXPLANATIONS_KEY.format(ticket_id=ticket_id)] = _entry(explanations.get(ticket_id, []), version)
+    
+    cache.set_many(entries, settings.CONTENT_CACHE_TIMEOUT)
+    # Workers forked after warm-up start with a filled L1
+    for key, entry in entries.items():
+        local_cache.set(key, entry)
+    answer_keys = build_answer_keys()
+    return {'version': version, 'tickets': len(published), 'keys': len(entries), 'answer_keys': answer_keys['questions']}
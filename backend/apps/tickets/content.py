@@ -0,0 +1,35 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+CONTENT_VERSION_KEY = 'tickets:content_version'
+
+# Last version seen by this process and when it was read
+_local_version = {'value': None, 'checked_at': 0.0}
+
+
+def get_content_version():
+    """Get current version of published ticket content."""
+    return cache.get_or_set(CONTENT_VERSION_KEY, 1, timeout=None)
+
+
+def get_local_content_version():
+    """Get content version, reading it from Redis at most every CONTENT_VERSION_CHECK_SECONDS."""
+    now = time.monotonic()
+    if _local_version['value'] is None or now - _local_version['checked_at'] >= settings.CONTENT_VERSION_CHECK_SECONDS:
+        _local_version['value'] = get_content_version()
+        _local_version['checked_at'] = now
+    return _local_version['value']
+
+
+def bump_content_version():
+    """Invalidate everything derived from ticket content."""
+    try:
+        version = cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        version = 2
+        cache.set(CONTENT_VERSION_KEY, version, timeout=None)
+    # The editing process sees its own change immediately
+    _local_version['value'] = version
+    _local_version['checked_at'] = time.monotonic()
+    return version
@@ -0,0 +1,148 @@
+import random
+import threading
+from django.conf import settings
+from .content import get_content_version
+from .models import Question
+from .tags import get_tag_index
+
+
+class ExamAssemblyError(Exception):
+    """Raised when the question pool cannot satisfy exam quotas."""
+
+
+class QuestionPool:
+    """In-memory index of active published questions bucketed by category, tag and difficulty."""
+    
+    def __init__(self, version, rows, tag_index):
+        self.version = version
+        self.question_ids = []
+        self.by_category = {}
+        self.by_tag = tag_index
+        self.by_difficulty = {}
+        self._resolved = {}
+        
+        for question_id, category_id, difficulty_level in rows:
+            self.question_ids.append(question_id)
+            self.by_category.setdefault(category_id, []).append(question_id)
+            self.by_difficulty.setdefault(difficulty_level, []).append(question_id)
+    
+    def __len__(self):
+        return len(self.question_ids)
+    
+    def candidates(self, category=None, tag=None, difficulty=None):
+        """Get question ids matching all given filters."""
+        key = (category, tag, difficulty)
+        if key in self._resolved:
+            return self._resolved[key]
+        
+        buckets = []
+        if category is not None:
+            buckets.append(self.by_category.get(category, []))
+        if tag is not None:
+            buckets.append(self.by_tag.get(tag.strip().lower(), []))
+        if difficulty is not None:
+            buckets.append(self.by_difficulty.get(difficulty, []))
+        
+        if not buckets:
+            result = self.question_ids
+        elif len(buckets) == 1:
+            result = buckets[0]
+        else:
+            # Intersect once per distinct quota, starting from the smallest bucket
+            buckets.sort(key=len)
+            common = set(buckets[0]).intersection(*buckets[1:])
+            result = [question_id for question_id in buckets[0] if question_id in common]
+        
+        self._resolved[key] = result
+        return result
+    
+    def sample(self, questions_count, quotas=(), rng=random):
+        """Sample exam question ids meeting quotas, filling the rest from the whole pool."""
+        chosen = []
+        seen = set()
+        
+        for quota in quotas:
+            count = quota['count']
+            pool = self.candidates(
+                category=quota.get('category'),
+                tag=quota.get('tag'),
+                difficulty=quota.get('difficulty'),
+            )
+            picked = self._pick(pool, count, seen, rng)
+            if len(picked) < count:
+                raise ExamAssemblyError(f"Not enough questions for quota {quota}")
+            chosen.extend(picked)
+        
+        if len(chosen) > questions_count:
+            raise ExamAssemblyError('Quotas exceed exam questions count')
+        
+        remaining = questions_count - len(chosen)
+        picked = self._pick(self.question_ids, remaining, seen, rng)
+        if len(picked) < remaining:
+            raise ExamAssemblyError('Not enough questions for exam')
+        chosen.extend(picked)
+        
+        rng.shuffle(chosen)
+        return chosen
+    
+    @staticmethod
+    def _pick(pool, count, seen, rng):
+        """Pick distinct random ids from pool that are not in seen."""
+        picked = []
+        if count <= 0 or not pool:
+            return picked
+        
+        # Rejection sampling is O(count) while the pool is much larger than the exam
+        attempts = 0
+        while len(picked) < count and attempts < count * 4:
+            attempts += 1
+            question_id = pool[rng.randrange(len(pool))]
+            if question_id not in seen:
+                seen.add(question_id)
+                picked.append(question_id)
+        
+        if len(picked) < count:
+            rest = [question_id for question_id in pool if question_id not in seen]
+            extra = rng.sample(rest, min(count - len(picked), len(rest)))
+            seen.update(extra)
+            picked.extend(extra)
+        
+        return picked
+
+
+def build_question_pool(version):
+    """Build question pool from active questions of published tickets."""
+    rows = Question.objects.filter(
+        is_active=True,
+        ticket__status='published'
+    ).values_list('id', 'ticket__category_id', 'difficulty_level').order_by('id')
+    
+    return QuestionPool(version, rows.iterator(), get_tag_index())
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_question_pool():
+    """Get question pool for current content version, rebuilding it if stale."""
+    global _pool
+    version = get_content_version()
+    pool = _pool
+    if pool is not None and pool.version == version:
+        return pool
+    
+    with _pool_lock:
+        if _pool is None or _pool.version != version:
+            _pool = build_question_pool(version)
+        return _pool
+
+
+def assemble_exam(questions_count=None, quotas=None):
+    """Assemble exam question ids from the question pool."""
+    if questions_count is None:
+        questions_count = settings.EXAM_QUESTIONS_COUNT
+    if quotas is None:
+        quotas = settings.EXAM_QUOTAS
+    
+    return get_question_pool().sample(questions_count, quotas)
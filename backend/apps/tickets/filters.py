@@ -0,0 +1,40 @@
+import django_filters
+from django.db.models import Exists, OuterRef
+from .models import Ticket, Question, QuestionTag
+
+
+class TicketFilter(django_filters.FilterSet):
+    """Filter for tickets."""
+    
+    tag = django_filters.CharFilter(method='filter_tag')
+    
+    class Meta:
+        model = Ticket
+        fields = ['category', 'status', 'tag']
+    
+    def filter_tag(self, queryset, name, value):
+        """Tickets having at least one active question with the tag."""
+        tagged = QuestionTag.objects.filter(
+            question__ticket=OuterRef('pk'),
+            question__is_active=True,
+            tag__name=value.strip().lower()
+        )
+        return queryset.filter(Exists(tagged))
+
+
+class QuestionFilter(django_filters.FilterSet):
+    """Filter for questions."""
+    
+    tag = django_filters.CharFilter(method='filter_tag')
+    
+    class Meta:
+        model = Question
+        fields = ['ticket', 'difficulty_level', 'tag']
+    
+    def filter_tag(self, queryset, name, value):
+        """Questions with the tag."""
+        tagged = QuestionTag.objects.filter(
+            question=OuterRef('pk'),
+            tag__name=value.strip().lower()
+        )
+        return queryset.filter(Exists(tagged))
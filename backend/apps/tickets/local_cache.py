@@ -0,0 +1,53 @@
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class LocalCache:
+    """Per-process LRU cache bounded by number of entries and approximate size in bytes.
+
+    Values are shared between requests, callers must not modify them.
+    """
+    
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+    
+    def set(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+    
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def _discard(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.bytes -= item[1]
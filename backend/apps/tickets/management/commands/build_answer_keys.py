@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from apps.tickets.answer_keys import build_answer_keys
+
+
+class Command(BaseCommand):
+    """Write the memory-mapped answer keys file used for grading."""
+    
+    help = 'Build answer keys of published tickets and atomically replace the mapped file'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Output file (default: ANSWER_KEYS_PATH)')
+    
+    def handle(self, *args, **options):
+        stats = build_answer_keys(options['path'])
+        self.stdout.write(
+            f"Content version {stats['version']}: {stats['questions']} questions, {stats['options']} options"
+        )
+        self.stdout.write(self.style.SUCCESS('Answer keys built'))
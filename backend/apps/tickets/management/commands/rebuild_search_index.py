@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from apps.tickets.models import Ticket, Question
+from apps.tickets.search import update_ticket_search_vector, update_question_search_vector
+
+
+class Command(BaseCommand):
+    """Recompute stored search vectors for tickets and questions."""
+    
+    help = 'Create search extensions and rebuild full-text search vectors'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        
+        for model, update in (
+            (Ticket, update_ticket_search_vector),
+            (Question, update_question_search_vector),
+        ):
+            ids = model.objects.order_by('id').values_list('id', flat=True)
+            count = 0
+            for object_id in ids.iterator(chunk_size=options['batch_size']):
+                update(object_id)
+                count += 1
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {count}")
+        
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
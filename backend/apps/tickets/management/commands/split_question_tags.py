@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.tickets.content import bump_content_version
+from apps.tickets.models import Question, QuestionTag
+from apps.tickets.tags import parse_tags, get_or_create_tags
+
+
+class Command(BaseCommand):
+    """Move comma-separated Question.legacy_tags into Tag/QuestionTag rows."""
+    
+    help = 'Split legacy comma-separated question tags into normalized tags'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Clear legacy tags after they are split'
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        questions = Question.objects.exclude(legacy_tags='').values_list('id', 'legacy_tags').order_by('id')
+        
+        last_id = 0
+        total_links = 0
+        while True:
+            batch = list(questions.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            
+            parsed = [(question_id, parse_tags(legacy_tags)) for question_id, legacy_tags in batch]
+            names = sorted({name for _, question_names in parsed for name in question_names})
+            
+            with transaction.atomic():
+                tags = get_or_create_tags(names)
+                links = [
+                    QuestionTag(question_id=question_id, tag=tags[name])
+                    for question_id, question_names in parsed
+                    for name in question_names
+                ]
+                QuestionTag.objects.bulk_create(links, ignore_conflicts=True)
+                if options['clear']:
+                    Question.objects.filter(id__in=[question_id for question_id, _ in batch]).update(legacy_tags='')
+            
+            total_links += len(links)
+            self.stdout.write(f"Processed questions up to id {last_id}")
+        
+        # bulk_create does not send signals
+        bump_content_version()
+        self.stdout.write(self.style.SUCCESS(f"Created up to {total_links} question tags"))
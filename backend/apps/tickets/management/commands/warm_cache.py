@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from apps.tickets.cache import warm_content_cache
+
+
+class Command(BaseCommand):
+    """Precompute hot content caches, e.g. right after a deploy or cache flush."""
+    
+    help = 'Warm published ticket list and ticket payloads, rebuild answer keys file'
+    
+    def handle(self, *args, **options):
+        stats = warm_content_cache()
+        self.stdout.write(
+            f"Content version {stats['version']}: {stats['tickets']} tickets, {stats['keys']} keys, "
+            f"{stats['answer_keys']} answer keys"
+        )
+        self.stdout.write(self.style.SUCCESS('Cache warmed'))
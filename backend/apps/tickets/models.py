@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import connection, models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -54,6 +56,9 @@ class Ticket(models.Model):
     order = models.PositiveIntegerField(default=0, verbose_name="Порядок")
     questions_count = models.PositiveIntegerField(default=0, verbose_name="Количество вопросов")
     
+    # Full-text search (kept current by signals)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name="Создал")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -65,6 +70,10 @@ class Ticket(models.Model):
         verbose_name = 'Билет'
         verbose_name_plural = 'Билеты'
         ordering = ['order', 'number']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='tickets_search_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='tickets_title_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.number}: {self.title}"
@@ -83,6 +92,22 @@ class Ticket(models.Model):
             self.save(update_fields=['questions_count'])
 
 
+class Tag(models.Model):
+    """Тег вопроса (тема ПДД)."""
+    
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'tags'
+        verbose_name = 'Тег'
+        verbose_name_plural = 'Теги'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
 class Question(models.Model):
     """Вопрос в билете."""
     
@@ -93,7 +118,19 @@ class Question(models.Model):
     explanation_image = models.ImageField(upload_to='explanations/', blank=True, null=True, verbose_name="Изображение в объяснении")
     
     # Question metadata
-    tags = models.CharField(max_length=500, blank=True, verbose_name="Теги (через запятую)")
+    tags = models.ManyToManyField(
+        Tag,
+        through='QuestionTag',
+        related_name='questions',
+        blank=True,
+        verbose_name="Теги"
+    )
+    legacy_tags = models.CharField(
+        max_length=500,
+        blank=True,
+        db_column='tags',
+        verbose_name="Теги (через запятую, устарело)"
+    )
     difficulty_level = models.PositiveIntegerField(
         default=1,
         validators=[MinValueValidator(1), MaxValueValidator(5)],
@@ -102,6 +139,9 @@ class Question(models.Model):
     order = models.PositiveIntegerField(default=0, verbose_name="Порядок в билете")
     is_active = models.BooleanField(default=True, verbose_name="Активен")
     
+    # Full-text search over text, options and explanation (kept current by signals)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, verbose_name="Создал")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -113,11 +153,35 @@ class Question(models.Model):
         verbose_name_plural = 'Вопросы'
         ordering = ['ticket', 'order']
         unique_together = ['ticket', 'order']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='questions_search_idx'),
+            GinIndex(fields=['text'], opclasses=['gin_trgm_ops'], name='questions_text_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.ticket.number}: {self.text[:50]}..."
 
 
+class QuestionTag(models.Model):
+    """Связь вопроса с тегом."""
+    
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='question_tags', verbose_name="Вопрос")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='question_tags', verbose_name="Тег")
+    
+    class Meta:
+        db_table = 'question_tags'
+        verbose_name = 'Тег вопроса'
+        verbose_name_plural = 'Теги вопросов'
+        unique_together = ['question', 'tag']
+        indexes = [
+            # unique_together covers lookups by question, this one covers lookups by tag
+            models.Index(fields=['tag', 'question'], name='question_tags_tag_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.question_id}: {self.tag}"
+
+
 class AnswerOption(models.Model):
     """Вариант ответа на вопрос."""
     
@@ -149,6 +213,26 @@ class AnswerOption(models.Model):
         return f"{self.question.ticket.number}: {option_text}"
 
 
+UPSERT_PROGRESS_SQL = """
+    INSERT INTO user_ticket_progress AS progress (
+        user_id, ticket_id, is_completed, completed_at, attempts_count, best_score,
+        total_questions_answered, correct_answers_count, created_at, updated_at
+    )
+    VALUES (
+        %(user_id)s, %(ticket_id)s, %(completed)s, %(completed_at)s, %(attempts)s, %(score)s,
+        %(total)s, %(correct)s, %(now)s, %(now)s
+    )
+    ON CONFLICT (user_id, ticket_id) DO UPDATE SET
+        attempts_count = progress.attempts_count + EXCLUDED.attempts_count,
+        total_questions_answered = progress.total_questions_answered + EXCLUDED.total_questions_answered,
+        correct_answers_count = progress.correct_answers_count + EXCLUDED.correct_answers_count,
+        best_score = GREATEST(progress.best_score, EXCLUDED.best_score),
+        is_completed = progress.is_completed OR EXCLUDED.is_completed,
+        completed_at = COALESCE(progress.completed_at, EXCLUDED.completed_at),
+        updated_at = EXCLUDED.updated_at
+"""
+
+
 class UserTicketProgress(models.Model):
     """Прогресс пользователя по билетам."""
     
@@ -176,20 +260,44 @@ class UserTicketProgress(models.Model):
     def __str__(self):
         return f"{self.user.display_name} - {self.ticket.number}"
     
-    def update_progress(self, correct_answers, total_questions):
-        """Update user progress for this ticket."""
-        self.total_questions_answered += total_questions
-        self.correct_answers_count += correct_answers
-        self.attempts_count += 1
-        
-        # Calculate score percentage
-        score = int((self.correct_answers_count / self.total_questions_answered) * 100) if self.total_questions_answered > 0 else 0
-        self.best_score = max(self.best_score, score)
-        
-        # Mark as completed if 100% correct
-        if score == 100 and not self.is_completed:
-            self.is_completed = True
-            self.completed_at = timezone.now()
-        
-        self.save()
+    @classmethod
+    def add_results(cls, user_id, ticket_id, total_questions, correct_answers, score=None, attempts=1):
+        """Add attempt results to progress with a single INSERT ... ON CONFLICT DO UPDATE.
+
+        Counters are incremented in the database, so concurrent completions do not
+        lose updates. best_score and completion come from the attempt's own score.
+        """
+        now = timezone.now()
+        completed = score == 100
+        with connection.cursor() as cursor:
+            cursor.execute(UPSERT_PROGRESS_SQL, {
+                'user_id': user_id,
+                'ticket_id': ticket_id,
+                'completed': completed,
+                'completed_at': now if completed else None,
+                'attempts': attempts,
+                'score': score or 0,
+                'total': total_questions,
+                'correct': correct_answers,
+                'now': now,
+            })
 
+
+class TelegramMedia(models.Model):
+    """Telegram file_id of uploaded image, keyed by content hash."""
+    
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256 содержимого")
+    file_id = models.CharField(max_length=255, verbose_name="Telegram file_id")
+    file_unique_id = models.CharField(max_length=255, blank=True, verbose_name="Telegram file_unique_id")
+    path = models.CharField(max_length=255, blank=True, verbose_name="Путь к файлу")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'telegram_media'
+        verbose_name = 'Медиа в Telegram'
+        verbose_name_plural = 'Медиа в Telegram'
+    
+    def __str__(self):
+        return self.path or self.sha256
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchVector, SearchQuery, SearchRank, SearchHeadline, TrigramSimilarity,
+    TrigramWordSimilarity
+)
+from django.db.models import F, Value
+from rest_framework import filters
+from .models import Ticket, Question, AnswerOption
+
+HEADLINE_OPTIONS = {
+    'start_sel': '<b>',
+    'stop_sel': '</b>',
+    'max_words': 25,
+    'min_words': 10,
+    'max_fragments': 2,
+}
+
+
+def get_search_config(language):
+    """Get PostgreSQL text search configuration for user language."""
+    return settings.SEARCH_CONFIGS.get(language, 'simple')
+
+
+def build_search_vector(parts):
+    """Build tsvector expression from (text, weight) parts using every configuration."""
+    configs = sorted(set(settings.SEARCH_CONFIGS.values()))
+    vector = None
+    for text, weight in parts:
+        if not text:
+            continue
+        for config in configs:
+            part = SearchVector(Value(text), config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def update_ticket_search_vector(ticket_id):
+    """Recompute stored search vector for ticket."""
+    ticket = Ticket.objects.filter(pk=ticket_id).values('number', 'title', 'description').first()
+    if ticket is None:
+        return
+    
+    vector = build_search_vector([
+        (ticket['number'], 'A'),
+        (ticket['title'], 'A'),
+        (ticket['description'], 'B'),
+    ])
+    Ticket.objects.filter(pk=ticket_id).update(search_vector=vector)
+
+
+def update_question_search_vector(question_id):
+    """Recompute stored search vector for question (text, explanation and options)."""
+    question = Question.objects.filter(pk=question_id).values('text', 'explanation').first()
+    if question is None:
+        return
+    
+    options_text = ' '.join(
+        AnswerOption.objects.filter(question_id=question_id).exclude(text='').values_list('text', flat=True)
+    )
+    vector = build_search_vector([
+        (question['text'], 'A'),
+        (options_text, 'B'),
+        (question['explanation'], 'C'),
+    ])
+    Question.objects.filter(pk=question_id).update(search_vector=vector)
+
+
+def search_tickets(query_text, language, limit):
+    """Ranked full-text search over published tickets."""
+    config = get_search_config(language)
+    query = SearchQuery(query_text, config=config, search_type='websearch')
+    
+    return Ticket.objects.filter(
+        status='published',
+        search_vector=query
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        snippet=SearchHeadline('title', query, config=config, **HEADLINE_OPTIONS),
+    ).order_by('-rank', 'order')[:limit]
+
+
+def search_questions(query_text, language, limit):
+    """Ranked full-text search over active questions of published tickets."""
+    config = get_search_config(language)
+    query = SearchQuery(query_text, config=config, search_type='websearch')
+    
+    return Question.objects.filter(
+        is_active=True,
+        ticket__status='published',
+        search_vector=query
+    ).select_related('ticket').annotate(
+        rank=SearchRank(F('search_vector'), query),
+        snippet=SearchHeadline('text', query, config=config, **HEADLINE_OPTIONS),
+        explanation_snippet=SearchHeadline('explanation', query, config=config, **HEADLINE_OPTIONS),
+    ).order_by('-rank', 'id')[:limit]
+
+
+def fuzzy_search_tickets(query_text, limit):
+    """Trigram fallback for misspelled ticket titles."""
+    return Ticket.objects.filter(
+        status='published',
+        title__trigram_similar=query_text
+    ).annotate(
+        rank=TrigramSimilarity('title', query_text),
+    ).order_by('-rank', 'order')[:limit]
+
+
+def fuzzy_search_questions(query_text, limit):
+    """Trigram fallback for misspelled words in question text."""
+    return Question.objects.filter(
+        is_active=True,
+        ticket__status='published',
+        text__trigram_word_similar=query_text
+    ).select_related('ticket').annotate(
+        rank=TrigramWordSimilarity(query_text, 'text'),
+    ).order_by('-rank', 'id')[:limit]
+
+
+class TicketSearchFilter(filters.BaseFilterBackend):
+    """Full-text search filter for ticket list (replaces ILIKE based SearchFilter)."""
+    
+    search_param = 'search'
+    
+    def filter_queryset(self, request, queryset, view):
+        query_text = request.query_params.get(self.search_param, '').strip()
+        if not query_text:
+            return queryset
+        
+        language = getattr(request.user, 'language', None)
+        query = SearchQuery(query_text, config=get_search_config(language), search_type='websearch')
+        return queryset.filter(search_vector=query) | queryset.filter(number=query_text)
@@ -15,6 +15,7 @@ class QuestionSerializer(serializers.ModelSerializer):
     """Serializer for questions."""
     
     options = AnswerOptionSerializer(many=True, read_only=True)
+    tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
     
     class Meta:
         model = Question
@@ -71,21 +72,24 @@ class TicketListSerializer(serializers.ModelSerializer):
         """Get user progress for this ticket."""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            try:
-                progress = obj.user_progress.get(user=request.user)
-                return {
-                    'is_completed': progress.is_completed,
-                    'completed_at': progress.completed_at,
-                    'attempts_count': progress.attempts_count,
-                    'best_score': progress.best_score,
-                }
-            except UserTicketProgress.DoesNotExist:
+            # Views listing many tickets prefetch the user's progress into current_user_progress
+            if hasattr(obj, 'current_user_progress'):
+                progress = obj.current_user_progress[0] if obj.current_user_progress else None
+            else:
+                progress = obj.user_progress.filter(user=request.user).first()
+            if progress is None:
                 return {
                     'is_completed': False,
                     'completed_at': None,
                     'attempts_count': 0,
                     'best_score': 0,
                 }
+            return {
+                'is_completed': progress.is_completed,
+                'completed_at': progress.completed_at,
+                'attempts_count': progress.attempts_count,
+                'best_score': progress.best_score,
+            }
         return None
 
 
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import TicketCategory, Ticket, Question, AnswerOption, Tag, QuestionTag
+from .content import bump_content_version
+from .search import update_ticket_search_vector, update_question_search_vector
+
+
+@receiver(post_save, sender=TicketCategory)
+@receiver(post_delete, sender=TicketCategory)
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=AnswerOption)
+@receiver(post_delete, sender=AnswerOption)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=QuestionTag)
+@receiver(post_delete, sender=QuestionTag)
+@receiver(m2m_changed, sender=QuestionTag)
+def content_changed(sender, **kwargs):
+    """Bump content version when tickets, questions or options change."""
+    transaction.on_commit(bump_content_version)
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_search_changed(sender, instance, update_fields=None, **kwargs):
+    """Keep ticket search vector current."""
+    if update_fields and set(update_fields) <= {'questions_count'}:
+        return
+    transaction.on_commit(lambda: update_ticket_search_vector(instance.pk))
+
+
+@receiver(post_save, sender=Question)
+def question_search_changed(sender, instance, **kwargs):
+    """Keep question search vector current."""
+    transaction.on_commit(lambda: update_question_search_vector(instance.pk))
+
+
+@receiver(post_save, sender=AnswerOption)
+@receiver(post_delete, sender=AnswerOption)
+def option_search_changed(sender, instance, **kwargs):
+    """Option text is part of question search vector."""
+    question_id = instance.question_id
+    transaction.on_commit(lambda: update_question_search_vector(question_id))
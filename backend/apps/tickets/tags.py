@@ -0,0 +1,56 @@
+import random
+from django.conf import settings
+from django.core.cache import cache
+from .content import get_content_version
+from .models import Tag, QuestionTag
+
+TAG_INDEX_KEY = 'tickets:tag_index:{version}'
+
+
+def parse_tags(tags):
+    """Split comma-separated tags into normalized names."""
+    names = []
+    for tag in tags.split(','):
+        name = tag.strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Get tags by names, creating missing ones in bulk."""
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = [Tag(name=name) for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        tags.update({tag.name: tag for tag in Tag.objects.filter(name__in=[tag.name for tag in missing])})
+    return tags
+
+
+def build_tag_index():
+    """Build tag name -> question ids inverted index over active published questions."""
+    rows = QuestionTag.objects.filter(
+        question__is_active=True,
+        question__ticket__status='published'
+    ).values_list('tag__name', 'question_id').order_by('tag__name', 'question_id')
+    
+    index = {}
+    for name, question_id in rows.iterator():
+        index.setdefault(name, []).append(question_id)
+    return index
+
+
+def get_tag_index():
+    """Get cached tag index for current content version."""
+    key = TAG_INDEX_KEY.format(version=get_content_version())
+    index = cache.get(key)
+    if index is None:
+        index = build_tag_index()
+        cache.set(key, index, settings.TAG_INDEX_TIMEOUT)
+    return index
+
+
+def sample_tag_questions(name, count, rng=random):
+    """Get random question ids for practice by topic."""
+    question_ids = get_tag_index().get(name, [])
+    return rng.sample(question_ids, min(count, len(question_ids)))
@@ -0,0 +1,590 @@
+import fcntl
+import os
+import random
+import tempfile
+import threading
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.attempts import leaderboard
+from apps.attempts.models import Attempt
+from . import answer_keys, content, exam
+from .cache import local_cache
+from .answer_keys import AnswerKeys, QuestionKey, _rebuild_in_background, build_answer_keys, get_answer_keys
+from .content import bump_content_version
+from .exam import ExamAssemblyError, QuestionPool
+from .models import TicketCategory, Ticket, Question, AnswerOption, UserTicketProgress
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UserTicketProgressConcurrencyTests(TransactionTestCase):
+    """add_results must not lose updates when completions of one ticket race."""
+    
+    workers = 8
+    
+    def setUp(self):
+        self.user = User.objects.create(username='racer', telegram_id=1001)
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+    
+    def run_concurrently(self, results):
+        barrier = threading.Barrier(len(results))
+        errors = []
+        
+        def complete(correct_answers, score):
+            try:
+                barrier.wait()
+                UserTicketProgress.add_results(self.user.id, self.ticket.id, 20, correct_answers, score=score)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=complete, args=result) for result in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+    
+    def test_concurrent_first_completions_create_one_row(self):
+        results = [(10 + index, (10 + index) * 5) for index in range(self.workers)]
+        self.run_concurrently(results)
+        
+        progress = UserTicketProgress.objects.get(user=self.user, ticket=self.ticket)
+        self.assertEqual(progress.attempts_count, self.workers)
+        self.assertEqual(progress.total_questions_answered, 20 * self.workers)
+        self.assertEqual(progress.correct_answers_count, sum(correct for correct, _ in results))
+        self.assertEqual(progress.best_score, max(score for _, score in results))
+        self.assertFalse(progress.is_completed)
+    
+    def test_concurrent_completions_update_existing_row(self):
+        UserTicketProgress.add_results(self.user.id, self.ticket.id, 20, 19, score=95)
+        results = [(20, 100)] + [(5, 25)] * (self.workers - 1)
+        self.run_concurrently(results)
+        
+        progress = UserTicketProgress.objects.get(user=self.user, ticket=self.ticket)
+        self.assertEqual(progress.attempts_count, self.workers + 1)
+        self.assertEqual(progress.total_questions_answered, 20 * (self.workers + 1))
+        self.assertEqual(progress.correct_answers_count, 19 + 20 + 5 * (self.workers - 1))
+        self.assertEqual(progress.best_score, 100)
+        self.assertTrue(progress.is_completed)
+        self.assertIsNotNone(progress.completed_at)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ANSWER_KEYS_CHECK_SECONDS=0,
+)
+class AnswerKeysTests(TestCase):
+    """Grading from the mapped answer keys matches grading from the database."""
+    
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'answer_keys.bin')
+        path_override = override_settings(ANSWER_KEYS_PATH=self.path)
+        path_override.enable()
+        self.addCleanup(path_override.disable)
+        mock.patch.object(answer_keys, '_current', None).start()
+        mock.patch.dict(content._local_version, {'value': None, 'checked_at': 0.0}).start()
+        self.rebuild = mock.patch.object(answer_keys, '_rebuild_in_background').start()
+        self.addCleanup(mock.patch.stopall)
+        
+        self.ticket = Ticket.objects.create(number='1', title='Билет 1', status='published')
+        self.other_ticket = Ticket.objects.create(number='2', title='Билет 2', status='published')
+        draft = Ticket.objects.create(number='3', title='Билет 3', status='draft')
+        self.single = self.create_question(self.ticket, 1, [False, True, False])
+        self.multiple = self.create_question(self.ticket, 2, [True, False, True, False, False, False, False, False, True])
+        self.foreign = self.create_question(self.other_ticket, 1, [True, False])
+        self.draft = self.create_question(draft, 1, [True, False])
+        
+        self.user = User.objects.create(username='grader', telegram_id=5001)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def create_question(self, ticket, order, correct):
+        question = Question.objects.create(ticket=ticket, text=f'Вопрос {ticket.number}.{order}', order=order)
+        # Display order differs from creation order
+        for index, is_correct in reversed(list(enumerate(correct))):
+            AnswerOption.objects.create(question=question, text=f'Ответ {index}', order=index, is_correct=is_correct)
+        return question
+    
+    def option_ids(self, question):
+        return tuple(question.options.order_by('order').values_list('id', flat=True))
+    
+    def correct_ids(self, question):
+        return tuple(question.options.filter(is_correct=True).order_by('order').values_list('id', flat=True))
+    
+    def test_build_writes_published_questions(self):
+        stats = build_answer_keys()
+        self.assertEqual(stats, {'version': 1, 'questions': 3, 'options': 14})
+        
+        keys = AnswerKeys(self.path)
+        self.assertEqual(keys.version, 1)
+        self.assertEqual(len(keys), 3)
+        for question in (self.single, self.multiple, self.foreign):
+            self.assertEqual(
+                keys.get(question.id),
+                QuestionKey(question.ticket_id, self.option_ids(question), self.correct_ids(question))
+            )
+        self.assertEqual(len(keys.get(self.multiple.id).correct_option_ids), 3)
+        self.assertIsNone(keys.get(self.draft.id))
+        self.assertIsNone(keys.get(0))
+        self.assertIsNone(keys.get(self.draft.id + 1000))
+    
+    def test_header_is_checked(self):
+        build_answer_keys()
+        with open(self.path, 'r+b') as keys_file:
+            keys_file.write(b'XXXX')
+        with self.assertRaises(ValueError):
+            AnswerKeys(self.path)
+        with self.assertLogs('apps.tickets.answer_keys', 'ERROR'):
+            self.assertIsNone(get_answer_keys())
+    
+    def test_replaced_file_is_remapped(self):
+        build_answer_keys()
+        keys = get_answer_keys()
+        self.assertIsNotNone(keys)
+        self.assertIs(get_answer_keys(), keys)
+        
+        AnswerOption.objects.filter(question=self.single).update(is_correct=True)
+        build_answer_keys()
+        replaced = get_answer_keys()
+        self.assertIsNot(replaced, keys)
+        self.assertNotEqual(replaced.inode, keys.inode)
+        self.assertEqual(replaced.get(self.single.id).correct_option_ids, self.option_ids(self.single))
+        self.rebuild.assert_not_called()
+    
+    def test_missing_or_stale_file_is_rebuilt(self):
+        self.assertIsNone(get_answer_keys())
+        self.rebuild.assert_called_once_with(self.path)
+        
+        build_answer_keys()
+        self.assertIsNotNone(get_answer_keys())
+        bump_content_version()
+        self.assertIsNone(get_answer_keys())
+        self.assertEqual(self.rebuild.call_count, 2)
+    
+    def test_rebuild_runs_in_one_process(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f'{self.path}.lock', 'a') as lock_file, mock.patch('threading.Thread') as thread:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _rebuild_in_background(self.path)
+            thread.assert_not_called()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            _rebuild_in_background(self.path)
+            thread.assert_called_once()
+    
+    def submit(self, attempt, question, option_id):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                f'/api/attempts/{attempt.id}/submit-answer/',
+                {'question_id': question.id, 'selected_option_id': option_id, 'time_spent_seconds': 3},
+                format='json'
+            )
+        options_read = any('"answer_options"' in query['sql'] for query in context.captured_queries)
+        return (response.status_code, response.data), options_read
+    
+    def grade_all(self):
+        single_options = self.option_ids(self.single)
+        multiple_options = self.option_ids(self.multiple)
+        cases = [
+            (self.ticket, None, self.single, self.correct_ids(self.single)[0]),
+            (self.ticket, None, self.single, single_options[0]),
+            (self.ticket, None, self.multiple, self.correct_ids(self.multiple)[-1]),
+            (self.ticket, None, self.multiple, multiple_options[1]),
+            # Question of another ticket
+            (self.ticket, None, self.foreign, self.option_ids(self.foreign)[0]),
+            # Option of another question
+            (self.ticket, None, self.single, multiple_options[0]),
+            (None, [self.single.id, self.foreign.id], self.foreign, self.option_ids(self.foreign)[0]),
+            # Question outside the exam set
+            (None, [self.single.id], self.multiple, multiple_options[0]),
+        ]
+        results, options_read = [], []
+        for ticket, question_ids, question, option_id in cases:
+            attempt = Attempt.objects.create(
+                user=self.user, ticket=ticket, question_ids=question_ids or [],
+                mode='exam' if question_ids else 'learning', total_questions=2
+            )
+            result, read = self.submit(attempt, question, option_id)
+            results.append(result)
+            options_read.append(read)
+        return results, options_read
+    
+    def test_submit_answer_grades_like_database(self):
+        from_database, options_read = self.grade_all()
+        self.assertTrue(any(options_read))
+        
+        build_answer_keys()
+        from_keys, options_read = self.grade_all()
+        self.assertFalse(any(options_read))
+        self.assertEqual(from_keys, from_database)
+        
+        self.assertEqual(
+            [(status_code, data.get('is_correct')) for status_code, data in from_keys],
+            [(200, True), (200, False), (200, True), (200, False), (404, None), (404, None), (200, True), (404, None)]
+        )
+        self.assertEqual(from_keys[0][1]['correct_option_id'], self.correct_ids(self.single)[0])
+    
+    def test_stale_keys_fall_back_to_database(self):
+        build_answer_keys()
+        AnswerOption.objects.filter(question=self.single).update(is_correct=True)
+        bump_content_version()
+        
+        attempt = Attempt.objects.create(user=self.user, ticket=self.ticket, mode='testing', total_questions=2)
+        (status_code, data), options_read = self.submit(attempt, self.single, self.option_ids(self.single)[0])
+        self.assertEqual(status_code, 200)
+        self.assertTrue(data['is_correct'])
+        self.assertTrue(options_read)
+        self.rebuild.assert_called_once_with(self.path)
+
+
+class FirstIndexRandom(random.Random):
+    """Always draws the first element, so rejection sampling only sees repeats."""
+    
+    def randrange(self, *args, **kwargs):
+        return 0
+
+
+class QuestionPoolTests(SimpleTestCase):
+    """Exam questions are distinct and meet every quota."""
+    
+    def setUp(self):
+        self.categories = {}
+        rows = []
+        for question_id in range(1, 61):
+            category = 1 if question_id <= 20 else 2 if question_id <= 50 else None
+            self.categories[question_id] = category
+            rows.append((question_id, category, question_id % 5 + 1))
+        self.tagged = list(range(1, 11))
+        self.pool = QuestionPool(1, rows, {'знаки': self.tagged})
+    
+    def test_candidates(self):
+        self.assertEqual(self.pool.candidates(category=1), list(range(1, 21)))
+        self.assertEqual(self.pool.candidates(category=2, difficulty=1), [25, 30, 35, 40, 45, 50])
+        self.assertEqual(self.pool.candidates(category=1, tag=' Знаки ', difficulty=2), [1, 6])
+        self.assertIs(self.pool.candidates(category=2, difficulty=1), self.pool.candidates(category=2, difficulty=1))
+        self.assertEqual(self.pool.candidates(tag='нет'), [])
+        self.assertIs(self.pool.candidates(), self.pool.question_ids)
+    
+    def test_quotas_are_met_without_duplicates(self):
+        quotas = [
+            {'category': 1, 'count': 5},
+            {'difficulty': 3, 'count': 4},
+            {'category': 2, 'difficulty': 1, 'count': 3},
+            {'tag': 'знаки', 'count': 2},
+        ]
+        for seed in range(50):
+            chosen = self.pool.sample(20, quotas, rng=random.Random(seed))
+            self.assertEqual(len(chosen), 20)
+            self.assertEqual(len(set(chosen)), 20)
+            self.assertGreaterEqual(sum(self.categories[question_id] == 1 for question_id in chosen), 5)
+            self.assertGreaterEqual(sum(question_id % 5 + 1 == 3 for question_id in chosen), 4)
+            self.assertGreaterEqual(sum(question_id in (25, 30, 35, 40, 45, 50) for question_id in chosen), 3)
+            self.assertGreaterEqual(sum(question_id in self.tagged for question_id in chosen), 2)
+    
+    def test_short_rejection_sampling_falls_back_to_scan(self):
+        chosen = self.pool.sample(25, [{'category': 1, 'count': 20}], rng=FirstIndexRandom(0))
+        self.assertEqual(len(set(chosen)), 25)
+        self.assertTrue(set(range(1, 21)) <= set(chosen))
+        
+        # The second quota only has the questions the first one left
+        chosen = self.pool.sample(20, [{'tag': 'знаки', 'count': 4}, {'category': 1, 'count': 16}], rng=FirstIndexRandom(0))
+        self.assertEqual(sorted(chosen), list(range(1, 21)))
+    
+    def test_unsatisfiable_quotas(self):
+        cases = [
+            (30, [{'category': 1, 'count': 15}, {'category': 1, 'count': 6}], 'Not enough questions for quota'),
+            (30, [{'difficulty': 5, 'count': 13}], 'Not enough questions for quota'),
+            (5, [{'category': 2, 'count': 6}], 'Quotas exceed exam questions count'),
+            (61, [], 'Not enough questions for exam'),
+        ]
+        for questions_count, quotas, message in cases:
+            with self.subTest(quotas=quotas), self.assertRaisesRegex(ExamAssemblyError, message):
+                self.pool.sample(questions_count, quotas, rng=random.Random(0))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    EXAM_MAX_MISTAKES=2,
+)
+class ExamAttemptTests(TestCase):
+    """Exam attempts draw questions by quotas and pass with few enough mistakes."""
+    
+    def setUp(self):
+        cache.clear()
+        mock.patch.object(exam, '_pool', None).start()
+        mock.patch.object(leaderboard, '_backend', leaderboard.InMemoryLeaderboardBackend()).start()
+        mock.patch.object(answer_keys, '_rebuild_in_background').start()
+        self.addCleanup(mock.patch.stopall)
+        
+        self.signs = TicketCategory.objects.create(name='Знаки')
+        self.rules = TicketCategory.objects.create(name='Правила')
+        for number, category in enumerate((self.signs, self.rules, None), start=1):
+            ticket = Ticket.objects.create(number=str(number), title=f'Билет {number}', status='published', category=category)
+            for order in range(1, 7):
+                question = Question.objects.create(
+                    ticket=ticket, text=f'Вопрос {number}.{order}', order=order, difficulty_level=order % 3 + 1
+                )
+                for option_order in (1, 2):
+                    AnswerOption.objects.create(
+                        question=question, text=f'Ответ {option_order}', order=option_order, is_correct=option_order == 1
+                    )
+        Question.objects.filter(ticket__category=self.signs, order=6).update(is_active=False)
+        draft = Ticket.objects.create(number='4', title='Билет 4', status='draft')
+        Question.objects.create(ticket=draft, text='Черновик', order=1)
+        
+        self.user = User.objects.create(username='examinee', telegram_id=6001)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def create_exam(self, **data):
+        return self.client.post('/api/attempts/exam/', data, format='json')
+    
+    def test_exam_questions_meet_quotas(self):
+        response = self.create_exam(questions_count=12, quotas=[
+            {'category': self.signs.id, 'count': 5},
+            {'category': self.rules.id, 'difficulty': 2, 'count': 2},
+        ])
+        self.assertEqual(response.status_code, 201)
+        question_ids = response.data['attempt']['question_ids']
+        self.assertEqual(response.data['attempt']['total_questions'], 12)
+        self.assertEqual(len(set(question_ids)), 12)
+        self.assertEqual([question['id'] for question in response.data['questions']], question_ids)
+        
+        questions = Question.objects.filter(id__in=question_ids)
+        self.assertEqual(questions.count(), 12)
+        self.assertFalse(questions.filter(is_active=False).exists())
+        self.assertFalse(questions.exclude(ticket__status='published').exists())
+        # Five active questions in the category, all of them are drawn
+        self.assertEqual(questions.filter(ticket__category=self.signs).count(), 5)
+        self.assertGreaterEqual(questions.filter(ticket__category=self.rules, difficulty_level=2).count(), 2)
+    
+    def test_unsatisfiable_quota_is_rejected(self):
+        response = self.create_exam(questions_count=10, quotas=[{'category': self.signs.id, 'count': 6}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quota', response.data['error'])
+        self.assertFalse(Attempt.objects.exists())
+    
+    def take_exam(self, correct, wrong):
+        """Answer correct and wrong questions, leave the rest unanswered and complete."""
+        attempt = self.create_exam(questions_count=6).data['attempt']
+        attempt_id, question_ids = attempt['id'], attempt['question_ids']
+        for index, question_id in enumerate(question_ids[:correct + wrong]):
+            option = AnswerOption.objects.get(question_id=question_id, order=1 if index < correct else 2)
+            response = self.client.post(
+                f'/api/attempts/{attempt_id}/submit-answer/',
+                {'question_id': question_id, 'selected_option_id': option.id}, format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+        
+        response = self.client.post(f'/api/attempts/{attempt_id}/complete/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_exam_passes_with_max_mistakes(self):
+        result = self.take_exam(correct=4, wrong=1)
+        self.assertEqual(result['correct_answers'], 4)
+        self.assertTrue(result['is_passed'])
+    
+    def test_exam_fails_with_more_mistakes(self):
+        # Unanswered questions count as mistakes
+        result = self.take_exam(correct=3, wrong=1)
+        self.assertEqual(result['correct_answers'], 3)
+        self.assertFalse(result['is_passed'])
+        
+        result = self.take_exam(correct=3, wrong=3)
+        self.assertFalse(result['is_passed'])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    API_THROTTLE_ENABLED=False,
+    ANSWER_KEYS_CHECK_SECONDS=0,
+)
+class ExplanationsQueryTests(TestCase):
+    """Explanations take the same queries for one question and for the maximum."""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path_override = override_settings(ANSWER_KEYS_PATH=os.path.join(directory.name, 'answer_keys.bin'))
+        path_override.enable()
+        self.addCleanup(path_override.disable)
+        mock.patch.object(answer_keys, '_current', None).start()
+        mock.patch.dict(content._local_version, {'value': None, 'checked_at': 0.0}).start()
+        mock.patch.object(answer_keys, '_rebuild_in_background').start()
+        self.addCleanup(mock.patch.stopall)
+        
+        self.tickets = []
+        per_ticket = settings.EXPLANATIONS_MAX_QUESTIONS // 4
+        for number in range(1, 5):
+            ticket = Ticket.objects.create(number=str(number), title=f'Билет {number}', status='published')
+            questions = Question.objects.bulk_create([
+                Question(ticket=ticket, text=f'Вопрос {order}', order=order, explanation=f'Пояснение {order}')
+                for order in range(1, per_ticket + 1)
+            ])
+            AnswerOption.objects.bulk_create([
+                AnswerOption(question=question, text=f'Ответ {order}', order=order, is_correct=order == 1)
+                for question in questions for order in (1, 2)
+            ])
+            self.tickets.append(ticket)
+        self.short_ticket = Ticket.objects.create(number='5', title='Билет 5', status='published')
+        self.short_question = Question.objects.create(ticket=self.short_ticket, text='Вопрос', order=1)
+        AnswerOption.objects.create(question=self.short_question, text='Ответ', order=1, is_correct=True)
+        
+        self.user = User.objects.create(username='learner', telegram_id=7001)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def get(self, queries, **params):
+        cache.clear()
+        local_cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/tickets/explanations/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def all_question_ids(self):
+        return list(Question.objects.filter(ticket__in=self.tickets).order_by('-id').values_list('id', flat=True))
+    
+    def test_ticket_queries_do_not_grow_with_questions(self):
+        # Published tickets, questions, options and tags
+        self.assertEqual(len(self.get(4, ticket='5')), 1)
+        self.assertEqual(len(self.get(4, ticket='1')), settings.EXPLANATIONS_MAX_QUESTIONS // 4)
+    
+    def test_ids_queries_do_not_grow_with_questions(self):
+        # Tickets of the questions, questions, options and tags
+        self.assertEqual(len(self.get(4, ids=str(self.short_question.id))), 1)
+        
+        question_ids = self.all_question_ids()
+        self.assertEqual(len(question_ids), settings.EXPLANATIONS_MAX_QUESTIONS)
+        data = self.get(4, ids=','.join(map(str, question_ids)))
+        self.assertEqual([question['id'] for question in data], question_ids)
+        self.assertEqual(data[0]['explanation'], f'Пояснение {settings.EXPLANATIONS_MAX_QUESTIONS // 4}')
+    
+    def test_ids_are_resolved_from_answer_keys(self):
+        build_answer_keys()
+        self.get(3, ids=str(self.short_question.id))
+        self.get(3, ids=','.join(map(str, self.all_question_ids())))
+    
+    def test_too_many_ids_are_rejected(self):
+        question_ids = self.all_question_ids() + [self.short_question.id]
+        for ids in (','.join(map(str, question_ids)), '', '1,x'):
+            with self.subTest(ids=ids[:20]), self.assertNumQueries(0):
+                response = self.client.get('/api/tickets/explanations/', {'ids': ids})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    API_THROTTLE_ENABLED=False,
+)
+class SearchTests(TestCase):
+    """Search ranks matches in the user's language and falls back to trigrams for typos.
+
+    Needs a database with a UTF-8 ctype, as in docker-compose: with the C ctype
+    PostgreSQL neither lowercases nor extracts trigrams from Cyrillic text.
+    """
+    
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.signs = Ticket.objects.create(number='1', title='Дорожные знаки', status='published')
+            self.crossing = Ticket.objects.create(
+                number='2', title='Пешеходный переход', description='Pedestrian crossings', status='published'
+            )
+            Ticket.objects.create(number='3', title='Знаки в черновике', status='draft')
+            
+            self.in_text = self.create_question(self.signs, 1, 'Какие знаки запрещают стоянку?', explanation='')
+            self.in_explanation = self.create_question(
+                self.signs, 2, 'Можно ли здесь остановиться?', explanation='Это разрешают дорожные знаки.'
+            )
+            self.in_option = self.create_question(self.signs, 3, 'Что означает разметка?', options=['Знаком обозначена полоса'])
+            self.english = self.create_question(self.crossing, 1, 'Who yields at pedestrian crossings?', explanation='')
+            self.armenian = self.create_question(self.crossing, 2, 'Ո՞վ է զիջում ճանապարհը հետիոտնին', explanation='')
+        
+        self.user = User.objects.create(username='searcher', telegram_id=8001, language='ru')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def create_question(self, ticket, order, text, explanation='', options=('Да', 'Нет')):
+        question = Question.objects.create(ticket=ticket, text=text, order=order, explanation=explanation)
+        for option_order, option_text in enumerate(options, start=1):
+            AnswerOption.objects.create(question=question, text=option_text, order=option_order, is_correct=option_order == 1)
+        return question
+    
+    def search(self, query, language=None):
+        if language:
+            User.objects.filter(pk=self.user.pk).update(language=language)
+            self.user.refresh_from_db()
+        response = self.client.get('/api/tickets/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+    
+    def test_russian_matches_word_forms_by_weight(self):
+        data = self.search('знак')
+        self.assertFalse(data['fuzzy'])
+        self.assertEqual([ticket['id'] for ticket in data['tickets']], [self.signs.id])
+        self.assertIn('<b>знаки</b>', data['tickets'][0]['snippet'])
+        # Question text outranks options, options outrank the explanation
+        self.assertEqual(
+            [question['id'] for question in data['questions']],
+            [self.in_text.id, self.in_option.id, self.in_explanation.id]
+        )
+        ranks = [question['rank'] for question in data['questions']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertIn('<b>знаки</b>', data['questions'][2]['explanation_snippet'])
+    
+    def test_english_stems_and_other_configs(self):
+        data = self.search('crossing', language='en')
+        self.assertEqual([ticket['id'] for ticket in data['tickets']], [self.crossing.id])
+        self.assertEqual([question['id'] for question in data['questions']], [self.english.id])
+        
+        # Armenian has no dictionary: 'simple' matches whole words only
+        data = self.search('զիջում', language='hy')
+        self.assertFalse(data['fuzzy'])
+        self.assertEqual([question['id'] for question in data['questions']], [self.armenian.id])
+        
+        # Vectors hold lexemes of every configuration, so stems match whatever the user language
+        data = self.search('знак', language='en')
+        self.assertEqual([question['id'] for question in data['questions']], [self.in_text.id, self.in_option.id, self.in_explanation.id])
+    
+    def test_typo_falls_back_to_trigrams(self):
+        data = self.search('пешиходный')
+        self.assertTrue(data['fuzzy'])
+        self.assertEqual([ticket['id'] for ticket in data['tickets']], [self.crossing.id])
+        
+        data = self.search('сттоянку')
+        self.assertTrue(data['fuzzy'])
+        self.assertEqual([question['id'] for question in data['questions']], [self.in_text.id])
+        self.assertGreater(data['questions'][0]['rank'], 0)
+    
+    def test_editing_content_refreshes_vectors(self):
+        self.assertEqual(self.search('светофор')['questions'], [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_text.text = 'Какой сигнал светофора запрещает движение?'
+            self.in_text.save()
+        self.assertEqual([question['id'] for question in self.search('светофор')['questions']], [self.in_text.id])
+        self.assertNotIn(self.in_text.id, [question['id'] for question in self.search('стоянка')['questions']])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_explanation.options.filter(order=1).update(text='Да')
+            option = self.in_explanation.options.get(order=2)
+            option.text = 'Только у перекрёстка'
+            option.save()
+        self.assertEqual([question['id'] for question in self.search('перекрёстке')['questions']], [self.in_explanation.id])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crossing.title = 'Регулировщик'
+            self.crossing.save()
+        self.assertEqual(self.search('регулировщика')['tickets'][0]['id'], self.crossing.id)
@@ -1,17 +1,22 @@
 from django.urls import path
 from .views import (
     TicketListView, TicketDetailView, TicketForTestingView,
-    UserProgressListView, get_random_ticket, get_question_explanation,
-    get_user_stats
+    UserProgressListView, QuestionListView, get_random_ticket,
+    get_question_explanation, get_explanations, get_user_stats, get_tags,
+    get_tag_practice, search
 )
 
 urlpatterns = [
     path('', TicketListView.as_view(), name='ticket-list'),
-    path('<str:number>/', TicketDetailView.as_view(), name='ticket-detail'),
-    path('<str:number>/testing/', TicketForTestingView.as_view(), name='ticket-for-testing'),
     path('progress/', UserProgressListView.as_view(), name='user-progress-list'),
     path('random/', get_random_ticket, name='random-ticket'),
+    path('search/', search, name='ticket-search'),
+    path('questions/', QuestionListView.as_view(), name='question-list'),
     path('questions/<int:question_id>/explanation/', get_question_explanation, name='question-explanation'),
+    path('explanations/', get_explanations, name='explanations'),
+    path('tags/', get_tags, name='tag-list'),
+    path('tags/<str:name>/practice/', get_tag_practice, name='tag-practice'),
     path('stats/', get_user_stats, name='user-stats'),
+    path('<str:number>/', TicketDetailView.as_view(), name='ticket-detail'),
+    path('<str:number>/testing/', TicketForTestingView.as_view(), name='ticket-for-testing'),
 ]
-
@@ -1,15 +1,28 @@
+import random
 from rest_framework import generics, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
+from django.conf import settings
+from django.http import Http404
 from .models import Ticket, Question, UserTicketProgress
 from .serializers import (
     TicketSerializer, TicketListSerializer, TicketForTestingSerializer,
     UserTicketProgressSerializer, QuestionSerializer
 )
+from .filters import TicketFilter, QuestionFilter
+from .tags import get_tag_index, sample_tag_questions
+from .cache import get_published_tickets, get_ticket_payload, get_ticket_explanations
+from .answer_keys import get_answer_keys
+from .search import (
+    TicketSearchFilter, search_tickets, search_questions,
+    fuzzy_search_tickets, fuzzy_search_questions
+)
 from apps.users.authentication import TelegramAuthentication
+from config.db_router import use_primary_db
+from config.throttling import ExpensiveThrottle
 
 
 class TicketListView(generics.ListAPIView):
@@ -19,9 +32,8 @@ class TicketListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     serializer_class = TicketListSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'status']
-    search_fields = ['number', 'title', 'description']
+    filter_backends = [DjangoFilterBackend, TicketSearchFilter, filters.OrderingFilter]
+    filterset_class = TicketFilter
     ordering_fields = ['order', 'number', 'title', 'created_at']
     ordering = ['order', 'number']
     
@@ -40,12 +52,20 @@ class TicketDetailView(generics.RetrieveAPIView):
     
     serializer_class = TicketSerializer
     lookup_field = 'number'
+    payload_kind = 'detail'
     
     def get_queryset(self):
         """Get published tickets."""
         return Ticket.objects.filter(status='published').prefetch_related(
-            'category', 'questions__options'
+            'category', 'questions__options', 'questions__tags'
         )
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Serve cached ticket payload."""
+        payload = get_ticket_payload(self.payload_kind, kwargs[self.lookup_field])
+        if payload is None:
+            raise Http404
+        return Response(payload)
 
 
 class TicketForTestingView(generics.RetrieveAPIView):
@@ -56,12 +76,20 @@ class TicketForTestingView(generics.RetrieveAPIView):
     
     serializer_class = TicketForTestingSerializer
     lookup_field = 'number'
+    payload_kind = 'testing'
     
     def get_queryset(self):
         """Get published tickets."""
         return Ticket.objects.filter(status='published').prefetch_related(
             'questions__options'
         )
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Serve cached ticket payload."""
+        payload = get_ticket_payload(self.payload_kind, kwargs[self.lookup_field])
+        if payload is None:
+            raise Http404
+        return Response(payload)
 
 
 class UserProgressListView(generics.ListAPIView):
@@ -83,34 +111,142 @@ class UserProgressListView(generics.ListAPIView):
         ).prefetch_related('ticket')
 
 
+class QuestionListView(generics.ListAPIView):
+    """List questions of published tickets (filterable by tag)."""
+    
+    authentication_classes = [TelegramAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    serializer_class = QuestionSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = QuestionFilter
+    
+    def get_queryset(self):
+        """Get active questions of published tickets."""
+        return Question.objects.filter(
+            is_active=True,
+            ticket__status='published'
+        ).prefetch_related('options', 'tags').order_by('ticket_id', 'order')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_tags(request):
+    """Get tags with questions count."""
+    index = get_tag_index()
+    return Response([
+        {'name': name, 'questions_count': len(question_ids)}
+        for name, question_ids in sorted(index.items())
+    ])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ExpensiveThrottle])
+def get_tag_practice(request, name):
+    """Get random questions by tag (practice by topic)."""
+    try:
+        count = int(request.query_params.get('count', 20))
+    except ValueError:
+        return Response(
+            {'message': 'Invalid count'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    count = max(1, min(count, settings.TAG_PRACTICE_MAX_QUESTIONS))
+    
+    question_ids = sample_tag_questions(name.strip().lower(), count)
+    if not question_ids:
+        return Response(
+            {'message': 'No questions for this tag'}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related('options', 'tags')
+    questions_by_id = {question.id: question for question in questions}
+    ordered_questions = [questions_by_id[question_id] for question_id in question_ids if question_id in questions_by_id]
+    
+    serializer = QuestionSerializer(ordered_questions, many=True)
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ExpensiveThrottle])
+def search(request):
+    """Ranked full-text search over tickets and questions with highlighted snippets."""
+    query_text = request.query_params.get('q', '').strip()
+    if not query_text:
+        return Response(
+            {'message': 'Query is required'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    language = request.user.language
+    limit = settings.SEARCH_RESULTS_LIMIT
+    
+    tickets = list(search_tickets(query_text, language, limit))
+    questions = list(search_questions(query_text, language, limit))
+    
+    # Fall back to trigram similarity for misspelled queries
+    fuzzy = not tickets and not questions
+    if fuzzy:
+        tickets = list(fuzzy_search_tickets(query_text, limit))
+        questions = list(fuzzy_search_questions(query_text, limit))
+    
+    return Response({
+        'query': query_text,
+        'fuzzy': fuzzy,
+        'tickets': [
+            {
+                'id': ticket.id,
+                'number': ticket.number,
+                'title': ticket.title,
+                'snippet': getattr(ticket, 'snippet', ticket.title),
+                'rank': ticket.rank,
+            }
+            for ticket in tickets
+        ],
+        'questions': [
+            {
+                'id': question.id,
+                'ticket_number': question.ticket.number,
+                'order': question.order,
+                'snippet': getattr(question, 'snippet', question.text[:200]),
+                'explanation_snippet': getattr(question, 'explanation_snippet', ''),
+                'rank': question.rank,
+            }
+            for question in questions
+        ],
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_random_ticket(request):
     """Get random ticket for testing (excluding passed ones if setting enabled)."""
     user = request.user
     
-    # Base queryset
-    queryset = Ticket.objects.filter(status='published')
+    # Published tickets come from cache instead of ORDER BY random()
+    tickets = get_published_tickets()
     
     # Exclude passed tickets if user setting is enabled
     if user.exclude_passed_tickets:
-        passed_tickets = UserTicketProgress.objects.filter(
+        passed_tickets = set(UserTicketProgress.objects.filter(
             user=user,
             is_completed=True
-        ).values_list('ticket_id', flat=True)
-        queryset = queryset.exclude(id__in=passed_tickets)
+        ).values_list('ticket_id', flat=True))
+        tickets = [ticket for ticket in tickets if ticket[0] not in passed_tickets]
     
     # Get random ticket
-    ticket = queryset.order_by('?').first()
+    payload = get_ticket_payload('testing', random.choice(tickets)[1]) if tickets else None
     
-    if not ticket:
+    if not payload:
         return Response(
             {'message': 'No available tickets'}, 
             status=status.HTTP_404_NOT_FOUND
         )
     
-    serializer = TicketForTestingSerializer(ticket)
-    return Response(serializer.data)
+    return Response(payload)
 
 
 @api_view(['GET'])
@@ -118,7 +254,7 @@ def get_random_ticket(request):
 def get_question_explanation(request, question_id):
     """Get question explanation (for learning mode)."""
     try:
-        question = Question.objects.get(
+        question = Question.objects.prefetch_related('options', 'tags').get(
             id=question_id,
             ticket__status='published'
         )
@@ -131,6 +267,60 @@ def get_question_explanation(request, question_id):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_explanations(request):
+    """Get explanations of a whole ticket (?ticket=<number>) or of questions (?ids=1,2,3) for learning mode."""
+    number = request.query_params.get('ticket')
+    if number:
+        ticket_id = next((ticket_id for ticket_id, ticket_number in get_published_tickets() if ticket_number == number), None)
+        if ticket_id is None:
+            return Response(
+                {'message': 'Ticket not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(get_ticket_explanations([ticket_id])[ticket_id])
+    
+    try:
+        question_ids = list(dict.fromkeys(
+            int(question_id) for question_id in request.query_params.get('ids', '').split(',') if question_id.strip()
+        ))
+    except ValueError:
+        return Response(
+            {'message': 'Invalid ids'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not question_ids or len(question_ids) > settings.EXPLANATIONS_MAX_QUESTIONS:
+        return Response(
+            {'message': f'Pass ticket or 1-{settings.EXPLANATIONS_MAX_QUESTIONS} question ids'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Tickets of the questions come from the answer keys file, the database is the fallback
+    ticket_ids = {}
+    answer_keys = get_answer_keys()
+    if answer_keys is not None:
+        for question_id in question_ids:
+            key = answer_keys.get(question_id)
+            if key is not None:
+                ticket_ids[question_id] = key.ticket_id
+    unresolved = [question_id for question_id in question_ids if question_id not in ticket_ids]
+    if unresolved:
+        ticket_ids.update(Question.objects.filter(
+            id__in=unresolved,
+            ticket__status='published'
+        ).values_list('id', 'ticket_id'))
+    
+    explanations = get_ticket_explanations(ticket_ids.values())
+    questions_by_id = {
+        question['id']: question
+        for ticket_id in set(ticket_ids.values())
+        for question in explanations[ticket_id]
+    }
+    return Response([questions_by_id[question_id] for question_id in question_ids if question_id in questions_by_id])
+
+
+@use_primary_db
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_stats(request):
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from apps.admin_panel.exports import export_action
 from .models import User
+from .search import user_search_q
 
 
 @admin.register(User)
@@ -11,8 +13,10 @@ class UserAdmin(BaseUserAdmin):
         'telegram_id', 'display_name', 'telegram_username', 
         'language', 'is_active', 'is_admin', 'created_at', 'last_activity'
     ]
-    list_filter = ['is_active', 'is_admin', 'is_verified', 'language', 'created_at']
-    search_fields = ['telegram_id', 'telegram_username', 'telegram_first_name', 'telegram_last_name']
+    list_filter = ['is_active', 'is_admin', 'is_verified', 'language', 'created_at', 'bot_blocked_at']
+    # Searched by get_search_results: '@username', ids or name fragments
+    search_fields = ['telegram_username', 'telegram_first_name', 'telegram_last_name']
+    search_help_text = '@username, Telegram ID или часть имени (от 3 символов)'
     ordering = ['-created_at']
     
     fieldsets = (
@@ -23,7 +27,7 @@ class UserAdmin(BaseUserAdmin):
             'fields': ('avatar', 'phone', 'language', 'exclude_passed_tickets')
         }),
         ('Status', {
-            'fields': ('is_active', 'is_verified', 'is_admin')
+            'fields': ('is_active', 'is_verified', 'is_admin', 'bot_blocked_at')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at', 'last_activity'),
@@ -33,6 +37,17 @@ class UserAdmin(BaseUserAdmin):
     
     readonly_fields = ['telegram_id', 'created_at', 'updated_at', 'last_activity']
     
+    actions = [export_action('users'), export_action('users', compress=True)]
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Indexed user search (also used by autocomplete widgets)."""
+        if not search_term.strip():
+            return queryset, False
+        condition = user_search_q(search_term)
+        if condition is None:
+            return queryset.none(), False
+        return queryset.filter(condition), False
+    
     def has_add_permission(self, request):
         """Disable adding users through admin (they should be created via Telegram)."""
         return False
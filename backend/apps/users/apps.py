@@ -1,8 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = 'Пользователи'
-
+    
+    def ready(self):
+        from .signals import create_extensions
+        pre_migrate.connect(create_extensions, sender=self)
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 
@@ -33,6 +35,11 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_activity = models.DateTimeField(null=True, blank=True)
+    bot_blocked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Пользователь заблокировал бота, рассылки ему не отправляются"
+    )
     
     # Admin fields
     is_admin = models.BooleanField(default=False)
@@ -44,6 +51,13 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            # Support search: iexact/icontains compare UPPER(column), so the indexes are on it too
+            models.Index(Upper('telegram_username'), name='users_username_upper_idx'),
+            GinIndex(OpClass(Upper('telegram_username'), name='gin_trgm_ops'), name='users_username_trgm_idx'),
+            GinIndex(OpClass(Upper('telegram_first_name'), name='gin_trgm_ops'), name='users_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('telegram_last_name'), name='gin_trgm_ops'), name='users_last_name_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"{self.telegram_first_name} {self.telegram_last_name}".strip() or self.username
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from .models import User
+
+NAME_FIELDS = ['telegram_username', 'telegram_first_name', 'telegram_last_name']
+MAX_BIGINT = 2 ** 63 - 1
+# Shorter fragments have no trigram and would scan the whole table
+MIN_WORD_LENGTH = 3
+
+
+def user_search_q(term):
+    """Build filter for user search, None if the term cannot be searched efficiently.
+
+    '@name' matches username exactly, digits match Telegram or internal id,
+    anything else matches every word against username and name fields
+    (served by pg_trgm GIN indexes).
+    """
+    term = term.strip()
+    if term.startswith('@'):
+        username = term[1:].strip()
+        return Q(telegram_username__iexact=username) if username else None
+    
+    if term.isdigit():
+        number = int(term)
+        return Q(telegram_id=number) | Q(pk=number) if number <= MAX_BIGINT else None
+    
+    words = [word for word in term.split() if len(word) >= MIN_WORD_LENGTH]
+    if not words:
+        return None
+    
+    condition = Q()
+    for word in words[:settings.USER_SEARCH_MAX_WORDS]:
+        word_condition = Q()
+        for field in NAME_FIELDS:
+            word_condition |= Q(**{f'{field}__icontains': word})
+        condition &= word_condition
+    return condition
+
+
+def search_users(term, limit=None):
+    """Find users by term, best trigram matches first."""
+    if limit is None:
+        limit = settings.USER_SEARCH_MAX_RESULTS
+    condition = user_search_q(term)
+    if condition is None:
+        return User.objects.none()
+    
+    return User.objects.filter(condition).annotate(
+        similarity=Greatest(*[TrigramSimilarity(field, term.strip().lstrip('@')) for field in NAME_FIELDS])
+    ).order_by('-similarity', 'id')[:limit]
@@ -0,0 +1,8 @@
+from django.db import connections
+
+
+def create_extensions(using, **kwargs):
+    """Create PostgreSQL extensions used by indexes before migrate/syncdb builds tables."""
+    with connections[using].cursor() as cursor:
+        # Trigram GIN indexes on User name fields (see apps/users/search.py)
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
@@ -0,0 +1,111 @@
+"""Read replica routing.
+
+Reads of safe API requests go to a replica, everything else (writes, admin,
+management commands, unsafe requests) uses the primary. After a write to
+the sticky paths the client is pinned to the primary for a short time so
+it always reads its own writes despite replication lag.
+"""
+import contextvars
+import hashlib
+import random
+from django.conf import settings
+from django.core.cache import cache
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+PIN_KEY = 'db:primary_pin:{client}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter:
+    """Send reads to a random replica when the current request allows it."""
+    
+    def db_for_read(self, model, **hints):
+        if settings.REPLICA_DATABASES and _use_replica.get():
+            return random.choice(settings.REPLICA_DATABASES)
+        return 'default'
+    
+    def db_for_write(self, model, **hints):
+        return 'default'
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def database_routing(value):
+    """Per-view override: 'primary' or 'replica'.
+
+    Put it above @api_view, or set database_routing attribute on a view class.
+    """
+    def decorator(view):
+        view.database_routing = value
+        return view
+    return decorator
+
+
+use_primary_db = database_routing('primary')
+use_replica_db = database_routing('replica')
+
+
+def client_key(request):
+    """Identify client before DRF authentication: Telegram initData, session or address."""
+    identity = (
+        request.META.get('HTTP_X_TELEGRAM_INIT_DATA')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+
+def is_pinned(request):
+    return cache.get(PIN_KEY.format(client=client_key(request))) is not None
+
+
+def pin_to_primary(request):
+    cache.set(PIN_KEY.format(client=client_key(request)), 1, settings.DB_PRIMARY_STICKY_SECONDS)
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether reads may go to a replica."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        
+        token = _use_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.path.startswith(tuple(settings.DB_STICKY_PATH_PREFIXES))
+        ):
+            pin_to_primary(request)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.REPLICA_DATABASES:
+            return None
+        
+        routing = getattr(view_func, 'database_routing', None) or getattr(
+            getattr(view_func, 'view_class', None), 'database_routing', None
+        )
+        if routing is None:
+            routing = 'replica' if (
+                request.method in SAFE_METHODS
+                and request.path.startswith(tuple(settings.DB_REPLICA_PATH_PREFIXES))
+            ) else 'primary'
+        
+        _use_replica.set(routing == 'replica' and not is_pinned(request))
+        return None
+
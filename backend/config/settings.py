@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +22,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -36,6 +38,11 @@ LOCAL_APPS = [
     'apps.admin_panel',
 ]
 
+# API-only deployments skip the admin and importing every admin module on boot
+ADMIN_ENABLED = config('ADMIN_ENABLED', default=True, cast=bool)
+if not ADMIN_ENABLED:
+    DJANGO_APPS.remove('django.contrib.admin')
+
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
@@ -43,6 +50,8 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'config.throttling.RateLimitHeadersMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -81,6 +90,31 @@ DATABASES = {
     }
 }
 
+# Read replicas: "host" or "host:port", comma-separated (e.g. two local databases via DB_REPLICA_NAME)
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(DB_REPLICA_HOSTS, 1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        # Tests read replicas through the primary connection
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+# Safe requests under these paths read from replicas unless the view overrides it
+DB_REPLICA_PATH_PREFIXES = ['/api/']
+# After a write under these paths the client reads from the primary for a while
+DB_STICKY_PATH_PREFIXES = ['/api/attempts/', '/api/users/']
+DB_PRIMARY_STICKY_SECONDS = config('DB_PRIMARY_STICKY_SECONDS', default=5, cast=int)
+
+# Apps have no migrations: tests build the schema with syncdb (python manage.py test)
+TEST_RUNNER = 'config.test_runner.SyncdbTestRunner'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -133,6 +167,17 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'config.throttling.UserTokenBucketThrottle',
+    ],
+}
+
+# Per-user token buckets: scope -> (tokens refilled per second, bucket size)
+API_THROTTLE_ENABLED = config('API_THROTTLE_ENABLED', default=True, cast=bool)
+API_THROTTLE_RATES = {
+    'read': (config('API_THROTTLE_READ_RATE', default=5.0, cast=float), config('API_THROTTLE_READ_BURST', default=60, cast=int)),
+    'write': (config('API_THROTTLE_WRITE_RATE', default=2.0, cast=float), config('API_THROTTLE_WRITE_BURST', default=30, cast=int)),
+    'expensive': (config('API_THROTTLE_EXPENSIVE_RATE', default=0.2, cast=float), config('API_THROTTLE_EXPENSIVE_BURST', default=10, cast=int)),
 }
 
 # CORS settings
@@ -143,10 +188,90 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+CORS_ALLOW_HEADERS = [
+    *default_headers,
+    'idempotency-key',
+]
+
 # Telegram Bot settings
 TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
 TELEGRAM_WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
 
+# Exam settings
+EXAM_QUESTIONS_COUNT = config('EXAM_QUESTIONS_COUNT', default=20, cast=int)
+EXAM_MAX_MISTAKES = config('EXAM_MAX_MISTAKES', default=2, cast=int)
+# Quotas like {'category': 1, 'tag': 'знаки', 'difficulty': 3, 'count': 5}
+EXAM_QUOTAS = []
+
+# Abandoned attempts sweeper (interval 0 disables in-process scheduler)
+ATTEMPT_ABANDON_AFTER_SECONDS = config('ATTEMPT_ABANDON_AFTER_SECONDS', default=6 * 3600, cast=int)
+ATTEMPT_SWEEP_BATCH_SIZE = config('ATTEMPT_SWEEP_BATCH_SIZE', default=500, cast=int)
+ATTEMPT_SWEEP_FOLD_PROGRESS = config('ATTEMPT_SWEEP_FOLD_PROGRESS', default=False, cast=bool)
+ATTEMPT_SWEEP_INTERVAL_SECONDS = config('ATTEMPT_SWEEP_INTERVAL_SECONDS', default=0, cast=int)
+
+# Pack answers of completed attempts into a single column (and drop answer rows)
+ATTEMPT_PACK_ANSWERS = config('ATTEMPT_PACK_ANSWERS', default=False, cast=bool)
+ATTEMPT_PRUNE_PACKED_ANSWERS = config('ATTEMPT_PRUNE_PACKED_ANSWERS', default=False, cast=bool)
+
+# Idempotency-Key: how long responses are replayed and how long a request may hold the key
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 3600, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=30, cast=int)
+
+# Admin changelists of tables with more rows show planner estimates instead of COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = config('ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000, cast=int)
+
+# Streaming exports: rows fetched per server-side cursor round trip and bytes per response chunk
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+EXPORT_BUFFER_SIZE = config('EXPORT_BUFFER_SIZE', default=64 * 1024, cast=int)
+
+# Nightly readiness job: answer weight halves every READINESS_HALF_LIFE_DAYS, categories
+# start from READINESS_PRIOR_STRENGTH pseudo-answers at READINESS_PRIOR_ACCURACY
+READINESS_HALF_LIFE_DAYS = config('READINESS_HALF_LIFE_DAYS', default=30.0, cast=float)
+READINESS_PRIOR_STRENGTH = 5.0
+READINESS_PRIOR_ACCURACY = 0.5
+READINESS_WORKERS = config('READINESS_WORKERS', default=0, cast=int)
+READINESS_SHARD_SIZE = config('READINESS_SHARD_SIZE', default=2000, cast=int)
+READINESS_CHUNK_SIZE = 5000
+
+# Attempt answers archival
+ATTEMPT_ANSWERS_RETENTION_MONTHS = config('ATTEMPT_ANSWERS_RETENTION_MONTHS', default=12, cast=int)
+ATTEMPT_ANSWERS_ARCHIVE_DIR = config('ATTEMPT_ANSWERS_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+
+# Hot content caches (ticket payloads, answer keys): entries are rebuilt by one worker
+# after FRESH_SECONDS while others serve the stale copy; cold requests wait up to WAIT_SECONDS
+CONTENT_CACHE_TIMEOUT = config('CONTENT_CACHE_TIMEOUT', default=24 * 3600, cast=int)
+CONTENT_CACHE_FRESH_SECONDS = config('CONTENT_CACHE_FRESH_SECONDS', default=3600, cast=int)
+CONTENT_CACHE_LOCK_TIMEOUT = config('CONTENT_CACHE_LOCK_TIMEOUT', default=30, cast=int)
+CONTENT_CACHE_WAIT_SECONDS = config('CONTENT_CACHE_WAIT_SECONDS', default=2, cast=float)
+CONTENT_CACHE_WARM_ON_START = config('CONTENT_CACHE_WARM_ON_START', default=True, cast=bool)
+# Per-process LRU in front of Redis; content version is re-checked at most this often
+CONTENT_L1_MAX_ENTRIES = config('CONTENT_L1_MAX_ENTRIES', default=2000, cast=int)
+CONTENT_L1_MAX_BYTES = config('CONTENT_L1_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+CONTENT_VERSION_CHECK_SECONDS = config('CONTENT_VERSION_CHECK_SECONDS', default=1.0, cast=float)
+
+# Memory-mapped answer keys used for grading (rebuilt per host when content changes)
+ANSWER_KEYS_PATH = config('ANSWER_KEYS_PATH', default=str(BASE_DIR / 'answer_keys' / 'answer_keys.bin'))
+ANSWER_KEYS_CHECK_SECONDS = config('ANSWER_KEYS_CHECK_SECONDS', default=1.0, cast=float)
+
+# Batch explanations: question ids accepted per request
+EXPLANATIONS_MAX_QUESTIONS = 100
+
+# Tag index settings
+TAG_INDEX_TIMEOUT = config('TAG_INDEX_TIMEOUT', default=3600, cast=int)
+TAG_PRACTICE_MAX_QUESTIONS = 50
+
+# Full-text search: PostgreSQL has no Armenian dictionary, so 'hy' uses 'simple'
+SEARCH_CONFIGS = {
+    'hy': 'simple',
+    'ru': 'russian',
+    'en': 'english',
+}
+SEARCH_RESULTS_LIMIT = 20
+
+# User lookup for admin and support tooling
+USER_SEARCH_MAX_RESULTS = config('USER_SEARCH_MAX_RESULTS', default=20, cast=int)
+USER_SEARCH_MAX_WORDS = 3
+
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
@@ -190,11 +315,21 @@ LOGGING = {
     },
 }
 
+# Redis
+REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/1')
+
 # Cache
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
-        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/1'),
+        'LOCATION': REDIS_URL,
     }
 }
 
+# Leaderboards (InMemoryLeaderboardBackend works without Redis)
+LEADERBOARD_BACKEND = config(
+    'LEADERBOARD_BACKEND',
+    default='apps.attempts.leaderboard.RedisLeaderboardBackend'
+)
+LEADERBOARD_SIZE = 50
+
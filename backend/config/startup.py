@@ -0,0 +1,67 @@
+"""Production boot: load everything once in the gunicorn master before forking.
+
+Work done here (imports, URL resolver, model metadata, serializer fields) is
+shared by all workers through copy-on-write, and gc.freeze() keeps the
+collector from touching those pages so they stay shared.
+"""
+import gc
+import logging
+from django.apps import apps
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def warm_url_resolver():
+    """Populate URL resolver caches and import all views."""
+    resolver = get_resolver()
+    resolver.reverse_dict
+    return len(resolver.url_patterns)
+
+
+def warm_models():
+    """Fill model metadata caches."""
+    models = apps.get_models()
+    for model in models:
+        model._meta.get_fields()
+        model._meta.related_objects
+    return len(models)
+
+
+def warm_serializers():
+    """Build fields of project serializers once, importing everything they lazily need."""
+    from rest_framework.serializers import BaseSerializer
+    count = 0
+    for serializer_class in set(_subclasses(BaseSerializer)):
+        if not serializer_class.__module__.startswith('apps.'):
+            continue
+        try:
+            serializer_class().fields
+            count += 1
+        except Exception:
+            logger.debug("Serializer %s cannot be warmed without arguments", serializer_class)
+    return count
+
+
+def warm_up():
+    """Warm process-wide state before workers fork."""
+    stats = {
+        'url_patterns': warm_url_resolver(),
+        'models': warm_models(),
+        'serializers': warm_serializers(),
+    }
+    logger.info("App warmed up: %s", stats)
+    return stats
+
+
+def freeze_heap():
+    """Move all objects to the permanent generation so forked workers do not copy them."""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
@@ -0,0 +1,162 @@
+"""Per-user token bucket throttling.
+
+Each Telegram user has separate buckets for reads, writes and expensive
+endpoints. A bucket is refilled and consumed by one Lua script in Redis, so
+all workers share it in a single round trip. Without Redis (or while it is
+down) every process limits on its own.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = 'throttle:{scope}:{ident}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REDIS_RETRY_SECONDS = 5
+
+# Returns {allowed, tokens left}; uses Redis clock so workers need not agree on time
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class LocalBuckets:
+    """In-process token buckets (bounded number of keys)."""
+    
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def consume(self, key, rate, capacity, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class RedisBuckets:
+    """Token buckets in Redis, falling back to LocalBuckets when Redis is unavailable."""
+    
+    def __init__(self):
+        self.local = LocalBuckets()
+        self._script = None
+        self._redis_down_until = 0.0
+    
+    def consume(self, key, rate, capacity, cost=1):
+        # django.core.cache.cache is a proxy, the backend itself is in caches
+        backend = caches['default']
+        if not isinstance(backend, RedisCache) or time.monotonic() < self._redis_down_until:
+            return self.local.consume(key, rate, capacity, cost)
+        
+        redis_key = backend.make_and_validate_key(key)
+        try:
+            # Django's Redis backend has no scripting API, use its redis-py client directly
+            client = backend._cache.get_client(redis_key, write=True)
+            if self._script is None:
+                self._script = client.register_script(TOKEN_BUCKET_LUA)
+            allowed, tokens = self._script(keys=[redis_key], args=[rate, capacity, cost], client=client)
+        except Exception as exc:
+            # Do not pay a connection timeout on every request while Redis is down
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            logger.warning("Throttling falls back to in-process buckets: %s", exc)
+            return self.local.consume(key, rate, capacity, cost)
+        return bool(allowed), float(tokens)
+
+
+buckets = RedisBuckets()
+
+
+class UserTokenBucketThrottle(BaseThrottle):
+    """Throttle per user: 'read' for safe methods, 'write' otherwise.
+
+    Views can choose a bucket with throttle_scope, e.g. 'expensive'.
+    """
+    
+    scope = None
+    
+    def get_scope(self, request, view):
+        return self.scope or getattr(view, 'throttle_scope', None) or (
+            'read' if request.method in SAFE_METHODS else 'write'
+        )
+    
+    def get_ident(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'user:{user.telegram_id or user.pk}'
+        return f'ip:{super().get_ident(request)}'
+    
+    def allow_request(self, request, view):
+        if not settings.API_THROTTLE_ENABLED:
+            return True
+        
+        scope = self.get_scope(request, view)
+        rate, capacity = settings.API_THROTTLE_RATES[scope]
+        key = BUCKET_KEY.format(scope=scope, ident=self.get_ident(request))
+        allowed, tokens = buckets.consume(key, rate, capacity)
+        
+        self.wait_seconds = None if allowed else (1 - tokens) / rate
+        # Read by RateLimitHeadersMiddleware
+        request._request.rate_limit = {
+            'limit': capacity,
+            'remaining': int(tokens),
+            'reset': math.ceil((capacity - tokens) / rate),
+            'policy': f'{capacity};w={math.ceil(capacity / rate)}',
+        }
+        return allowed
+    
+    def wait(self):
+        return self.wait_seconds
+
+
+class ExpensiveThrottle(UserTokenBucketThrottle):
+    """Small bucket for endpoints that are costly to serve."""
+    
+    scope = 'expensive'
+
+
+class RateLimitHeadersMiddleware:
+    """Add RateLimit-* headers for requests that went through a token bucket throttle."""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['RateLimit-Limit'] = str(rate_limit['limit'])
+            response['RateLimit-Remaining'] = str(rate_limit['remaining'])
+            response['RateLimit-Reset'] = str(rate_limit['reset'])
+            response['RateLimit-Policy'] = rate_limit['policy']
+        return response
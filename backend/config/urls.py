@@ -1,16 +1,18 @@
-from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/auth/', include('apps.users.urls')),
     path('api/tickets/', include('apps.tickets.urls')),
     path('api/attempts/', include('apps.attempts.urls')),
     path('api/admin/', include('apps.admin_panel.urls')),
 ]
 
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
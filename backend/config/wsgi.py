@@ -5,3 +5,11 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
 
+if os.environ.get('DJANGO_PRELOAD_MASTER'):
+    # Loaded once in the gunicorn master: warm shared state, workers start their own threads after fork
+    from config.startup import warm_up  # noqa: E402
+    warm_up()
+else:
+    # Optional in-process scheduler for abandoned attempts
+    from apps.attempts.sweeper import start_sweeper  # noqa: E402
+    start_sweeper()
@@ -0,0 +1,63 @@
+import logging
+import os
+from decouple import config
+
+logger = logging.getLogger('gunicorn.error')
+
+# Production boot: import and warm the app once in the master, fork workers from it
+preload_app = config('GUNICORN_PRELOAD', default=True, cast=bool)
+if preload_app:
+    os.environ['DJANGO_PRELOAD_MASTER'] = '1'
+
+
+def warm_content():
+    """Warm content caches; a failure only makes the first requests slower."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connections
+    from apps.tickets.cache import warm_content_cache
+    
+    try:
+        if settings.CONTENT_CACHE_WARM_ON_START:
+            logger.info("Cache warmed: %s", warm_content_cache())
+    except Exception:
+        # Cold cache is slow, not broken: never block startup on it
+        logger.exception("Cache warm-up failed")
+    finally:
+        # Workers forked later must not inherit connections opened here
+        connections.close_all()
+        cache.close()
+
+
+def when_ready(server):
+    """Warm content caches in the preloaded master before workers start taking requests."""
+    if not preload_app:
+        # The master does not load Django without preload, the first worker warms instead
+        return
+    
+    from config.startup import freeze_heap
+    warm_content()
+    logger.info("Frozen %s objects before forking workers", freeze_heap())
+
+
+def pre_fork(server, worker):
+    """Keep objects created in the master since the last fork out of the collector."""
+    if preload_app:
+        import gc
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Start per-process threads that could not be started in the preloaded master.
+
+    Without preload the first worker warms the caches: the Redis layer and the
+    answer keys file are shared, so one worker is enough.
+    """
+    if preload_app:
+        from apps.attempts.sweeper import start_sweeper
+        start_sweeper()
+    elif worker.age == 1:
+        warm_content()
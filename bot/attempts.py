@@ -0,0 +1,168 @@
+"""Quiz attempts written straight to the backend tables through the shared pool.
+
+Mirrors what the API does for testing-mode attempts: the same rows in
+users, attempts, attempt_answers and user_ticket_progress. User statistics
+are recalculated by the backend when they are requested.
+"""
+from db import get_pool
+
+# A user writing to the bot has not blocked it (any more)
+UPSERT_USER_SQL = """
+    INSERT INTO users (
+        password, is_superuser, username, first_name, last_name, email, is_staff, is_active,
+        date_joined, telegram_id, telegram_username, telegram_first_name, telegram_last_name,
+        language, exclude_passed_tickets, phone, is_verified, is_admin,
+        created_at, updated_at, last_activity
+    )
+    VALUES (
+        '', false, 'tg_' || $1::bigint::text, '', '', '', false, true,
+        now(), $1, $2, $3, $4,
+        'hy', true, '', false, false,
+        now(), now(), now()
+    )
+    ON CONFLICT (telegram_id) DO UPDATE SET
+        telegram_username = EXCLUDED.telegram_username,
+        telegram_first_name = EXCLUDED.telegram_first_name,
+        telegram_last_name = EXCLUDED.telegram_last_name,
+        last_activity = now(),
+        bot_blocked_at = NULL
+    RETURNING id
+"""
+
+SET_BOT_BLOCKED_SQL = """
+    UPDATE users SET bot_blocked_at = CASE WHEN $2 THEN COALESCE(bot_blocked_at, now()) END
+    WHERE telegram_id = ANY($1::bigint[])
+"""
+
+CREATE_ATTEMPT_SQL = """
+    INSERT INTO attempts (
+        user_id, ticket_id, question_ids, mode, status, total_questions, correct_answers,
+        score_percentage, is_passed, started_at, created_at, updated_at
+    )
+    VALUES ($1, $2, '[]'::jsonb, 'testing', 'in_progress', $3, 0, 0, false, now(), now(), now())
+    RETURNING id
+"""
+
+# Taken before RECORD_ANSWER_SQL, like submit_answer in the backend does: the lock keeps
+# the NOT EXISTS check race-free, so the unique check of attempt_answers never has to fail
+LOCK_ATTEMPT_SQL = "SELECT 1 FROM attempts WHERE id = $1 AND status = 'in_progress' FOR UPDATE"
+
+# Answer is stored only once and only while attempt is in progress
+RECORD_ANSWER_SQL = """
+    WITH inserted AS (
+        INSERT INTO attempt_answers (
+            attempt_id, question_id, selected_option_id, is_correct, time_spent_seconds, answered_at
+        )
+        SELECT $1::bigint, $2::bigint, $3::bigint, $4::boolean, $5::integer, now()
+        WHERE EXISTS (SELECT 1 FROM attempts WHERE id = $1 AND status = 'in_progress')
+          AND NOT EXISTS (SELECT 1 FROM attempt_answers WHERE attempt_id = $1 AND question_id = $2)
+        RETURNING is_correct
+    )
+    UPDATE attempts SET
+        correct_answers = correct_answers + (SELECT count(*) FROM inserted WHERE is_correct),
+        updated_at = now()
+    WHERE id = $1 AND EXISTS (SELECT 1 FROM inserted)
+    RETURNING id
+"""
+
+COMPLETE_ATTEMPT_SQL = """
+    UPDATE attempts SET
+        status = 'completed',
+        completed_at = now(),
+        duration_seconds = EXTRACT(EPOCH FROM now() - started_at)::int,
+        score_percentage = CASE WHEN total_questions > 0
+            THEN correct_answers * 100 / total_questions ELSE 0 END,
+        is_passed = total_questions > 0 AND correct_answers = total_questions,
+        updated_at = now()
+    WHERE id = $1 AND status = 'in_progress'
+    RETURNING user_id, ticket_id, total_questions, correct_answers, score_percentage, is_passed
+"""
+
+# Same upsert as UserTicketProgress.add_results
+UPDATE_PROGRESS_SQL = """
+    INSERT INTO user_ticket_progress AS progress (
+        user_id, ticket_id, is_completed, completed_at, attempts_count, best_score,
+        total_questions_answered, correct_answers_count, created_at, updated_at
+    )
+    VALUES (
+        $1, $2, $5 = 100, CASE WHEN $5 = 100 THEN now() END, 1, $5,
+        $3, $4, now(), now()
+    )
+    ON CONFLICT (user_id, ticket_id) DO UPDATE SET
+        attempts_count = progress.attempts_count + EXCLUDED.attempts_count,
+        total_questions_answered = progress.total_questions_answered + EXCLUDED.total_questions_answered,
+        correct_answers_count = progress.correct_answers_count + EXCLUDED.correct_answers_count,
+        best_score = GREATEST(progress.best_score, EXCLUDED.best_score),
+        is_completed = progress.is_completed OR EXCLUDED.is_completed,
+        completed_at = COALESCE(progress.completed_at, EXCLUDED.completed_at),
+        updated_at = EXCLUDED.updated_at
+"""
+
+ABANDON_ATTEMPT_SQL = """
+    UPDATE attempts SET status = 'abandoned', updated_at = now()
+    WHERE id = $1 AND status = 'in_progress'
+"""
+
+
+async def get_or_create_user(telegram_user):
+    """Get backend user id for Telegram user, creating the user like WebApp auth does."""
+    pool = await get_pool()
+    return await pool.fetchval(
+        UPSERT_USER_SQL,
+        telegram_user.id,
+        telegram_user.username or '',
+        telegram_user.first_name or '',
+        telegram_user.last_name or '',
+    )
+
+
+async def set_bot_blocked(telegram_ids, blocked=True):
+    """Mark users who blocked the bot (broadcasts skip them) or unblocked it."""
+    pool = await get_pool()
+    await pool.execute(SET_BOT_BLOCKED_SQL, list(telegram_ids), blocked)
+
+
+async def create_attempt(user_id, ticket_id, total_questions):
+    pool = await get_pool()
+    return await pool.fetchval(CREATE_ATTEMPT_SQL, user_id, ticket_id, total_questions)
+
+
+async def record_answer(attempt_id, question_id, option_id, is_correct, time_spent_seconds):
+    """Store answer; returns False if it was already stored or attempt is closed."""
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            if await connection.fetchval(LOCK_ATTEMPT_SQL, attempt_id) is None:
+                return False
+            result = await connection.fetchval(
+                RECORD_ANSWER_SQL, attempt_id, question_id, option_id, is_correct, time_spent_seconds
+            )
+    return result is not None
+
+
+async def complete_attempt(attempt_id):
+    """Complete attempt and update ticket progress in one transaction.
+
+    Answers are not packed here even with ATTEMPT_PACK_ANSWERS: the backend's
+    pack_attempt_answers packs them, archive_attempt_answers runs it first.
+    """
+    pool = await get_pool()
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            attempt = await connection.fetchrow(COMPLETE_ATTEMPT_SQL, attempt_id)
+            if attempt is None:
+                return None
+            await connection.execute(
+                UPDATE_PROGRESS_SQL,
+                attempt['user_id'],
+                attempt['ticket_id'],
+                attempt['total_questions'],
+                attempt['correct_answers'],
+                attempt['score_percentage'],
+            )
+    return attempt
+
+
+async def abandon_attempt(attempt_id):
+    pool = await get_pool()
+    await pool.execute(ABANDON_ATTEMPT_SQL, attempt_id)
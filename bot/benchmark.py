@@ -0,0 +1,113 @@
+"""Webhook load benchmark against local fake Telegram server.
+
+Starts fake_telegram.py and the bot webhook app in this process, posts
+synthetic updates and reports sustained updates/sec and latency metrics.
+Use --target to benchmark an already running bot (e.g. WEBHOOK_PROCESSES=4).
+"""
+import argparse
+import asyncio
+import os
+import time
+import aiohttp
+from aiohttp import web
+from fake_telegram import FakeTelegramAPI
+
+FAKE_API_PORT = 8081
+BOT_PORT = 8090
+
+
+def make_update(update_id, chat_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': 'hello',
+        },
+    }
+
+
+async def start_site(app, port):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def post_updates(url, count, chats, concurrency):
+    statuses = {}
+    update_ids = iter(range(1, count + 1))
+    
+    async def client(session):
+        for update_id in update_ids:
+            async with session.post(url, json=make_update(update_id, update_id % chats + 1)) as response:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+    
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    return statuses
+
+
+async def wait_processed(metrics_url, count, timeout=120):
+    """Wait until queues are drained (metrics of several processes are per process)."""
+    deadline = time.monotonic() + timeout
+    previous = None
+    async with aiohttp.ClientSession() as session:
+        while True:
+            async with session.get(metrics_url) as response:
+                metrics = await response.json()
+            done = metrics['processed'] + metrics['errors']
+            drained = metrics['queue_depth'] == 0 and previous == (metrics['pid'], done)
+            if done >= count or drained or time.monotonic() > deadline:
+                return metrics
+            previous = (metrics['pid'], done)
+            await asyncio.sleep(0.05)
+
+
+async def run(args):
+    runners = []
+    base_url = args.target
+    if not base_url:
+        api = FakeTelegramAPI(rate_limit=0, latency=args.api_latency)
+        runners.append(await start_site(api.create_app(), FAKE_API_PORT))
+        
+        os.environ.setdefault('TELEGRAM_BOT_TOKEN', '123456:benchmark')
+        os.environ['TELEGRAM_API_URL'] = f'http://127.0.0.1:{FAKE_API_PORT}'
+        os.environ['TELEGRAM_WEBHOOK_URL'] = ''
+        import main
+        runners.append(await start_site(main.create_app(), BOT_PORT))
+        base_url = f'http://127.0.0.1:{BOT_PORT}'
+    
+    try:
+        started_at = time.monotonic()
+        statuses = await post_updates(f'{base_url}/webhook', args.updates, args.chats, args.concurrency)
+        acked_at = time.monotonic()
+        accepted = statuses.get(200, 0)
+        metrics = await wait_processed(f'{base_url}/metrics', accepted)
+        finished_at = time.monotonic()
+    finally:
+        for runner in reversed(runners):
+            await runner.cleanup()
+    
+    print(f"HTTP statuses:      {statuses}")
+    print(f"Acknowledged:       {args.updates / (acked_at - started_at):.0f} updates/sec")
+    print(f"Processed:          {accepted / (finished_at - started_at):.0f} updates/sec")
+    print(f"Queue wait, ms:     {metrics['wait_ms']}")
+    print(f"Processing, ms:     {metrics['process_ms']}")
+    print(f"Errors:             {metrics['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Webhook throughput benchmark')
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50, help='Parallel HTTP clients')
+    parser.add_argument('--api-latency', type=float, default=0.02, help='Fake Bot API latency, seconds')
+    parser.add_argument('--target', help='Base URL of running bot instead of in-process app')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest, TelegramNetworkError
+)
+from decouple import config
+import attempts
+from db import get_pool, close_pool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BOT_TOKEN = config('TELEGRAM_BOT_TOKEN')
+TELEGRAM_API_URL = config('TELEGRAM_API_URL', default='')
+
+# Telegram allows about 30 messages per second overall and 1 per second per chat
+BROADCAST_RATE = config('BROADCAST_RATE', default=25, cast=float)
+BROADCAST_CHAT_INTERVAL = config('BROADCAST_CHAT_INTERVAL', default=1.0, cast=float)
+BROADCAST_WORKERS = config('BROADCAST_WORKERS', default=20, cast=int)
+BROADCAST_BATCH_SIZE = config('BROADCAST_BATCH_SIZE', default=1000, cast=int)
+MAX_RETRIES = 5
+
+REMINDER_TEXT = (
+    "👋 Вы не занимались уже несколько дней.\n"
+    "Решите пару билетов, чтобы не терять форму перед экзаменом!"
+)
+
+
+class TokenBucket:
+    """Token bucket shared by all workers."""
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+    
+    def pause(self, seconds):
+        """Stop issuing tokens (Telegram asked to retry later)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ChatLimiter:
+    """Minimal interval between messages to the same chat."""
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self.last_sent = {}
+    
+    async def wait(self, chat_id):
+        last_sent = self.last_sent.get(chat_id)
+        if last_sent is not None:
+            delay = last_sent + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self.last_sent[chat_id] = time.monotonic()
+    
+    def prune(self):
+        """Forget chats that can already receive messages."""
+        threshold = time.monotonic() - self.interval
+        self.last_sent = {chat_id: sent for chat_id, sent in self.last_sent.items() if sent > threshold}
+
+
+class Checkpoint:
+    """Resumable broadcast progress stored in JSON file."""
+    
+    def __init__(self, path, text):
+        self.path = path
+        self.text_hash = hashlib.sha256(text.encode()).hexdigest()
+        self.last_id = 0
+        self.stats = {'sent': 0, 'blocked': 0, 'failed': 0}
+    
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as checkpoint_file:
+            data = json.load(checkpoint_file)
+        if data.get('text_hash') != self.text_hash:
+            logger.info("Checkpoint is for another message, starting from scratch")
+            return
+        self.last_id = data['last_id']
+        self.stats.update(data['stats'])
+    
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as checkpoint_file:
+            json.dump({
+                'text_hash': self.text_hash,
+                'last_id': self.last_id,
+                'stats': self.stats,
+            }, checkpoint_file)
+        os.replace(tmp_path, self.path)
+
+
+async def fetch_recipients(pool, after_id, limit, inactive_days=None):
+    """Get next batch of Telegram ids ordered by id (keyset pagination)."""
+    query = """
+        SELECT telegram_id FROM users
+        WHERE is_active AND bot_blocked_at IS NULL AND telegram_id IS NOT NULL AND telegram_id > $1
+    """
+    args = [after_id, limit]
+    if inactive_days is not None:
+        query += " AND (last_activity IS NULL OR last_activity < now() - make_interval(days => $3))"
+        args.append(inactive_days)
+    query += " ORDER BY telegram_id LIMIT $2"
+    
+    async with pool.acquire() as connection:
+        rows = await connection.fetch(query, *args)
+    return [row['telegram_id'] for row in rows]
+
+
+class BroadcastEngine:
+    """Send one message to many chats with a worker pool under Telegram limits."""
+    
+    def __init__(self, bot, text, checkpoint, workers=BROADCAST_WORKERS, rate=BROADCAST_RATE,
+                 chat_interval=BROADCAST_CHAT_INTERVAL, on_blocked=None, **send_kwargs):
+        self.bot = bot
+        self.text = text
+        self.checkpoint = checkpoint
+        # Async callable (chat ids) called after each batch with chats that blocked the bot
+        self.on_blocked = on_blocked
+        self.blocked = []
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.chat_limiter = ChatLimiter(chat_interval)
+        self.send_kwargs = send_kwargs
+        self.queue = asyncio.Queue(maxsize=workers * 2)
+    
+    async def send(self, chat_id):
+        """Send message to chat, retrying on flood control and network errors."""
+        for attempt in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            await self.chat_limiter.wait(chat_id)
+            try:
+                await self.bot.send_message(chat_id, self.text, **self.send_kwargs)
+                self.checkpoint.stats['sent'] += 1
+                return
+            except TelegramRetryAfter as exc:
+                logger.warning("Flood control, pausing for %s seconds", exc.retry_after)
+                self.bucket.pause(exc.retry_after)
+            except TelegramForbiddenError:
+                self.checkpoint.stats['blocked'] += 1
+                self.blocked.append(chat_id)
+                return
+            except TelegramBadRequest as exc:
+                logger.warning("Cannot send to %s: %s", chat_id, exc.message)
+                break
+            except TelegramNetworkError:
+                await asyncio.sleep(2 ** attempt)
+        
+        self.checkpoint.stats['failed'] += 1
+    
+    async def worker(self):
+        while True:
+            chat_id = await self.queue.get()
+            try:
+                await self.send(chat_id)
+            except Exception:
+                logger.exception("Unexpected error sending to %s", chat_id)
+                self.checkpoint.stats['failed'] += 1
+            finally:
+                self.queue.task_done()
+    
+    async def run(self, recipients):
+        """Broadcast to recipients: async callable (after_id) -> list of chat ids."""
+        self.checkpoint.load()
+        tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        started_at = time.monotonic()
+        
+        try:
+            while True:
+                batch = await recipients(self.checkpoint.last_id)
+                if not batch:
+                    break
+                for chat_id in batch:
+                    await self.queue.put(chat_id)
+                
+                # Checkpoint only after the whole batch is done so resume never skips chats
+                await self.queue.join()
+                if self.blocked and self.on_blocked:
+                    await self.on_blocked(self.blocked)
+                self.blocked = []
+                self.checkpoint.last_id = batch[-1]
+                self.checkpoint.save()
+                self.chat_limiter.prune()
+                
+                elapsed = time.monotonic() - started_at
+                logger.info("Up to %s: %s (%.1f msg/s)", batch[-1], self.checkpoint.stats,
+                            self.checkpoint.stats['sent'] / elapsed if elapsed else 0)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return self.checkpoint.stats
+
+
+def create_bot(api_url=TELEGRAM_API_URL):
+    """Create bot, optionally pointed at another Bot API server (e.g. fake_telegram.py)."""
+    if api_url:
+        return Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+    return Bot(token=BOT_TOKEN)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Broadcast message to bot users')
+    parser.add_argument('--text', help='Message text (default: practice reminder)')
+    parser.add_argument('--text-file', help='Read message text from file')
+    parser.add_argument('--inactive-days', type=int, help='Only users inactive for this many days')
+    parser.add_argument('--checkpoint', default='broadcast.json', help='Progress file for resuming')
+    parser.add_argument('--workers', type=int, default=BROADCAST_WORKERS)
+    parser.add_argument('--rate', type=float, default=BROADCAST_RATE, help='Messages per second')
+    parser.add_argument('--batch-size', type=int, default=BROADCAST_BATCH_SIZE)
+    parser.add_argument('--api-url', default=TELEGRAM_API_URL, help='Bot API server base URL')
+    args = parser.parse_args()
+    
+    if args.text_file:
+        with open(args.text_file) as text_file:
+            text = text_file.read()
+    else:
+        text = args.text or REMINDER_TEXT
+    
+    bot = create_bot(args.api_url)
+    pool = await get_pool()
+    
+    async def recipients(after_id):
+        return await fetch_recipients(pool, after_id, args.batch_size, args.inactive_days)
+    
+    engine = BroadcastEngine(
+        bot,
+        text,
+        Checkpoint(args.checkpoint, text),
+        workers=args.workers,
+        rate=args.rate,
+        on_blocked=attempts.set_bot_blocked,
+    )
+    try:
+        stats = await engine.run(recipients)
+        logger.info("Broadcast finished: %s", stats)
+    finally:
+        await close_pool()
+        await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
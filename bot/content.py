@@ -0,0 +1,132 @@
+"""Published tickets for the bot, cached in process and refreshed by TTL."""
+import asyncio
+import random
+import time
+from decouple import config
+from db import get_pool
+
+CONTENT_CACHE_TTL = config('CONTENT_CACHE_TTL', default=300, cast=int)
+
+# Telegram quiz poll limits
+POLL_QUESTION_MAX_LENGTH = 300
+POLL_OPTION_MAX_LENGTH = 100
+POLL_EXPLANATION_MAX_LENGTH = 200
+POLL_MAX_OPTIONS = 10
+
+TICKETS_QUERY = """
+    SELECT id, number, title FROM tickets
+    WHERE status = 'published'
+    ORDER BY "order", number
+"""
+QUESTIONS_QUERY = """
+    SELECT q.id, q.ticket_id, q.text, q.image, q.explanation, q.explanation_image
+    FROM questions q JOIN tickets t ON t.id = q.ticket_id
+    WHERE t.status = 'published' AND q.is_active
+    ORDER BY q.ticket_id, q."order"
+"""
+OPTIONS_QUERY = """
+    SELECT o.id, o.question_id, o.text, o.image, o.option_type, o.is_correct
+    FROM answer_options o
+    JOIN questions q ON q.id = o.question_id
+    JOIN tickets t ON t.id = q.ticket_id
+    WHERE t.status = 'published' AND q.is_active
+    ORDER BY o.question_id, o."order"
+"""
+
+
+def is_quiz_question(question):
+    """Question can be sent as quiz poll: 2-10 text options, exactly one correct.
+
+    Other questions are sent with an inline keyboard.
+    """
+    options = question['options']
+    return (
+        2 <= len(options) <= POLL_MAX_OPTIONS
+        and all(option['option_type'] == 'text' and option['text'] for option in options)
+        and sum(option['is_correct'] for option in options) == 1
+    )
+
+
+class ContentCache:
+    """Snapshot of published content loaded with three queries per refresh."""
+    
+    def __init__(self, ttl=CONTENT_CACHE_TTL):
+        self.ttl = ttl
+        self.loaded_at = None
+        self.tickets = {}
+        self.by_number = {}
+        self.questions = {}
+        self.unanswerable = set()
+        self.lock = asyncio.Lock()
+    
+    def is_fresh(self):
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl
+    
+    async def load(self):
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            ticket_rows = await connection.fetch(TICKETS_QUERY)
+            question_rows = await connection.fetch(QUESTIONS_QUERY)
+            option_rows = await connection.fetch(OPTIONS_QUERY)
+        
+        options = {}
+        for row in option_rows:
+            options.setdefault(row['question_id'], []).append(dict(row))
+        
+        questions = {}
+        for row in question_rows:
+            question = dict(row, options=options.get(row['id'], []))
+            question['is_quiz'] = is_quiz_question(question)
+            questions.setdefault(row['ticket_id'], []).append(question)
+        
+        # A ticket is served whole or not at all, otherwise a partial quiz would count as passed
+        tickets = {}
+        unanswerable = set()
+        for row in ticket_rows:
+            if row['id'] not in questions:
+                continue
+            if all(question['options'] for question in questions[row['id']]):
+                tickets[row['id']] = dict(row, questions=questions[row['id']])
+            else:
+                unanswerable.add(row['number'])
+        
+        self.tickets = tickets
+        self.unanswerable = unanswerable
+        self.by_number = {ticket['number']: ticket for ticket in tickets.values()}
+        self.questions = {
+            question['id']: question
+            for ticket in tickets.values()
+            for question in ticket['questions']
+        }
+        self.loaded_at = time.monotonic()
+    
+    async def refresh(self):
+        """Reload content if TTL expired; one reload at a time."""
+        if self.is_fresh():
+            return self
+        async with self.lock:
+            if not self.is_fresh():
+                await self.load()
+        return self
+    
+    async def get_ticket(self, number=None):
+        """Get ticket by number or a random one."""
+        await self.refresh()
+        if number is not None:
+            return self.by_number.get(number)
+        if not self.tickets:
+            return None
+        return random.choice(list(self.tickets.values()))
+    
+    async def is_unanswerable(self, number):
+        """Ticket is published but has questions without answer options."""
+        await self.refresh()
+        return number in self.unanswerable
+    
+    async def get_question(self, question_id):
+        """Get question by id (None if it was unpublished since)."""
+        await self.refresh()
+        return self.questions.get(question_id)
+
+
+content_cache = ContentCache()
@@ -0,0 +1,146 @@
+"""Local fake Telegram Bot API server for load tests and broadcast dry runs.
+
+Point the bot at it with TELEGRAM_API_URL=http://localhost:8081 (or --api-url).
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import deque
+from aiohttp import web
+
+
+class FakeTelegramAPI:
+    """Minimal Bot API emulation with global flood control and blocked chats.
+
+    Like Telegram for another bot token, it rejects file_ids it did not issue.
+    """
+    
+    def __init__(self, rate_limit=30, blocked=(), latency=0.0):
+        self.rate_limit = rate_limit
+        self.blocked = set(blocked)
+        self.latency = latency
+        self.sent = deque()
+        self.message_ids = itertools.count(1)
+        self.file_ids = itertools.count(1)
+        self.issued_file_ids = set()
+        self.stats = {'requests': 0, 'ok': 0, 'retry_after': 0, 'blocked': 0, 'uploads': 0}
+    
+    def flood_wait(self):
+        """Seconds to wait if more than rate_limit requests were made in the last second."""
+        now = time.monotonic()
+        while self.sent and self.sent[0] < now - 1:
+            self.sent.popleft()
+        if self.rate_limit and len(self.sent) >= self.rate_limit:
+            return 1
+        self.sent.append(now)
+        return 0
+    
+    def message(self, chat_id, **extra):
+        return {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            **extra,
+        }
+    
+    async def handle(self, request):
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            payload = await request.json()
+        else:
+            payload = dict(await request.post())
+            # Uploaded content is not needed, only the fact of the upload
+            for value in payload.values():
+                if isinstance(value, web.FileField):
+                    value.file.close()
+        self.stats['requests'] += 1
+        
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        retry_after = self.flood_wait()
+        if retry_after:
+            self.stats['retry_after'] += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }, status=429)
+        
+        chat_id = payload.get('chat_id')
+        if chat_id is not None and int(chat_id) in self.blocked:
+            self.stats['blocked'] += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 403,
+                'description': 'Forbidden: bot was blocked by the user',
+            }, status=403)
+        
+        media = payload.get('photo') or payload.get('document')
+        if isinstance(media, str) and not media.startswith('attach://') and media not in self.issued_file_ids:
+            return web.json_response({
+                'ok': False,
+                'error_code': 400,
+                'description': 'Bad Request: wrong file identifier/HTTP URL specified',
+            }, status=400)
+        
+        self.stats['ok'] += 1
+        return web.json_response({'ok': True, 'result': self.result(method, payload)})
+    
+    def result(self, method, payload):
+        method = method.lower()
+        if method == 'getme':
+            return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+        if method == 'sendmessage':
+            return self.message(payload['chat_id'], text=payload.get('text', ''))
+        if method in ('sendphoto', 'senddocument'):
+            media = payload.get('photo') or payload.get('document')
+            if isinstance(media, str) and not media.startswith('attach://'):
+                # Sent by file_id, nothing uploaded
+                file_id = media
+            else:
+                self.stats['uploads'] += 1
+                file_id = f"fake-file-{next(self.file_ids)}"
+                self.issued_file_ids.add(file_id)
+            photo = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1}]
+            return self.message(payload['chat_id'], photo=photo)
+        if method == 'sendpoll':
+            return self.message(payload['chat_id'], poll={
+                'id': str(next(self.message_ids)),
+                'question': payload.get('question', ''),
+                'options': [],
+                'total_voter_count': 0,
+                'is_closed': False,
+                'is_anonymous': False,
+                'type': payload.get('type', 'regular'),
+                'allows_multiple_answers': False,
+            })
+        return True
+    
+    async def get_stats(self, request):
+        return web.json_response(self.stats)
+    
+    def create_app(self):
+        app = web.Application()
+        app.router.add_get('/stats', self.get_stats)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Telegram Bot API server')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rate-limit', type=int, default=30, help='Requests per second before 429 (0 disables)')
+    parser.add_argument('--blocked', default='', help='Comma-separated chat ids that blocked the bot')
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial response latency, seconds')
+    args = parser.parse_args()
+    
+    blocked = [int(chat_id) for chat_id in args.blocked.split(',') if chat_id]
+    api = FakeTelegramAPI(rate_limit=args.rate_limit, blocked=blocked, latency=args.latency)
+    web.run_app(api.create_app(), port=args.port)
+
+
+if __name__ == '__main__':
+    main()
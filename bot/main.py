@@ -1,12 +1,19 @@
 import asyncio
 import logging
 import os
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher, F, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import CommandStart, Command
 from aiogram.types import WebAppInfo, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiogram.webhook.aiohttp_server import setup_application
 from aiohttp import web
 from decouple import config
+import attempts
+from db import close_pool
+from quiz import router as quiz_router
+from storage import create_storage, create_events_isolation
+from webhook import QueuedRequestHandler, WEBHOOK_SECRET, serve
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,13 +24,29 @@ BOT_TOKEN = config('TELEGRAM_BOT_TOKEN')
 WEBHOOK_URL = config('TELEGRAM_WEBHOOK_URL', default='')
 WEBHOOK_PATH = '/webhook'
 WEBAPP_URL = config('WEBAPP_URL', default='http://localhost:3000')
+WEBHOOK_PORT = config('WEBHOOK_PORT', default=8080, cast=int)
+TELEGRAM_API_URL = config('TELEGRAM_API_URL', default='')
 
 # Initialize bot and dispatcher
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+if TELEGRAM_API_URL:
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+else:
+    bot = Bot(token=BOT_TOKEN)
+dp = Dispatcher(storage=create_storage(), events_isolation=create_events_isolation())
+router = Router()
 
+# Quiz commands go before the catch-all handler
+dp.include_routers(quiz_router, router)
+dp.shutdown.register(close_pool)
 
-@dp.message(CommandStart())
+
+@router.my_chat_member(F.chat.type == 'private')
+async def bot_blocked_handler(event: types.ChatMemberUpdated):
+    """Remember whether the user blocked the bot, so broadcasts skip them."""
+    await attempts.set_bot_blocked([event.from_user.id], event.new_chat_member.status == 'kicked')
+
+
+@router.message(CommandStart())
 async def start_command(message: types.Message):
     """Handle /start command."""
     user = message.from_user
@@ -60,7 +83,7 @@ async def start_command(message: types.Message):
     await message.answer(welcome_text, reply_markup=keyboard)
 
 
-@dp.message(Command('help'))
+@router.message(Command('help'))
 async def help_command(message: types.Message):
     """Handle /help command."""
     help_text = """
@@ -69,6 +92,8 @@ async def help_command(message: types.Message):
 /start - Начать работу с ботом
 /help - Показать эту справку
 /app - Открыть веб-приложение
+/quiz - Пройти билет прямо в чате (/quiz 5 - билет №5)
+/stop - Остановить тест
 
 📱 Веб-приложение включает:
 • Режим обучения - изучение билетов с объяснениями
@@ -93,7 +118,7 @@ async def help_command(message: types.Message):
     await message.answer(help_text, reply_markup=keyboard)
 
 
-@dp.message(Command('app'))
+@router.message(Command('app'))
 async def app_command(message: types.Message):
     """Handle /app command."""
     keyboard = InlineKeyboardMarkup(
@@ -110,7 +135,7 @@ async def app_command(message: types.Message):
     await message.answer("Нажмите кнопку ниже, чтобы открыть веб-приложение:", reply_markup=keyboard)
 
 
-@dp.message()
+@router.message()
 async def handle_message(message: types.Message):
     """Handle other messages."""
     keyboard = InlineKeyboardMarkup(
@@ -137,7 +162,7 @@ async def on_startup():
     if WEBHOOK_URL:
         # Set webhook
         webhook_url = f"{WEBHOOK_URL}{WEBHOOK_PATH}"
-        await bot.set_webhook(webhook_url)
+        await bot.set_webhook(webhook_url, secret_token=WEBHOOK_SECRET or None)
         logger.info(f"Webhook set to: {webhook_url}")
     else:
         logger.info("Running in polling mode")
@@ -157,10 +182,11 @@ def create_app():
     """Create aiohttp application for webhook."""
     app = web.Application()
     
-    # Setup webhook handler
-    webhook_requests_handler = SimpleRequestHandler(
+    # Setup webhook handler (bounded queues, /metrics)
+    webhook_requests_handler = QueuedRequestHandler(
         dispatcher=dp,
         bot=bot,
+        secret_token=WEBHOOK_SECRET or None,
     )
     webhook_requests_handler.register(app, path=WEBHOOK_PATH)
     
@@ -170,39 +196,32 @@ def create_app():
     return app
 
 
-async def main():
-    """Main function."""
-    if WEBHOOK_URL:
-        # Run with webhook
-        app = create_app()
-        
-        # Start web server
-        runner = web.AppRunner(app)
-        await runner.setup()
-        site = web.TCPSite(runner, '0.0.0.0', 8080)
-        await site.start()
-        
-        logger.info("Bot is running with webhook on port 8080")
-        
-        # Keep running
-        try:
-            await asyncio.Future()  # Run forever
-        except KeyboardInterrupt:
-            logger.info("Shutting down...")
-        finally:
-            await runner.cleanup()
-    else:
-        # Run in polling mode
+def run_webhook():
+    """Run webhook server (several processes if WEBHOOK_PROCESSES > 1)."""
+    async def register_webhook():
         await on_startup()
-        
-        try:
-            await dp.start_polling(bot)
-        except KeyboardInterrupt:
-            logger.info("Shutting down...")
-        finally:
-            await on_shutdown()
+        await bot.session.close()
+    
+    # Webhook is registered once, worker processes only serve updates
+    asyncio.run(register_webhook())
+    logger.info(f"Bot is running with webhook on port {WEBHOOK_PORT}")
+    serve(create_app, port=WEBHOOK_PORT)
 
 
-if __name__ == '__main__':
-    asyncio.run(main())
+async def main():
+    """Main function (polling mode)."""
+    await on_startup()
+    
+    try:
+        await dp.start_polling(bot)
+    except KeyboardInterrupt:
+        logger.info("Shutting down...")
+    finally:
+        await on_shutdown()
+
 
+if __name__ == '__main__':
+    if WEBHOOK_URL:
+        run_webhook()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,104 @@
+"""Send media by cached Telegram file_id instead of uploading it every time.
+
+Images are keyed by content hash, so a replaced image gets a new entry
+and an unchanged image reuses the file_id even if it was renamed.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+from decouple import config
+from db import get_pool
+
+logger = logging.getLogger(__name__)
+
+MEDIA_ROOT = config('MEDIA_ROOT', default='../backend/media')
+
+GET_FILE_ID_SQL = "SELECT file_id FROM telegram_media WHERE sha256 = $1"
+SAVE_FILE_ID_SQL = """
+    INSERT INTO telegram_media (sha256, file_id, file_unique_id, path, created_at, updated_at)
+    VALUES ($1, $2, $3, $4, now(), now())
+    ON CONFLICT (sha256) DO UPDATE SET
+        file_id = EXCLUDED.file_id,
+        file_unique_id = EXCLUDED.file_unique_id,
+        path = EXCLUDED.path,
+        updated_at = now()
+"""
+DELETE_FILE_ID_SQL = "DELETE FROM telegram_media WHERE sha256 = $1"
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as media_file:
+        for chunk in iter(lambda: media_file.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaRegistry:
+    """Content hash -> file_id, in process memory in front of telegram_media table."""
+    
+    def __init__(self, media_root=MEDIA_ROOT):
+        self.media_root = media_root
+        # (path, mtime, size) -> sha256, so files are hashed again only when they change
+        self.hashes = {}
+        self.file_ids = {}
+    
+    def resolve(self, relative_path):
+        path = os.path.join(self.media_root, relative_path)
+        return path if os.path.isfile(path) else None
+    
+    async def file_hash(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self.hashes:
+            self.hashes[key] = await asyncio.to_thread(_sha256, path)
+        return self.hashes[key]
+    
+    async def get_file_id(self, sha256):
+        if sha256 not in self.file_ids:
+            pool = await get_pool()
+            file_id = await pool.fetchval(GET_FILE_ID_SQL, sha256)
+            if file_id is None:
+                return None
+            self.file_ids[sha256] = file_id
+        return self.file_ids[sha256]
+    
+    async def save_file_id(self, sha256, photo, relative_path):
+        self.file_ids[sha256] = photo.file_id
+        pool = await get_pool()
+        await pool.execute(SAVE_FILE_ID_SQL, sha256, photo.file_id, photo.file_unique_id, relative_path)
+    
+    async def forget(self, sha256):
+        self.file_ids.pop(sha256, None)
+        pool = await get_pool()
+        await pool.execute(DELETE_FILE_ID_SQL, sha256)
+    
+    async def send_photo(self, bot, chat_id, relative_path, **kwargs):
+        """Send image from MEDIA_ROOT, uploading it only the first time.
+
+        Returns sent message or None if the file is missing.
+        """
+        path = self.resolve(relative_path)
+        if path is None:
+            logger.warning("Media file not found: %s", relative_path)
+            return None
+        
+        sha256 = await self.file_hash(path)
+        file_id = await self.get_file_id(sha256)
+        if file_id:
+            try:
+                return await bot.send_photo(chat_id, file_id, **kwargs)
+            except TelegramBadRequest:
+                # file_id is no longer valid (e.g. another bot token), upload again
+                logger.warning("Stale file_id for %s, uploading again", relative_path)
+                await self.forget(sha256)
+        
+        message = await bot.send_photo(chat_id, types.FSInputFile(path), **kwargs)
+        await self.save_file_id(sha256, message.photo[-1], relative_path)
+        return message
+
+
+media_registry = MediaRegistry()
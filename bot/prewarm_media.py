@@ -0,0 +1,80 @@
+"""Upload all images of the published question bank once and register their file_ids.
+
+Images are sent to MEDIA_CHAT_ID (e.g. a private channel with the bot as admin).
+Already registered images are skipped, so the command can be re-run after edits.
+"""
+import argparse
+import asyncio
+import logging
+from aiogram.exceptions import TelegramRetryAfter
+from decouple import config
+from broadcast import TokenBucket, BROADCAST_RATE, create_bot, TELEGRAM_API_URL
+from db import get_pool, close_pool
+from media import media_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MEDIA_CHAT_ID = config('MEDIA_CHAT_ID', default=0, cast=int)
+
+IMAGES_QUERY = """
+    SELECT q.image AS path FROM questions q JOIN tickets t ON t.id = q.ticket_id
+    WHERE t.status = 'published' AND q.is_active AND q.image <> ''
+    UNION
+    SELECT q.explanation_image FROM questions q JOIN tickets t ON t.id = q.ticket_id
+    WHERE t.status = 'published' AND q.is_active AND q.explanation_image <> ''
+    UNION
+    SELECT o.image FROM answer_options o
+    JOIN questions q ON q.id = o.question_id
+    JOIN tickets t ON t.id = q.ticket_id
+    WHERE t.status = 'published' AND q.is_active AND o.image <> ''
+"""
+
+
+async def prewarm(bot, chat_id, rate):
+    pool = await get_pool()
+    paths = [row['path'] for row in await pool.fetch(IMAGES_QUERY)]
+    bucket = TokenBucket(rate)
+    stats = {'uploaded': 0, 'cached': 0, 'missing': 0}
+    
+    for relative_path in paths:
+        path = media_registry.resolve(relative_path)
+        if path is None:
+            stats['missing'] += 1
+            continue
+        if await media_registry.get_file_id(await media_registry.file_hash(path)):
+            stats['cached'] += 1
+            continue
+        
+        while True:
+            await bucket.acquire()
+            try:
+                await media_registry.send_photo(bot, chat_id, relative_path, disable_notification=True)
+                break
+            except TelegramRetryAfter as exc:
+                bucket.pause(exc.retry_after)
+        stats['uploaded'] += 1
+    
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Upload question images to Telegram once')
+    parser.add_argument('--chat-id', type=int, default=MEDIA_CHAT_ID, help='Chat to upload images to')
+    parser.add_argument('--rate', type=float, default=BROADCAST_RATE, help='Uploads per second')
+    parser.add_argument('--api-url', default=TELEGRAM_API_URL, help='Bot API server base URL')
+    args = parser.parse_args()
+    if not args.chat_id:
+        parser.error('--chat-id or MEDIA_CHAT_ID is required')
+    
+    bot = create_bot(args.api_url)
+    try:
+        stats = await prewarm(bot, args.chat_id, args.rate)
+        logger.info("Media prewarm finished: %s", stats)
+    finally:
+        await close_pool()
+        await bot.session.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
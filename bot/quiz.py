@@ -0,0 +1,225 @@
+"""In-chat quiz on Telegram quiz polls."""
+import logging
+import time
+from aiogram import Bot, F, Router, types
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+import attempts
+from content import (
+    content_cache, POLL_QUESTION_MAX_LENGTH, POLL_OPTION_MAX_LENGTH, POLL_EXPLANATION_MAX_LENGTH
+)
+from media import media_registry
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CALLBACK = 'quiz-answer'
+MESSAGE_MAX_LENGTH = 4096
+CALLBACK_ANSWER_MAX_LENGTH = 200
+
+router = Router()
+
+
+class QuizStates(StatesGroup):
+    answering = State()
+
+
+def truncate(text, length):
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+def answer_keyboard(count):
+    """Buttons 1..count, five per row."""
+    buttons = [
+        types.InlineKeyboardButton(text=str(index + 1), callback_data=f"{ANSWER_CALLBACK}:{index}")
+        for index in range(count)
+    ]
+    return types.InlineKeyboardMarkup(inline_keyboard=[buttons[row:row + 5] for row in range(0, count, 5)])
+
+
+async def send_poll_question(bot: Bot, chat_id, header, question):
+    """Send question as quiz poll; returns what identifies the answer to it."""
+    options = question['options']
+    text = f"{header}\n{question['text']}"
+    option_texts = [option['text'] for option in options]
+    
+    # Long texts do not fit into poll: send them as message and number the options
+    if len(text) > POLL_QUESTION_MAX_LENGTH or any(len(option) > POLL_OPTION_MAX_LENGTH for option in option_texts):
+        lines = [text, ''] + [f"{index}. {option}" for index, option in enumerate(option_texts, 1)]
+        await bot.send_message(chat_id, '\n'.join(lines))
+        text = f"{header}: выберите вариант ответа"
+        option_texts = [str(index) for index in range(1, len(options) + 1)]
+    
+    message = await bot.send_poll(
+        chat_id,
+        question=text,
+        options=option_texts,
+        type='quiz',
+        correct_option_id=next(index for index, option in enumerate(options) if option['is_correct']),
+        explanation=truncate(question['explanation'], POLL_EXPLANATION_MAX_LENGTH) or None,
+        is_anonymous=False,
+    )
+    return {'poll_id': message.poll.id}
+
+
+async def send_keyboard_question(bot: Bot, chat_id, header, question):
+    """Send question that does not fit a quiz poll as message with numbered answer buttons."""
+    lines = [f"{header}\n{question['text']}", '']
+    for index, option in enumerate(question['options'], 1):
+        if option['option_type'] == 'image' and option['image']:
+            await media_registry.send_photo(bot, chat_id, option['image'], caption=str(index))
+        lines.append(f"{index}. {option['text']}" if option['text'] else f"{index}. (изображение)")
+    
+    message = await bot.send_message(
+        chat_id,
+        truncate('\n'.join(lines), MESSAGE_MAX_LENGTH),
+        reply_markup=answer_keyboard(len(question['options'])),
+    )
+    return {'message_id': message.message_id}
+
+
+async def send_question(bot: Bot, state: FSMContext, session):
+    """Send current question of the session and save the session."""
+    chat_id = session['chat_id']
+    question = await content_cache.get_question(session['question_ids'][session['index']])
+    if question is None:
+        # Question was unpublished in the middle of the quiz
+        return await next_question(bot, state, session)
+    
+    if question['image']:
+        await media_registry.send_photo(bot, chat_id, question['image'])
+    
+    header = f"Вопрос {session['index'] + 1}/{len(session['question_ids'])}"
+    if question['is_quiz']:
+        sent = await send_poll_question(bot, chat_id, header, question)
+    else:
+        sent = await send_keyboard_question(bot, chat_id, header, question)
+    
+    options = question['options']
+    session['sent'] = {
+        **sent,
+        'question_id': question['id'],
+        'option_ids': [option['id'] for option in options],
+        'correct_indexes': [index for index, option in enumerate(options) if option['is_correct']],
+        'sent_at': time.time(),
+    }
+    await state.set_data(session)
+
+
+async def record_answer(session, selected_index):
+    """Store answer to the sent question; returns whether it is correct."""
+    sent = session['sent']
+    is_correct = selected_index in sent['correct_indexes']
+    await attempts.record_answer(
+        session['attempt_id'],
+        sent['question_id'],
+        sent['option_ids'][selected_index],
+        is_correct,
+        int(time.time() - sent['sent_at']),
+    )
+    return is_correct
+
+
+async def next_question(bot: Bot, state: FSMContext, session):
+    """Move to the next question or finish the quiz."""
+    session['index'] += 1
+    if session['index'] < len(session['question_ids']):
+        return await send_question(bot, state, session)
+    
+    await state.clear()
+    result = await attempts.complete_attempt(session['attempt_id'])
+    if result is None:
+        return
+    
+    verdict = "✅ Билет сдан!" if result['is_passed'] else "❌ Есть ошибки, попробуйте ещё раз."
+    await bot.send_message(
+        session['chat_id'],
+        f"🏁 Билет {session['ticket_number']} завершён\n"
+        f"Правильных ответов: {result['correct_answers']} из {result['total_questions']} "
+        f"({result['score_percentage']}%)\n{verdict}\n\n"
+        f"/quiz — следующий билет"
+    )
+
+
+# Poll answers carry only the user, so quiz state is kept per private chat (chat id == user id)
+@router.message(Command('quiz'), F.chat.type == 'private')
+async def quiz_command(message: types.Message, command: CommandObject, bot: Bot, state: FSMContext):
+    """Start quiz: /quiz for random ticket, /quiz <number> for specific one."""
+    number = command.args.strip() if command.args else None
+    ticket = await content_cache.get_ticket(number)
+    if ticket is None:
+        if number and await content_cache.is_unanswerable(number):
+            await message.answer("Этот билет нельзя пройти в чате, откройте его в приложении: /app")
+        else:
+            await message.answer("Билет не найден." if number else "Пока нет опубликованных билетов.")
+        return
+    
+    previous = await state.get_data()
+    if previous.get('attempt_id'):
+        await attempts.abandon_attempt(previous['attempt_id'])
+    
+    user_id = await attempts.get_or_create_user(message.from_user)
+    question_ids = [question['id'] for question in ticket['questions']]
+    attempt_id = await attempts.create_attempt(user_id, ticket['id'], len(question_ids))
+    
+    session = {
+        'chat_id': message.chat.id,
+        'attempt_id': attempt_id,
+        'ticket_number': ticket['number'],
+        'question_ids': question_ids,
+        'index': 0,
+    }
+    await state.set_state(QuizStates.answering)
+    
+    await message.answer(f"🧪 Билет {ticket['number']}: {ticket['title']}\nВопросов: {len(question_ids)}")
+    await send_question(bot, state, session)
+
+
+@router.message(Command('stop'), QuizStates.answering)
+async def stop_command(message: types.Message, state: FSMContext):
+    """Stop current quiz."""
+    session = await state.get_data()
+    await state.clear()
+    await attempts.abandon_attempt(session['attempt_id'])
+    await message.answer("Тест остановлен. /quiz — начать заново.")
+
+
+@router.message(Command('stop'))
+async def stop_without_quiz(message: types.Message):
+    await message.answer("Нет активного теста. /quiz — начать.")
+
+
+@router.poll_answer(QuizStates.answering)
+async def poll_answer_handler(poll_answer: types.PollAnswer, bot: Bot, state: FSMContext):
+    """Record answer and send next question."""
+    session = await state.get_data()
+    sent = session.get('sent')
+    if sent is None or sent.get('poll_id') != poll_answer.poll_id or not poll_answer.option_ids:
+        return
+    
+    await record_answer(session, poll_answer.option_ids[0])
+    await next_question(bot, state, session)
+
+
+@router.callback_query(QuizStates.answering, F.data.startswith(f"{ANSWER_CALLBACK}:"))
+async def answer_button_handler(callback: types.CallbackQuery, bot: Bot, state: FSMContext):
+    """Record answer given with a keyboard button, show the verdict and send next question."""
+    session = await state.get_data()
+    sent = session.get('sent')
+    if sent is None or callback.message is None or sent.get('message_id') != callback.message.message_id:
+        await callback.answer("Этот вопрос уже закрыт.")
+        return
+    
+    selected_index = int(callback.data.split(':')[1])
+    if not 0 <= selected_index < len(sent['option_ids']):
+        await callback.answer()
+        return
+    
+    is_correct = await record_answer(session, selected_index)
+    correct = ', '.join(str(index + 1) for index in sent['correct_indexes'])
+    verdict = "✅ Правильно!" if is_correct else f"❌ Неправильно. Правильный ответ: {correct}"
+    question = await content_cache.get_question(sent['question_id'])
+    explanation = question['explanation'] if question else ''
+    await callback.answer(truncate(f"{verdict}\n{explanation}".strip(), CALLBACK_ANSWER_MAX_LENGTH), show_alert=True)
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await next_question(bot, state, session)
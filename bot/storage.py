@@ -0,0 +1,48 @@
+"""FSM storage shared by all bot processes.
+
+With Redis every replica sees the same conversation state and per-chat
+event isolation, so updates of one chat can be served by any process.
+Memory storage is the stand-in for development and tests.
+"""
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+from decouple import config
+
+REDIS_URL = config('REDIS_URL', default='')
+FSM_STORAGE = config('FSM_STORAGE', default='redis' if REDIS_URL else 'memory')
+FSM_KEY_PREFIX = config('FSM_KEY_PREFIX', default='bot_fsm')
+# Abandoned conversations expire instead of piling up in Redis
+FSM_STATE_TTL = config('FSM_STATE_TTL', default=24 * 3600, cast=int)
+
+
+def _redis_client(redis):
+    """Given client, a client for REDIS_URL, or None for in-memory storage."""
+    if redis is None and FSM_STORAGE == 'redis':
+        from redis.asyncio import Redis
+        redis = Redis.from_url(REDIS_URL)
+    return redis
+
+
+def create_storage(redis=None):
+    """Create FSM storage: RedisStorage with TTLs or MemoryStorage.
+
+    redis is an existing client to use instead of REDIS_URL.
+    """
+    redis = _redis_client(redis)
+    if redis is not None:
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+        return RedisStorage(
+            redis,
+            key_builder=DefaultKeyBuilder(prefix=FSM_KEY_PREFIX),
+            state_ttl=FSM_STATE_TTL,
+            data_ttl=FSM_STATE_TTL,
+        )
+    return MemoryStorage()
+
+
+def create_events_isolation(redis=None):
+    """Lock per chat (across processes with Redis) so one chat's updates run in order."""
+    redis = _redis_client(redis)
+    if redis is not None:
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisEventIsolation
+        return RedisEventIsolation(redis, key_builder=DefaultKeyBuilder(prefix=FSM_KEY_PREFIX))
+    return SimpleEventIsolation()
@@ -0,0 +1,469 @@
+"""Bot tests: python -m unittest tests (from bot/, needs fakeredis).
+
+Two dispatchers with their own Redis clients on one fake Redis server stand
+for two bot processes behind the webhook. SQL tests run in a scratch schema
+of the PostgreSQL server from DATABASE_URL and are skipped without it.
+"""
+import asyncio
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import asyncpg
+from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import StorageKey
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+import attempts
+import db
+import media
+from content import content_cache, is_quiz_question
+from fake_telegram import FakeTelegramAPI
+from storage import FSM_STATE_TTL, create_events_isolation, create_storage
+from webhook import QueuedRequestHandler
+
+BOT_TOKEN = '42:test'
+CHAT_ID = 5
+
+
+def load_quiz_router(name):
+    """Fresh copy of quiz.py: a router can be attached to one dispatcher only."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(os.path.dirname(__file__), 'quiz.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.router
+
+
+def make_question(question_id, correct):
+    question = {
+        'id': question_id, 'ticket_id': 1, 'text': f"Вопрос {question_id}", 'image': None,
+        'explanation': '', 'explanation_image': None,
+        'options': [
+            {'id': question_id * 10 + index, 'question_id': question_id, 'text': f"Вариант {index}",
+             'image': None, 'option_type': 'text', 'is_correct': is_correct}
+            for index, is_correct in enumerate(correct)
+        ],
+    }
+    question['is_quiz'] = is_quiz_question(question)
+    return question
+
+
+class SharedRedisStorageTests(unittest.IsolatedAsyncioTestCase):
+    """A quiz started in one bot process is continued by another."""
+    
+    async def asyncSetUp(self):
+        api = FakeTelegramAPI(rate_limit=0)
+        self.runner = web.AppRunner(api.create_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        api_url = 'http://127.0.0.1:%d' % self.runner.addresses[0][1]
+        
+        server = FakeServer()
+        self.processes = []
+        for name in ('quiz_process_a', 'quiz_process_b'):
+            bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+            dispatcher = Dispatcher(
+                storage=create_storage(FakeRedis(server=server)),
+                events_isolation=create_events_isolation(FakeRedis(server=server)),
+            )
+            dispatcher.include_router(load_quiz_router(name))
+            self.processes.append((bot, dispatcher))
+        self.redis = FakeRedis(server=server)
+        self.key = StorageKey(bot_id=self.processes[0][0].id, chat_id=CHAT_ID, user_id=CHAT_ID)
+        
+        # A poll question and one with two correct options (sent with buttons)
+        questions = [make_question(1, [True, False]), make_question(2, [True, True, False])]
+        ticket = {'id': 1, 'number': '1', 'title': 'Билет 1', 'questions': questions}
+        content = {
+            'tickets': {1: ticket}, 'by_number': {'1': ticket},
+            'questions': {question['id']: question for question in questions},
+            'unanswerable': set(), 'loaded_at': time.monotonic(),
+        }
+        for name, value in content.items():
+            patcher = mock.patch.object(content_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.attempts = {}
+        for name, value in {
+            'get_or_create_user': 1, 'create_attempt': 10, 'record_answer': True, 'abandon_attempt': None,
+            'complete_attempt': {'is_passed': True, 'correct_answers': 2, 'total_questions': 2, 'score_percentage': 100},
+        }.items():
+            patcher = mock.patch.object(attempts, name, mock.AsyncMock(return_value=value))
+            self.attempts[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    async def asyncTearDown(self):
+        for bot, dispatcher in self.processes:
+            await dispatcher.storage.close()
+            await bot.session.close()
+        await self.runner.cleanup()
+    
+    async def feed(self, process, update_id, **update):
+        bot, dispatcher = self.processes[process]
+        await dispatcher.feed_update(bot, types.Update(update_id=update_id, **update))
+    
+    async def test_state_written_by_one_process_is_read_by_another(self):
+        user = {'id': CHAT_ID, 'is_bot': False, 'first_name': 'Test'}
+        chat = {'id': CHAT_ID, 'type': 'private'}
+        await self.feed(0, 1, message={
+            'message_id': 1, 'date': 0, 'chat': chat, 'from': user, 'text': '/quiz 1',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 5}],
+        })
+        
+        storage_b = self.processes[1][1].storage
+        self.assertEqual(await storage_b.get_state(self.key), 'QuizStates:answering')
+        sent = (await storage_b.get_data(self.key))['sent']
+        self.assertEqual(sent['question_id'], 1)
+        state_key = storage_b.key_builder.build(self.key, 'state')
+        self.assertTrue(0 < await self.redis.ttl(state_key) <= FSM_STATE_TTL)
+        
+        await self.feed(1, 2, poll_answer={'poll_id': sent['poll_id'], 'user': user, 'option_ids': [0]})
+        self.attempts['record_answer'].assert_awaited_with(10, 1, 10, True, mock.ANY)
+        
+        storage_a = self.processes[0][1].storage
+        sent = (await storage_a.get_data(self.key))['sent']
+        self.assertEqual(sent['question_id'], 2)
+        await self.feed(0, 3, callback_query={
+            'id': '1', 'from': user, 'chat_instance': '1', 'data': 'quiz-answer:1',
+            'message': {'message_id': sent['message_id'], 'date': 0, 'chat': chat, 'text': 'Вопрос 2'},
+        })
+        self.attempts['record_answer'].assert_awaited_with(10, 2, 21, True, mock.ANY)
+        self.attempts['complete_attempt'].assert_awaited_once_with(10)
+        
+        self.assertIsNone(await storage_b.get_state(self.key))
+        self.assertEqual(await storage_b.get_data(self.key), {})
+    
+    async def test_events_isolation_is_shared_between_processes(self):
+        isolation_a = self.processes[0][1].fsm.events_isolation
+        isolation_b = self.processes[1][1].fsm.events_isolation
+        async with isolation_a.lock(self.key):
+            with self.assertRaises(asyncio.TimeoutError):
+                async with asyncio.timeout(0.2):
+                    async with isolation_b.lock(self.key):
+                        pass
+        async with asyncio.timeout(1):
+            async with isolation_b.lock(self.key):
+                pass
+
+
+
+class BroadcastBlockedTests(unittest.IsolatedAsyncioTestCase):
+    """Chats that blocked the bot are reported to on_blocked once per batch."""
+    
+    async def asyncSetUp(self):
+        api = FakeTelegramAPI(rate_limit=0, blocked=[2, 4, 7])
+        self.runner = web.AppRunner(api.create_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        api_url = 'http://127.0.0.1:%d' % self.runner.addresses[0][1]
+        self.bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+    
+    async def asyncTearDown(self):
+        await self.bot.session.close()
+        await self.runner.cleanup()
+    
+    async def test_blocked_chats_are_reported(self):
+        # broadcast.py reads the token at import
+        with mock.patch.dict(os.environ, {'TELEGRAM_BOT_TOKEN': BOT_TOKEN}):
+            from broadcast import BroadcastEngine, Checkpoint
+        
+        batches = [[1, 2, 3, 4], [5, 6, 7]]
+        
+        async def recipients(after_id):
+            return next((batch for batch in batches if batch[0] > after_id), [])
+        
+        on_blocked = mock.AsyncMock()
+        engine = BroadcastEngine(
+            self.bot, 'Привет', Checkpoint(None, 'Привет'), workers=2, rate=1000, chat_interval=0,
+            on_blocked=on_blocked,
+        )
+        stats = await engine.run(recipients)
+        
+        self.assertEqual(stats, {'sent': 4, 'blocked': 3, 'failed': 0})
+        self.assertEqual([sorted(call.args[0]) for call in on_blocked.await_args_list], [[2, 4], [7]])
+
+
+
+class RecordAnswerSQLTests(unittest.IsolatedAsyncioTestCase):
+    """Answers are stored once per question and only while the attempt is in progress."""
+    
+    async def asyncSetUp(self):
+        self.schema = f'bot_tests_{os.getpid()}'
+        try:
+            self.connection = await asyncpg.connect(db.DATABASE_URL, timeout=5)
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as exc:
+            self.skipTest(f"PostgreSQL is not available: {exc}")
+        # Only the columns the bot's SQL uses
+        await self.connection.execute(f"""
+            DROP SCHEMA IF EXISTS {self.schema} CASCADE;
+            CREATE SCHEMA {self.schema};
+            SET search_path TO {self.schema};
+            CREATE TABLE attempts (
+                id bigint PRIMARY KEY, status varchar(20) NOT NULL,
+                correct_answers integer NOT NULL DEFAULT 0, updated_at timestamptz
+            );
+            CREATE TABLE attempt_answers (
+                id bigserial PRIMARY KEY, attempt_id bigint NOT NULL, question_id bigint NOT NULL,
+                selected_option_id bigint NOT NULL, is_correct boolean NOT NULL,
+                time_spent_seconds integer NOT NULL, answered_at timestamptz NOT NULL
+            );
+            INSERT INTO attempts (id, status) VALUES (1, 'in_progress'), (2, 'completed'), (3, 'abandoned');
+        """)
+        self.pool = await asyncpg.create_pool(
+            db.DATABASE_URL, min_size=1, max_size=5, server_settings={'search_path': self.schema}
+        )
+        patcher = mock.patch.object(attempts, 'get_pool', mock.AsyncMock(return_value=self.pool))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await self.connection.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        await self.connection.close()
+    
+    async def answers(self, attempt_id):
+        return await self.connection.fetch(
+            "SELECT question_id, selected_option_id, is_correct FROM attempt_answers WHERE attempt_id = $1 ORDER BY id",
+            attempt_id
+        )
+    
+    async def correct_answers(self, attempt_id):
+        return await self.connection.fetchval("SELECT correct_answers FROM attempts WHERE id = $1", attempt_id)
+    
+    async def test_answer_is_stored_once(self):
+        self.assertTrue(await attempts.record_answer(1, 10, 101, True, 5))
+        self.assertFalse(await attempts.record_answer(1, 10, 102, False, 5))
+        self.assertTrue(await attempts.record_answer(1, 11, 112, False, 7))
+        
+        self.assertEqual([tuple(row) for row in await self.answers(1)], [(10, 101, True), (11, 112, False)])
+        self.assertEqual(await self.correct_answers(1), 1)
+    
+    async def test_concurrent_answers_to_one_question(self):
+        results = await asyncio.gather(*(attempts.record_answer(1, 10, 101, True, 5) for _ in range(5)))
+        self.assertEqual(sorted(results), [False] * 4 + [True])
+        self.assertEqual(len(await self.answers(1)), 1)
+        self.assertEqual(await self.correct_answers(1), 1)
+    
+    async def test_only_attempts_in_progress(self):
+        for attempt_id in (2, 3, 4):
+            with self.subTest(attempt_id=attempt_id):
+                self.assertFalse(await attempts.record_answer(attempt_id, 10, 101, True, 5))
+                self.assertEqual(await self.answers(attempt_id), [])
+        self.assertEqual(await self.correct_answers(2), 0)
+        
+        # Also when the attempt is closed after the lock was requested
+        async with self.pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute("SELECT 1 FROM attempts WHERE id = 1 FOR UPDATE")
+                pending = asyncio.ensure_future(attempts.record_answer(1, 10, 101, True, 5))
+                await asyncio.sleep(0.2)
+                await connection.execute("UPDATE attempts SET status = 'completed' WHERE id = 1")
+        self.assertFalse(await pending)
+        self.assertEqual(await self.answers(1), [])
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class QueuedWebhookTests(unittest.IsolatedAsyncioTestCase):
+    """Webhook updates are acknowledged at once and processed in per-chat order."""
+    
+    async def asyncSetUp(self):
+        self.api = FakeTelegramAPI(rate_limit=0)
+        self.runner = web.AppRunner(self.api.create_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        api_url = 'http://127.0.0.1:%d' % self.runner.addresses[0][1]
+        self.bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+        self.dp = Dispatcher()
+        self.client = None
+    
+    async def asyncTearDown(self):
+        if self.client is not None:
+            await self.client.close()
+        await self.bot.session.close()
+        await self.runner.cleanup()
+    
+    async def start(self, workers, queue_size):
+        self.handler = QueuedRequestHandler(self.dp, self.bot, workers=workers, queue_size=queue_size)
+        app = web.Application()
+        self.handler.register(app, path='/webhook')
+        self.client = TestClient(TestServer(app))
+        await self.client.start_server()
+    
+    async def post(self, update_id, chat_id, text):
+        return await self.client.post('/webhook', json={
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id, 'date': 0, 'text': text,
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test'},
+            },
+        })
+    
+    async def processed(self, count):
+        while self.handler.counters['processed'] + self.handler.counters['errors'] < count:
+            await asyncio.sleep(0.01)
+    
+    async def test_updates_of_one_chat_are_processed_in_order(self):
+        seen = []
+        
+        @self.dp.message()
+        async def record(message: types.Message):
+            # Earlier updates take longer, so any reordering would show up
+            await asyncio.sleep(0.05 / int(message.text))
+            seen.append((message.chat.id, int(message.text)))
+        
+        await self.start(workers=2, queue_size=100)
+        for number in range(1, 6):
+            for chat_id in (1, 2, 3):
+                response = await self.post(number * 10 + chat_id, chat_id, str(number))
+                self.assertEqual(response.status, 200)
+        await asyncio.wait_for(self.processed(15), timeout=5)
+        
+        for chat_id in (1, 2, 3):
+            with self.subTest(chat_id=chat_id):
+                self.assertEqual([number for chat, number in seen if chat == chat_id], [1, 2, 3, 4, 5])
+    
+    async def test_full_shard_is_rejected_with_retry_after(self):
+        release = asyncio.Event()
+        
+        @self.dp.message()
+        async def wait(message: types.Message):
+            await release.wait()
+        
+        await self.start(workers=2, queue_size=2)
+        # The first update is taken by the worker, the second fills the shard
+        self.assertEqual((await self.post(1, 1, 'a')).status, 200)
+        while self.handler.queues[1].qsize():
+            await asyncio.sleep(0.01)
+        self.assertEqual((await self.post(2, 1, 'b')).status, 200)
+        
+        response = await self.post(3, 3, 'c')
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        # Other shards still accept updates
+        self.assertEqual((await self.post(4, 2, 'd')).status, 200)
+        
+        release.set()
+        await asyncio.wait_for(self.processed(3), timeout=5)
+        metrics = await (await self.client.get('/metrics')).json()
+        self.assertEqual(
+            {key: metrics[key] for key in ('received', 'processed', 'rejected', 'queue_depth')},
+            {'received': 4, 'processed': 3, 'rejected': 1, 'queue_depth': 0}
+        )
+    
+    async def test_queued_updates_are_drained_on_shutdown(self):
+        @self.dp.message()
+        async def reply(message: types.Message):
+            await asyncio.sleep(0.02)
+            return message.answer('ok')
+        
+        await self.start(workers=1, queue_size=100)
+        for update_id in range(1, 11):
+            self.assertEqual((await self.post(update_id, update_id, 'hi')).status, 200)
+        self.assertGreater(self.handler.queue_depth(), 0)
+        
+        await self.client.close()
+        self.client = None
+        
+        # Every queued update was processed and answered before the workers stopped
+        self.assertEqual(self.handler.counters['processed'], 10)
+        self.assertEqual(self.api.stats['ok'], 10)
+        self.assertTrue(all(task.done() for task in self.handler.tasks))
+
+
+class MediaRegistryTests(unittest.IsolatedAsyncioTestCase):
+    """Images are uploaded once and then sent by their cached file_id."""
+    
+    async def asyncSetUp(self):
+        self.api = FakeTelegramAPI(rate_limit=0)
+        self.runner = web.AppRunner(self.api.create_app())
+        await self.runner.setup()
+        await web.TCPSite(self.runner, '127.0.0.1', 0).start()
+        api_url = 'http://127.0.0.1:%d' % self.runner.addresses[0][1]
+        self.bot = Bot(BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+        
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        self.write('sign.png', b'sign')
+        self.registry = media.MediaRegistry(self.media_root)
+        # telegram_media table without a database
+        self.pool = mock.AsyncMock()
+        self.pool.fetchval.return_value = None
+        mock.patch.object(media, 'get_pool', mock.AsyncMock(return_value=self.pool)).start()
+        self.sha256 = mock.patch.object(media, '_sha256', wraps=media._sha256).start()
+        self.addCleanup(mock.patch.stopall)
+    
+    async def asyncTearDown(self):
+        await self.bot.session.close()
+        await self.runner.cleanup()
+    
+    def write(self, name, content, mtime_ns=None):
+        path = os.path.join(self.media_root, name)
+        with open(path, 'wb') as media_file:
+            media_file.write(content)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+    
+    async def test_image_is_uploaded_once(self):
+        first = await self.registry.send_photo(self.bot, 1, 'sign.png')
+        second = await self.registry.send_photo(self.bot, 2, 'sign.png')
+        
+        self.assertEqual(self.api.stats['uploads'], 1)
+        self.assertEqual(second.photo[-1].file_id, first.photo[-1].file_id)
+        self.assertEqual(self.pool.execute.await_count, 1)
+        with self.assertLogs(media.logger, 'WARNING'):
+            self.assertIsNone(await self.registry.send_photo(self.bot, 1, 'missing.png'))
+        
+        # A file_id saved by another process is found in the table
+        registry = media.MediaRegistry(self.media_root)
+        self.pool.fetchval.return_value = first.photo[-1].file_id
+        await registry.send_photo(self.bot, 3, 'sign.png')
+        self.assertEqual(self.api.stats['uploads'], 1)
+    
+    async def test_changed_file_is_hashed_again(self):
+        path = os.path.join(self.media_root, 'sign.png')
+        mtime_ns = os.stat(path).st_mtime_ns
+        await self.registry.send_photo(self.bot, 1, 'sign.png')
+        await self.registry.send_photo(self.bot, 1, 'sign.png')
+        self.assertEqual(self.sha256.call_count, 1)
+        
+        # Touched but unchanged: hashed again, the same file_id is reused
+        self.write('sign.png', b'sign', mtime_ns=mtime_ns + 10 ** 9)
+        await self.registry.send_photo(self.bot, 1, 'sign.png')
+        self.assertEqual((self.sha256.call_count, self.api.stats['uploads']), (2, 1))
+        
+        # Replaced with another image of another size, even with the old mtime
+        self.write('sign.png', b'new sign', mtime_ns=mtime_ns)
+        await self.registry.send_photo(self.bot, 1, 'sign.png')
+        self.assertEqual((self.sha256.call_count, self.api.stats['uploads']), (3, 2))
+        
+        # Renamed copy has the same content
+        self.write('copy.png', b'new sign')
+        await self.registry.send_photo(self.bot, 1, 'copy.png')
+        self.assertEqual((self.sha256.call_count, self.api.stats['uploads']), (4, 2))
+    
+    async def test_stale_file_id_is_forgotten(self):
+        sha256 = media._sha256(os.path.join(self.media_root, 'sign.png'))
+        self.registry.file_ids[sha256] = 'issued-for-another-bot'
+        
+        with self.assertLogs(media.logger, 'WARNING'):
+            message = await self.registry.send_photo(self.bot, 1, 'sign.png')
+        
+        file_id = message.photo[-1].file_id
+        self.assertEqual(self.api.stats['uploads'], 1)
+        self.assertEqual(self.registry.file_ids, {sha256: file_id})
+        self.assertEqual([call.args[:3] for call in self.pool.execute.await_args_list], [
+            (media.DELETE_FILE_ID_SQL, sha256),
+            (media.SAVE_FILE_ID_SQL, sha256, file_id),
+        ])
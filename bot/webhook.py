@@ -0,0 +1,168 @@
+"""Webhook mode with bounded queues, per-chat ordering and metrics."""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = config('WEBHOOK_WORKERS', default=16, cast=int)
+WEBHOOK_QUEUE_SIZE = config('WEBHOOK_QUEUE_SIZE', default=2000, cast=int)
+WEBHOOK_PROCESSES = config('WEBHOOK_PROCESSES', default=1, cast=int)
+WEBHOOK_SECRET = config('WEBHOOK_SECRET', default='')
+WEBHOOK_DRAIN_TIMEOUT = config('WEBHOOK_DRAIN_TIMEOUT', default=10, cast=float)
+LATENCY_SAMPLES = 2000
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+
+def update_key(update):
+    """Chat (or user) the raw update belongs to, used to keep per-chat order."""
+    for field, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get('chat') or (event.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = event.get('from') or event.get('user')
+        if user:
+            return user['id']
+    return update.get('update_id', 0)
+
+
+class QueuedRequestHandler(SimpleRequestHandler):
+    """Acknowledge updates at once and process them with a bounded worker pool.
+
+    Updates are sharded by chat id so every chat is served by one worker in
+    arrival order. When the shard queue is full Telegram gets 503 and retries
+    the update later instead of the process piling up unbounded tasks.
+    """
+    
+    def __init__(self, dispatcher, bot, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.workers = workers
+        self.queues = [asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self.tasks = []
+        self.wait_times = deque(maxlen=LATENCY_SAMPLES)
+        self.process_times = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {'received': 0, 'processed': 0, 'rejected': 0, 'errors': 0}
+        self.started_at = time.monotonic()
+    
+    def register(self, app, /, path, **kwargs):
+        super().register(app, path=path, **kwargs)
+        app.on_startup.append(self._start_workers)
+        # Drain queues before the bot session is closed by the base shutdown hook
+        app.on_shutdown.insert(0, self._stop_workers)
+        app.router.add_get('/metrics', self.metrics)
+    
+    async def _start_workers(self, app):
+        self.started_at = time.monotonic()
+        self.tasks = [asyncio.create_task(self.worker(queue)) for queue in self.queues]
+    
+    async def _stop_workers(self, app):
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self.queues)),
+                timeout=WEBHOOK_DRAIN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s queued updates on shutdown", self.queue_depth())
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+    
+    def queue_depth(self):
+        return sum(queue.qsize() for queue in self.queues)
+    
+    async def handle(self, request):
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), bot):
+            return web.Response(body='Unauthorized', status=401)
+        
+        update = await request.json(loads=bot.session.json_loads)
+        self.counters['received'] += 1
+        queue = self.queues[update_key(update) % self.workers]
+        try:
+            queue.put_nowait((update, time.monotonic()))
+        except asyncio.QueueFull:
+            self.counters['rejected'] += 1
+            return web.Response(status=503, headers={'Retry-After': '1'})
+        return web.json_response({}, dumps=bot.session.json_dumps)
+    
+    async def worker(self, queue):
+        while True:
+            update, received_at = await queue.get()
+            started_at = time.monotonic()
+            self.wait_times.append(started_at - received_at)
+            try:
+                result = await self.dispatcher.feed_raw_update(bot=self.bot, update=update, **self.data)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+                self.counters['processed'] += 1
+            except Exception:
+                logger.exception("Failed to process update %s", update.get('update_id'))
+                self.counters['errors'] += 1
+            finally:
+                self.process_times.append(time.monotonic() - started_at)
+                queue.task_done()
+    
+    async def metrics(self, request):
+        uptime = time.monotonic() - self.started_at
+        return web.json_response({
+            'pid': os.getpid(),
+            'workers': self.workers,
+            'queue_depth': self.queue_depth(),
+            'queue_capacity': sum(queue.maxsize for queue in self.queues),
+            'max_shard_depth': max(queue.qsize() for queue in self.queues),
+            **self.counters,
+            'updates_per_second': round(self.counters['processed'] / uptime, 2) if uptime else 0,
+            'wait_ms': {
+                'p50': percentile(self.wait_times, 0.5),
+                'p95': percentile(self.wait_times, 0.95),
+            },
+            'process_ms': {
+                'p50': percentile(self.process_times, 0.5),
+                'p95': percentile(self.process_times, 0.95),
+            },
+        })
+
+
+def _serve(app_factory, host, port, reuse_port):
+    web.run_app(app_factory(), host=host, port=port, reuse_port=reuse_port, print=None)
+
+
+def serve(app_factory, host='0.0.0.0', port=8080, processes=WEBHOOK_PROCESSES):
+    """Run webhook app, optionally in several processes sharing one port (SO_REUSEPORT)."""
+    if processes <= 1:
+        _serve(app_factory, host, port, reuse_port=False)
+        return
+    
+    children = [
+        multiprocessing.Process(target=_serve, args=(app_factory, host, port, True), daemon=True)
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    logger.info("Started %s webhook processes on port %s", processes, port)
+    
+    def stop(signum, frame):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for child in children:
+        child.join()
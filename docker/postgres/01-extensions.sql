@@ -0,0 +1,2 @@
+-- Extensions required by backend indexes (trigram search)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;